@@ -0,0 +1,323 @@
+import argparse
+import glob
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+TARGETS = ["clip", "text", "ocr", "ocr_service", "card_reader", "card_matcher"]
+
+# Sabit Türkçe metin korpusu (kısa/uzun, temiz/argo karışık)
+TEXTS = [
+    "merhaba dünya",
+    "Bugün hava çok güzel, sahilde yürüyüşe çıktık.",
+    "Toplantı saat üçte başlayacak, lütfen geç kalmayın.",
+    "Bu ne biçim iş ya, tam bir aptallık!",
+    "Yeni projemizin ilk sürümünü bugün yayınladık, herkese teşekkürler.",
+    "Salak mısın nesin, söylediğimi anlamıyor musun?",
+    "İstanbul'da trafik yine kilitlendi, eve ancak iki saatte varabildim.",
+    "Kahvaltıda simit, peynir ve çay vardı; günün en sevdiğim öğünü.",
+    "Hafta sonu kamp için çadır, uyku tulumu ve fener almayı unutmayın.",
+    "Maç berabere bitti ama hakem kararları çok tartışmalıydı.",
+    "Kütüphanede sessiz çalışma alanı yeniden açıldı, saat dokuzdan akşam sekize kadar.",
+    "Gerizekalı gibi davranmayı bırak artık.",
+]
+
+CARD_FIELDS = [
+    ("ACME TEKNOLOJİ A.Ş.", "Ahmet Yılmaz", "Yazılım Mühendisi", "ID: 482913"),
+    ("ÖRNEK HOLDİNG", "Ayşe Demir", "Proje Yöneticisi", "ID: 771204"),
+    ("ANADOLU LOJİSTİK", "Mehmet Kaya", "Operasyon Uzmanı", "ID: 139857"),
+    ("MAVİ YAZILIM", "Zeynep Öztürk", "Veri Analisti", "ID: 650318"),
+]
+
+
+# ---------------------------------------------------------
+# KORPUS
+# ---------------------------------------------------------
+
+def _font(size: int):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Eski Pillow sürümleri boyut almaz
+        return ImageFont.load_default()
+
+
+def make_card(index: int, size=(856, 540)) -> Image.Image:
+    """Kimlik kartına benzeyen sabit görsel: Başlık, yazı satırları ve fotoğraf alanı."""
+    rng = np.random.default_rng(index)
+    company, name, title, card_id = CARD_FIELDS[index % len(CARD_FIELDS)]
+    background = tuple(int(c) for c in rng.integers(200, 255, 3))
+    image = Image.new("RGB", size, background)
+    draw = ImageDraw.Draw(image)
+
+    width, height = size
+    draw.rectangle([0, 0, width, 90], fill=tuple(int(c) for c in rng.integers(0, 120, 3)))
+    draw.text((30, 25), company, fill=(255, 255, 255), font=_font(40))
+
+    # Fotoğraf alanı (basit yüz silüeti)
+    draw.rectangle([40, 130, 280, 450], fill=(180, 170, 160))
+    draw.ellipse([100, 170, 220, 310], fill=(225, 190, 160))
+    draw.ellipse([70, 320, 250, 480], fill=(60, 60, 90))
+
+    for row, line in enumerate([name, title, card_id]):
+        draw.text((320, 160 + row * 80), line, fill=(20, 20, 20), font=_font(36))
+
+    # Eşleştirici için doku (ORB köşe noktaları)
+    for _ in range(40):
+        x, y = int(rng.integers(300, width - 20)), int(rng.integers(400, height - 20))
+        draw.rectangle([x, y, x + 12, y + 12], fill=tuple(int(c) for c in rng.integers(0, 255, 3)))
+    return image
+
+
+def load_corpus(corpus_dir: str, count: int):
+    """
+    corpus_dir verilirse oradaki görseller (*.jpg, *.png) ve texts.txt kullanılır.
+    Eksik kalan kısım sabit tohumlu üretilen kart görselleri ve TEXTS ile tamamlanır (her çalıştırmada aynı korpus).
+    """
+    images, texts = [], []
+    if corpus_dir:
+        paths = sorted(glob.glob(os.path.join(corpus_dir, "*.jpg")) + glob.glob(os.path.join(corpus_dir, "*.png")))
+        images = [Image.open(p).convert("RGB") for p in paths[:count]]
+        texts_path = os.path.join(corpus_dir, "texts.txt")
+        if os.path.exists(texts_path):
+            with open(texts_path, encoding="utf-8") as f:
+                texts = [line.strip() for line in f if line.strip()]
+
+    index = 0
+    while len(images) < count:
+        images.append(make_card(index))
+        index += 1
+    return images, texts or list(TEXTS)
+
+
+def _jpeg_roundtrip(image: Image.Image, angle: float, scale: float) -> Image.Image:
+    """Aynı kartın farklı çekimi: Döndürme + ölçekleme + JPEG sıkıştırma."""
+    variant = image.rotate(angle, expand=True, fillcolor=(255, 255, 255))
+    variant = variant.resize((int(variant.width * scale), int(variant.height * scale)), Image.BILINEAR)
+    buffered = io.BytesIO()
+    variant.save(buffered, format="JPEG", quality=80)
+    return Image.open(io.BytesIO(buffered.getvalue())).convert("RGB")
+
+
+# ---------------------------------------------------------
+# HEDEFLER
+# Her hedef (yükleyici, iş üretici) döner. Yükleyici modeli oluşturur, iş üretici
+# i. istek için çağrılacak fonksiyonu verir.
+# ---------------------------------------------------------
+
+def _target(name: str, images: list, texts: list):
+    if name == "clip":
+        from content_moderator import ContentModerator
+        return ContentModerator, lambda model, i: model.analyze_image(images[i % len(images)])
+
+    if name == "text":
+        from text_moderator import TextModerator
+        return TextModerator, lambda model, i: model.analyze_text(texts[i % len(texts)])
+
+    if name == "ocr":
+        def load():
+            import easyocr
+            import torch
+            return easyocr.Reader(['tr', 'en'], gpu=torch.cuda.is_available())
+        arrays = [np.asarray(image) for image in images]
+        return load, lambda model, i: model.readtext(arrays[i % len(arrays)], detail=0)
+
+    if name == "ocr_service":
+        def load():
+            import easyocr
+            import torch
+            from ocr_service import OCRService
+            return OCRService(easyocr.Reader(['tr', 'en'], gpu=torch.cuda.is_available()))
+        # Pipeline ile aynı girdi: Gri görsel
+        arrays = [np.asarray(image.convert("L")) for image in images]
+        return load, lambda model, i: model.read(arrays[i % len(arrays)])
+
+    if name == "card_reader":
+        from card_reader import SpatialCardReader
+        return SpatialCardReader, lambda model, i: model.analyze_card(images[i % len(images)])
+
+    if name == "card_matcher":
+        from card_matcher import CardMatcher
+        # Yarısı aynı kartın farklı çekimi (eşleşmeli), yarısı farklı kartlar
+        pairs = []
+        for i, image in enumerate(images):
+            pairs.append((image, _jpeg_roundtrip(image, angle=7, scale=0.8)))
+            pairs.append((image, images[(i + 1) % len(images)]))
+        return (lambda: CardMatcher(algorithm="orb")), lambda model, i: model.match_cards(*pairs[i % len(pairs)])
+
+    raise ValueError(f"Bilinmeyen hedef: {name}")
+
+
+# ---------------------------------------------------------
+# ÖLÇÜM
+# ---------------------------------------------------------
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux'ta KB, macOS'ta byte
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(latencies: list, wall_seconds: float, errors: int, concurrency: int) -> dict:
+    result = {"concurrency": concurrency, "requests": len(latencies) + errors, "errors": errors}
+    if not latencies:
+        return result
+    latencies = np.asarray(latencies)
+    result.update({
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        "mean_ms": round(float(np.mean(latencies)), 2),
+        "throughput_rps": round(len(latencies) / wall_seconds, 2) if wall_seconds > 0 else None
+    })
+    return result
+
+
+def run_load(model, call, requests: int, concurrency: int) -> dict:
+    """requests adet isteği concurrency thread ile çalıştırır (API'deki inference havuzu gibi)."""
+    latencies, errors = [], 0
+
+    def one(i):
+        start = time.perf_counter()
+        call(model, i)
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(one, i) for i in range(requests)]:
+            try:
+                latencies.append(future.result())
+            except Exception as e:
+                errors += 1
+                if errors == 1:
+                    print(f"Uyarı: İstek hatası: {e}", file=sys.stderr)
+    wall_seconds = time.perf_counter() - start
+    return summarize(latencies, wall_seconds, errors, concurrency)
+
+
+def bench_target(name: str, args) -> dict:
+    """Tek hedefin yükleme süresi, gecikme dağılımı, verim ve tepe RSS ölçümü."""
+    import torch
+    if args.torch_threads:
+        torch.set_num_threads(args.torch_threads)
+
+    images, texts = load_corpus(args.corpus, args.images)
+    result = {"load_seconds": None, "warmup_seconds": None, "rss_before_load_mb": round(_peak_rss_mb(), 1), "runs": [], "error": None}
+    try:
+        loader, call = _target(name, images, texts)
+        start = time.perf_counter()
+        model = loader()
+        result["load_seconds"] = round(time.perf_counter() - start, 3)
+        result["rss_after_load_mb"] = round(_peak_rss_mb(), 1)
+
+        start = time.perf_counter()
+        for i in range(args.warmup):
+            call(model, i)
+        result["warmup_seconds"] = round(time.perf_counter() - start, 3)
+
+        for concurrency in args.concurrency:
+            result["runs"].append(run_load(model, call, args.requests, concurrency))
+    except (Exception, SystemExit) as e:
+        # Modüller yükleme hatasında sys.exit() çağırıyor; diğer hedefler yine ölçülür
+        result["error"] = str(e) or e.__class__.__name__
+    result["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+    return result
+
+
+def _isolated_worker(name, args, queue):
+    queue.put(bench_target(name, args))
+
+
+def bench_isolated(name: str, args) -> dict:
+    """Hedef ayrı bir süreçte ölçülür: Tepe RSS ve yükleme süresi diğer modellerden etkilenmez."""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_isolated_worker, args=(name, args, queue))
+    process.start()
+    try:
+        result = queue.get()
+    except Exception as e:
+        result = {"error": f"Alt süreç hatası: {e}", "runs": []}
+    process.join()
+    if process.exitcode not in (0, None) and not result.get("error"):
+        result["error"] = f"Alt süreç çıkış kodu: {process.exitcode}"
+    return result
+
+
+def environment() -> dict:
+    """Çalıştırmaları commit'ler arasında karşılaştırabilmek için ortam bilgisi."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        commit = None
+    import torch
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "cuda": torch.cuda.is_available()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI moderasyon yığını benchmark'ı (etkileşimsiz, JSON çıktı)")
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"Virgülle ayrılmış hedefler: {','.join(TARGETS)}")
+    parser.add_argument("--corpus", default=None, help="Görsel (*.jpg, *.png) ve texts.txt içeren klasör (yoksa sabit korpus üretilir)")
+    parser.add_argument("--images", type=int, default=8, help="Korpustaki görsel sayısı")
+    parser.add_argument("--requests", type=int, default=32, help="Her eşzamanlılık seviyesinde istek sayısı")
+    parser.add_argument("--concurrency", default="1,4", help="Virgülle ayrılmış eşzamanlılık seviyeleri")
+    parser.add_argument("--warmup", type=int, default=2, help="Ölçüm öncesi ısınma isteği sayısı")
+    parser.add_argument("--torch-threads", type=int, default=0, help="torch.set_num_threads (0 = varsayılan)")
+    parser.add_argument("--no-isolate", action="store_true", help="Tüm hedefleri aynı süreçte ölç (RSS birikimli olur)")
+    parser.add_argument("--output", default=None, help="JSON çıktı dosyası (varsayılan: stdout)")
+    args = parser.parse_args()
+
+    args.concurrency = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = [t for t in targets if t not in TARGETS]
+    if unknown:
+        parser.error(f"Bilinmeyen hedef(ler): {', '.join(unknown)}")
+
+    report = {
+        "environment": environment(),
+        "config": {
+            "corpus": args.corpus or "generated",
+            "images": args.images,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "isolated": not args.no_isolate
+        },
+        "results": {}
+    }
+    for name in targets:
+        print(f"⏱️  {name} ölçülüyor...", file=sys.stderr)
+        report["results"][name] = bench_target(name, args) if args.no_isolate else bench_isolated(name, args)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"✅ Sonuçlar kaydedildi: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    sys.exit(1 if any(r.get("error") for r in report["results"].values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
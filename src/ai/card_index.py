@@ -0,0 +1,163 @@
+#Kart Ön Eleme İndeksi - Kart başına tek global tanımlayıcı (ORB bag-of-binary-words bit kümesi), Hamming taramasıyla top-k aday
+
+import os
+import threading
+
+import cv2
+import numpy as np
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+CARD_VOCABULARY_WORDS = int(os.getenv("CARD_VOCABULARY_WORDS", "4096"))          # Görsel kelime sayısı (bit kümesi boyutu, 8'in katı)
+CARD_VOCABULARY_MIN_CARDS = int(os.getenv("CARD_VOCABULARY_MIN_CARDS", "200"))   # Sözlük bu kadar kayıtlı karttan sonra eğitilir
+CARD_SHORTLIST_K = int(os.getenv("CARD_SHORTLIST_K", "10"))                      # Ratio-test eşleştirmesine giden aday sayısı
+CARD_SHORTLIST_RERANK = int(os.getenv("CARD_SHORTLIST_RERANK", "5"))             # Hamming ile k x bu kadar aday alınır, kosinüsle sıralanır
+
+
+class BinaryVocabulary:
+    """
+    ORB için görsel kelime sözlüğü (bag-of-binary-words).
+    Kelimeler kayıtlı kartların tanımlayıcılarından k-majority (Hamming uzayında k-means) ile eğitilir.
+    Kartın global tanımlayıcısı, tanımlayıcılarının düştüğü kelimelerin bit kümesidir (kelime var/yok, paketli uint8).
+    Tekrarlayan desenler (aynı kelimeye düşen çok sayıda tanımlayıcı) tek bit sayıldığı için ağırlık kazanmaz.
+    """
+
+    def __init__(self, words: np.ndarray, vocabulary_id: int = None):
+        self.words = np.ascontiguousarray(words, dtype=np.uint8)
+        self.vocabulary_id = vocabulary_id
+        self._matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+
+    @property
+    def size(self) -> int:
+        return len(self.words)
+
+    @classmethod
+    def train(cls, descriptor_sets: list, words: int = CARD_VOCABULARY_WORDS, iterations: int = 4,
+              sample_size: int = 60000, seed: int = 0):
+        """
+        descriptor_sets: Kart başına (n, 32) uint8 tanımlayıcılar.
+        Örneklenen tanımlayıcılar en yakın kelimeye atanır, her kelime üyelerinin bit çoğunluğu olur.
+        """
+        rng = np.random.default_rng(seed)
+        pool = np.concatenate([d for d in descriptor_sets if d is not None and len(d)])
+        if len(pool) > sample_size:
+            pool = pool[rng.choice(len(pool), sample_size, replace=False)]
+        words = min(words, len(pool)) // 8 * 8
+        vocabulary = cls(pool[rng.choice(len(pool), words, replace=False)])
+        bits = np.unpackbits(pool, axis=1)
+
+        for _ in range(iterations):
+            assignment = vocabulary.assign(pool)
+            order = np.argsort(assignment, kind="stable")
+            members, starts = np.unique(assignment[order], return_index=True)
+            counts = np.diff(np.append(starts, len(order)))
+            majority = np.add.reduceat(bits[order], starts, axis=0, dtype=np.int32) * 2 > counts[:, None]
+            centers = vocabulary.words.copy()
+            centers[members] = np.packbits(majority.astype(np.uint8), axis=1)
+            # Boş kalan kelimeler rastgele tanımlayıcılarla yeniden başlatılır
+            empty = np.setdiff1d(np.arange(words), members)
+            if len(empty):
+                centers[empty] = pool[rng.choice(len(pool), len(empty), replace=False)]
+            vocabulary = cls(centers)
+        return vocabulary
+
+    def assign(self, descriptors: np.ndarray) -> np.ndarray:
+        """Her tanımlayıcının en yakın kelimesi (Hamming, SIMD BFMatcher)."""
+        matches = self._matcher.match(np.ascontiguousarray(descriptors, dtype=np.uint8), self.words)
+        assignment = np.empty(len(matches), dtype=np.int64)
+        for match in matches:
+            assignment[match.queryIdx] = match.trainIdx
+        return assignment
+
+    def encode(self, assignment: np.ndarray) -> np.ndarray:
+        """Kelime atamalarından global tanımlayıcı: (kelime sayısı / 8,) uint8 paketli bit kümesi."""
+        present = np.zeros(self.size, dtype=np.uint8)
+        present[assignment] = 1
+        return np.packbits(present)
+
+    def global_descriptor(self, descriptors: np.ndarray) -> np.ndarray:
+        """
+        Kartın global tanımlayıcısı: (kelime sayısı / 8,) uint8.
+        İki kartın benzerliği ortak kelime sayısının kosinüsüdür: |a ∧ b| / sqrt(|a| x |b|).
+        """
+        if descriptors is None or len(descriptors) == 0:
+            return np.zeros(self.size // 8, dtype=np.uint8)
+        return self.encode(self.assign(descriptors))
+
+
+def bit_count(vector: np.ndarray) -> int:
+    """Paketli bit kümesindeki kelime sayısı."""
+    return int(np.unpackbits(vector).sum())
+
+
+class CardShortlistIndex:
+    """
+    Kayıtlı kartların bit kümeleri tek bir (n, kelime sayısı / 8) uint8 matriste tutulur (100k kart, 4096 kelime: ~51 MB).
+    - search: Sorgunun tüm kartlara Hamming uzaklığı tek BFMatcher.knnMatch çağrısıyla (SIMD popcount) bulunur,
+      en yakın k x CARD_SHORTLIST_RERANK kart ortak kelime kosinüsüyle yeniden sıralanır.
+      Ortak kelime, Hamming uzaklığından hesaplanır: |a ∧ b| = (|a| + |b| - hamming) / 2.
+    - add / remove: Artımlı güncelleme. Kapasite ikiye katlanarak büyür, silinen satırın yerine son satır taşınır.
+    """
+
+    def __init__(self, dimension: int, capacity: int = 1024):
+        self.dimension = dimension
+        self._matrix = np.zeros((capacity, dimension // 8), dtype=np.uint8)
+        self._counts = np.zeros(capacity, dtype=np.int32)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._rows = {}  # user_id -> satır
+        self._lock = threading.Lock()
+        self._matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, user_id):
+        return user_id in self._rows
+
+    def add(self, user_id: int, vector: np.ndarray):
+        """Kartı ekler; kullanıcının kaydı varsa vektörü günceller."""
+        with self._lock:
+            row = self._rows.get(user_id)
+            if row is None:
+                row = len(self._rows)
+                if row == len(self._ids):
+                    self._matrix = np.concatenate([self._matrix, np.zeros_like(self._matrix)])
+                    self._counts = np.concatenate([self._counts, np.zeros_like(self._counts)])
+                    self._ids = np.concatenate([self._ids, np.zeros_like(self._ids)])
+                self._rows[user_id] = row
+                self._ids[row] = user_id
+            self._matrix[row] = vector
+            self._counts[row] = bit_count(vector)
+
+    def remove(self, user_id: int):
+        with self._lock:
+            row = self._rows.pop(user_id, None)
+            if row is None:
+                return
+            last = len(self._rows)
+            if row != last:
+                moved = int(self._ids[last])
+                self._matrix[row] = self._matrix[last]
+                self._counts[row] = self._counts[last]
+                self._ids[row] = moved
+                self._rows[moved] = row
+
+    def search(self, vector: np.ndarray, k: int = CARD_SHORTLIST_K, rerank: int = CARD_SHORTLIST_RERANK) -> list:
+        """En benzer k kart: [(user_id, kosinüs)] benzerliğe göre azalan."""
+        query = np.ascontiguousarray(vector, dtype=np.uint8).reshape(1, -1)
+        query_count = bit_count(query)
+        with self._lock:
+            count = len(self._rows)
+            if count == 0 or query_count == 0:
+                return []
+            matches = self._matcher.knnMatch(query, self._matrix[:count], k=min(count, k * max(1, rerank)))[0]
+            rows = np.array([match.trainIdx for match in matches], dtype=np.int64)
+            distances = np.array([match.distance for match in matches], dtype=np.float32)
+            counts = self._counts[rows].astype(np.float32)
+            ids = self._ids[rows]
+        common = (query_count + counts - distances) / 2
+        scores = common / np.sqrt(np.maximum(counts, 1) * query_count)
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def memory_mb(self) -> float:
+        return round((self._matrix.nbytes + self._counts.nbytes + self._ids.nbytes) / 1024 / 1024, 2)
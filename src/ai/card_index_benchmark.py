@@ -0,0 +1,162 @@
+import argparse
+import string
+import time
+
+import cv2
+import numpy as np
+
+from card_matcher import CardMatcher
+from card_index import BinaryVocabulary, CardShortlistIndex, CARD_VOCABULARY_WORDS, CARD_SHORTLIST_RERANK
+
+CARD_SIZE = (856, 540)  # ID-1 kart oranı
+LABELS = ["ID / SICIL NO", "EMAIL", "KONUM", "DOGUM T.", "CINSIYET"]
+
+
+def make_card(rng) -> np.ndarray:
+    """Sentetik kart: Ortak düzen (başlık bandı, fotoğraf, etiketler) + karta özel şirket, isim, değerler ve desen."""
+    width, height = CARD_SIZE
+    card = np.empty((height, width, 3), dtype=np.uint8)
+    card[:] = rng.integers(170, 256, 3)
+    gradient = np.linspace(0, rng.integers(20, 60), width, dtype=np.float32)
+    card = np.clip(card - gradient[None, :, None], 0, 255).astype(np.uint8)
+
+    def text(length):
+        return "".join(rng.choice(list(string.ascii_uppercase + string.digits + " "), length))
+
+    header = tuple(int(c) for c in rng.integers(0, 160, 3))
+    cv2.rectangle(card, (0, 0), (width, 90), header, -1)
+    cv2.putText(card, text(int(rng.integers(6, 14))), (30, 62), cv2.FONT_HERSHEY_DUPLEX, 1.4, (255, 255, 255), 2)
+    for _ in range(int(rng.integers(2, 5))):  # Logo
+        center = (int(rng.integers(650, 820)), int(rng.integers(15, 75)))
+        cv2.circle(card, center, int(rng.integers(8, 28)), tuple(int(c) for c in rng.integers(0, 256, 3)), -1)
+
+    photo = cv2.GaussianBlur(rng.integers(0, 256, (220, 170, 3), dtype=np.uint8), (0, 0), 4)
+    card[120:340, 40:210] = cv2.normalize(photo, None, 0, 255, cv2.NORM_MINMAX)
+    cv2.putText(card, text(int(rng.integers(8, 16))), (40, 380), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (20, 20, 20), 2)
+    cv2.putText(card, text(int(rng.integers(6, 14))), (40, 415), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (60, 60, 60), 2)
+
+    for row, label in enumerate(LABELS):
+        y = 140 + row * 75
+        cv2.putText(card, label, (260, y), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (90, 90, 90), 1)
+        cv2.putText(card, text(int(rng.integers(6, 18))), (260, y + 32), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (10, 10, 10), 2)
+    return card
+
+
+def capture(card: np.ndarray, rng) -> np.ndarray:
+    """Kartın telefonla tekrar çekilmiş hali: Perspektif, ölçek, ışık, gürültü ve JPEG sıkıştırma."""
+    height, width = card.shape[:2]
+    corners = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    jitter = rng.uniform(-0.06, 0.06, (4, 2)).astype(np.float32) * [width, height]
+    scale = rng.uniform(0.7, 1.1)
+    size = (int(width * scale), int(height * scale))
+    homography = cv2.getPerspectiveTransform(corners, ((corners + jitter) * scale).astype(np.float32))
+    image = cv2.warpPerspective(card, homography, size, borderValue=tuple(int(c) for c in rng.integers(0, 256, 3)))
+    image = cv2.convertScaleAbs(image, alpha=rng.uniform(0.8, 1.2), beta=rng.uniform(-25, 25))
+    image = np.clip(image + rng.normal(0, 6, image.shape), 0, 255).astype(np.uint8)
+    _, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    return cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kart girişi ön eleme indeksi: Sentetik kartlarla recall@k ve gecikme")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Kayıtlı kart sayıları")
+    parser.add_argument("--rendered", type=int, default=1000, help="Görsel olarak üretilip ORB çıkarılan kart (fazlası bileşik kart)")
+    parser.add_argument("--queries", type=int, default=100, help="Tekrar çekilip aranan kart sayısı")
+    parser.add_argument("--k", default="1,5,10,20,50", help="recall@k için k değerleri")
+    parser.add_argument("--shortlist", type=int, default=10, help="İkinci aşamaya (ratio test) giden aday sayısı")
+    parser.add_argument("--words", type=int, default=CARD_VOCABULARY_WORDS, help="Sözlük kelime sayısı")
+    parser.add_argument("--rerank", type=int, default=CARD_SHORTLIST_RERANK, help="Hamming taramasından k x bu kadar aday kosinüsle sıralanır")
+    parser.add_argument("--train-cards", type=int, default=200, help="Sözlüğün eğitildiği kart sayısı")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    ks = [int(k) for k in args.k.split(",")]
+    rng = np.random.default_rng(args.seed)
+    matcher = CardMatcher(algorithm="orb")
+
+    # Kayıt: Kartların ORB tanımlayıcıları ve global tanımlayıcıları
+    print(f"⏳ {args.rendered} kart üretiliyor...")
+    cards, descriptors = [], []
+    for _ in range(args.rendered):
+        card = make_card(rng)
+        _, card_descriptors = matcher.extract_features(card)
+        cards.append(card)
+        descriptors.append(card_descriptors)
+
+    # Sözlük kayıtlı kartların bir kısmından eğitilir (canlıda: CARD_VOCABULARY_MIN_CARDS kart sonrası)
+    start = time.perf_counter()
+    vocabulary = BinaryVocabulary.train(descriptors[:args.train_cards], args.words)
+    train_s = time.perf_counter() - start
+    assignments = [vocabulary.assign(card_descriptors) for card_descriptors in descriptors]
+    vectors = [vocabulary.encode(assignment) for assignment in assignments]
+
+    # Sorgular: Kayıtlı kartların tekrar çekilmiş halleri
+    query_ids = rng.choice(args.rendered, min(args.queries, args.rendered), replace=False)
+    queries, extract_ms = [], []
+    for card_id in query_ids:
+        image = capture(cards[card_id], rng)
+        start = time.perf_counter()
+        keypoints, query_descriptors = matcher.extract_features(image)
+        query_vector = vocabulary.global_descriptor(query_descriptors)
+        extract_ms.append((time.perf_counter() - start) * 1000)
+        queries.append((int(card_id), len(keypoints), query_descriptors, query_vector))
+
+    # Bir eşleştirmenin (knnMatch + ratio test) maliyeti: Tam tarama tahmini ve ikinci aşama için
+    match_ms = []
+    for card_id, keypoint_count, query_descriptors, _ in queries[:20]:
+        other = int(rng.integers(0, args.rendered))
+        start = time.perf_counter()
+        matcher.match_features(keypoint_count, query_descriptors, len(descriptors[other]), descriptors[other])
+        match_ms.append((time.perf_counter() - start) * 1000)
+    match_ms = float(np.mean(match_ms))
+
+    print("\n" + "=" * 78)
+    print(f"KART ÖN ELEME İNDEKSİ ({vocabulary.size} kelime, {args.queries} sorgu, ikinci aşama k={args.shortlist})")
+    print("=" * 78)
+    recall_header = " ".join(f"{'@' + str(k):>6}" for k in ks)
+    print(f"{'kart':>8} {recall_header} {'arama ms':>9} {'2 aşama ms':>11} {'tam tarama ms':>14} {'bellek MB':>10}")
+
+    for size in sizes:
+        index = CardShortlistIndex(vocabulary.size)
+        for user_id in range(min(size, args.rendered)):
+            index.add(user_id, vectors[user_id])
+        # Üretilen karttan fazlası: İki farklı kartın tanımlayıcılarının yarısından oluşan bileşik kartlar
+        # (aynı düzen istatistiği, sorgu kartlarıyla ortak tanımlayıcı yok)
+        distractor_pool = np.setdiff1d(np.arange(args.rendered), query_ids)
+        for user_id in range(args.rendered, size):
+            first, second = rng.choice(distractor_pool, 2, replace=False)
+            half = len(assignments[first]) // 2
+            index.add(user_id, vocabulary.encode(np.concatenate([assignments[first][:half], assignments[second][half:]])))
+
+        hits = {k: 0 for k in ks}
+        search_ms, stage2_ms = [], []
+        for card_id, keypoint_count, query_descriptors, query_vector in queries:
+            start = time.perf_counter()
+            ranked = [user_id for user_id, _ in index.search(query_vector, max(ks + [args.shortlist]), args.rerank)]
+            search_ms.append((time.perf_counter() - start) * 1000)
+            for k in ks:
+                hits[k] += card_id in ranked[:k]
+
+            # İkinci aşama: Sadece adaylarla ratio-test eşleştirmesi (bileşik kartlar üretilen kartla eşleştirilir)
+            start = time.perf_counter()
+            for user_id in ranked[:args.shortlist]:
+                candidate = descriptors[user_id % args.rendered]
+                matcher.match_features(keypoint_count, query_descriptors, len(candidate), candidate)
+            stage2_ms.append((time.perf_counter() - start) * 1000)
+
+        recalls = " ".join(f"{hits[k] / len(queries):6.2f}" for k in ks)
+        print(f"{size:>8} {recalls} {np.percentile(search_ms, 50):9.2f} "
+              f"{np.percentile(search_ms, 50) + np.percentile(stage2_ms, 50):11.1f} {size * match_ms:14.0f} {index.memory_mb():10.1f}")
+
+    print("-" * 78)
+    print(f"Sözlük eğitimi        : {train_s:.1f} sn ({min(args.train_cards, args.rendered)} kart)")
+    print(f"Sorgu özellik çıkarımı: {np.percentile(extract_ms, 50):.1f} ms (global tanımlayıcı dahil)")
+    print(f"Tek kart eşleştirme   : {match_ms:.1f} ms (tam tarama = kart sayısı x bu süre)")
+    if max(sizes) > args.rendered:
+        print(f"Not: {args.rendered} karttan fazlası bileşik karttır (iki kartın tanımlayıcıları), görsel üretilmez")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
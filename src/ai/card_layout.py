@@ -0,0 +1,171 @@
+#Kart Yerleşim Motoru - OCR kutularından alan çıkarma (NumPy dizileri, sırala-tara satır birleştirme, y-indeksli etiket araması)
+
+import os
+import json
+
+import numpy as np
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+CARD_TEMPLATE_FILE = os.getenv("CARD_TEMPLATE_FILE", "")   # Boşsa DEFAULT_TEMPLATE kullanılır
+
+# ---------------------------------------------------------
+# ŞABLON
+# Kart düzeni bildirimsel olarak tanımlanır; başka bir kart tipi için aynı yapıda bir JSON dosyası
+# CARD_TEMPLATE_FILE ile verilir. Koordinatlar piksel, *_ratio değerleri kart yüksekliğine oranla.
+# ---------------------------------------------------------
+DEFAULT_TEMPLATE = {
+    "fields": ["Sirket", "Isim_Soyisim", "Unvan", "ID_Sicil", "Email", "Konum", "Dogum_Tarihi", "Cinsiyet"],
+    # Aynı satır sayılacak kutuların dikey merkez farkı (px)
+    "line_merge_threshold": 20,
+    # Üst bölgedeki (yükseklik x max_y_ratio) en alttaki satır (logo yazısı atlanır)
+    "header": {"field": "Sirket", "max_y_ratio": 0.25},
+    # Yüzün altındaki (yükseklik x max_dy_ratio) ilk satırlar sırasıyla bu alanlara
+    "below_face": {"fields": ["Isim_Soyisim", "Unvan"], "max_dy_ratio": 0.3},
+    # Etiket kutusu -> altındaki değer kutusu. Sıra önemli: Bir kutuda ilk eşleşen etiket kullanılır
+    "anchors": [
+        {"text": "ID / SICIL NO", "field": "ID_Sicil"},
+        {"text": "EMAIL", "field": "Email"},
+        {"text": "KONUM", "field": "Konum"},
+        {"text": "DOĞUM T.", "field": "Dogum_Tarihi"},
+        {"text": "CINSIYET", "field": "Cinsiyet"},
+        {"text": "DOĞUM", "field": "Dogum_Tarihi"},
+        {"text": "ID", "field": "ID_Sicil"}
+    ],
+    # Değer kutusu etiketin altında: Üst kenar farkı < max_dy, yatay merkez farkı < max_dx
+    "value_window": {"max_dx": 200, "max_dy": 120}
+}
+
+
+def load_template() -> dict:
+    """CARD_TEMPLATE_FILE verilmişse JSON şablon, yoksa DEFAULT_TEMPLATE."""
+    if not CARD_TEMPLATE_FILE:
+        return DEFAULT_TEMPLATE
+    with open(CARD_TEMPLATE_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class CardLayout:
+    """
+    EasyOCR sonucu [(4 köşe, metin, güven)] NumPy dizilerine çevrilir, alanlar şablona göre çıkarılır.
+    - Satır birleştirme: Kutular dikey merkeze göre bir kez sıralanır, tek geçişte (sweep) gruplanır.
+    - Etiket -> değer: Kutular üst kenara göre sıralı bir indekste tutulur; her etiketin dikey penceresi
+      searchsorted (bisect) ile bulunur, sadece penceredeki kutular yatay mesafe için vektörel filtrelenir.
+    Toplam maliyet O(n log n); eski iç içe döngülü arama (etiket x kutu) ile aynı sonucu verir.
+    """
+
+    def __init__(self, template: dict = None):
+        self.template = template or load_template()
+        self.fields = list(self.template["fields"])
+        self.line_merge_threshold = self.template.get("line_merge_threshold", 20)
+        self.anchors = [(anchor["text"], anchor["field"]) for anchor in self.template.get("anchors", [])]
+        window = self.template.get("value_window", {})
+        self.max_dx = window.get("max_dx", 200)
+        self.max_dy = window.get("max_dy", 120)
+
+    @staticmethod
+    def _arrays(raw_data):
+        """Kutu köşeleri (n, 4, 2) ve metinler."""
+        if not raw_data:
+            return np.zeros((0, 4, 2)), []
+        points = np.asarray([bbox for bbox, _, _ in raw_data], dtype=np.float64).reshape(len(raw_data), 4, 2)
+        return points, [text for _, text, _ in raw_data]
+
+    def merge_lines(self, points: np.ndarray, texts: list):
+        """
+        Aynı satırdaki kutuları birleştirir.
+        Kutular dikey merkeze göre sıralanır; satırın ilk kutusuna dikey uzaklığı eşikten küçük olanlar aynı satırdır.
+        Dönüş: (satır kutuları (m, 4) [min_x, min_y, max_x, max_y], satır metinleri); yukarıdan aşağıya sıralı
+        """
+        if len(texts) == 0:
+            return np.zeros((0, 4)), []
+        center_y = (points[:, 0, 1] + points[:, 2, 1]) / 2
+        order = np.argsort(center_y, kind="stable")
+
+        # Sweep: Satır başı kutunun merkezinden eşik kadar uzaklaşınca yeni satır başlar
+        line_starts = [0]
+        line_center = center_y[order[0]]
+        for position in range(1, len(order)):
+            if abs(center_y[order[position]] - line_center) >= self.line_merge_threshold:
+                line_starts.append(position)
+                line_center = center_y[order[position]]
+        line_ends = line_starts[1:] + [len(order)]
+
+        line_boxes = np.empty((len(line_starts), 4))
+        line_texts = []
+        for line, (begin, end) in enumerate(zip(line_starts, line_ends)):
+            members = order[begin:end]
+            members = members[np.argsort(points[members, 0, 0], kind="stable")]  # Soldan sağa
+            line_texts.append(" ".join(texts[i] for i in members))
+            line_boxes[line] = (points[members, 0, 0].min(), points[members, 0, 1].min(),
+                                points[members, 2, 0].max(), points[members, 2, 1].max())
+        return line_boxes, line_texts
+
+    def _find_anchor_values(self, points: np.ndarray, texts: list) -> dict:
+        """Etiket kutularının altındaki en yakın değer kutusu. Dönüş: {alan: değer}"""
+        values = {}
+        anchor_boxes = []
+        for index, text in enumerate(texts):
+            clean_text = text.upper().strip()
+            for anchor_text, field in self.anchors:
+                if anchor_text in clean_text:
+                    anchor_boxes.append((index, field))
+                    break
+        if not anchor_boxes:
+            return values
+
+        # y-indeksi: Üst kenara göre sıralı (eşitlikte orijinal sıra -> eski aramadaki ilk bulunan kazanır)
+        top_y = points[:, 0, 1]
+        center_x = (points[:, 0, 0] + points[:, 1, 0]) / 2
+        order = np.argsort(top_y, kind="stable")
+        sorted_top = top_y[order]
+
+        for index, field in anchor_boxes:
+            anchor_bottom = points[index, 2, 1]
+            # Pencere: anchor_bottom < üst kenar < anchor_bottom + max_dy
+            begin = np.searchsorted(sorted_top, anchor_bottom, side="right")
+            end = np.searchsorted(sorted_top, anchor_bottom + self.max_dy, side="left")
+            if begin >= end:
+                continue
+            candidates = order[begin:end]
+            mask = np.abs(center_x[candidates] - center_x[index]) < self.max_dx
+            # Etiketin kendisiyle aynı koordinatlı kutu değer olamaz
+            mask &= ~np.all(points[candidates] == points[index], axis=(1, 2))
+            if not mask.any():
+                continue
+            # Pencere üst kenara göre sıralı: İlk uygun kutu en yakın olandır
+            best_match = texts[candidates[np.argmax(mask)]]
+            if best_match and (values.get(field) is None or len(best_match) > len(values[field])):
+                values[field] = best_match
+        return values
+
+    def parse(self, raw_data, width: int, height: int, face_bottom_y: float = None) -> dict:
+        """
+        OCR sonucundan kart alanlarını çıkarır.
+        face_bottom_y: Tespit edilen yüzün alt kenarı (yüz yoksa None, yüz altı alanlar doldurulmaz).
+        """
+        parsed = {field: None for field in self.fields}
+        points, texts = self._arrays(raw_data)
+        line_boxes, line_texts = self.merge_lines(points, texts)
+        line_center_y = (line_boxes[:, 1] + line_boxes[:, 3]) / 2
+
+        # A. Üst bölgedeki en alttaki satır (eşitlikte sonraki satır)
+        header = self.template.get("header")
+        if header and len(line_texts):
+            candidates = np.flatnonzero(line_center_y < height * header["max_y_ratio"])
+            if len(candidates):
+                lowest = candidates[line_center_y[candidates] == line_center_y[candidates].max()][-1]
+                parsed[header["field"]] = line_texts[lowest]
+
+        # B. Yüzün altındaki satırlar (isim, unvan)
+        below_face = self.template.get("below_face")
+        if below_face and face_bottom_y is not None:
+            limit = face_bottom_y + height * below_face["max_dy_ratio"]
+            candidates = np.flatnonzero((line_center_y > face_bottom_y) & (line_center_y < limit))
+            for field, line in zip(below_face["fields"], candidates):
+                parsed[field] = line_texts[line]
+
+        # C. Etiket bazlı arama
+        for field, value in self._find_anchor_values(points, texts).items():
+            if parsed[field] is None or len(value) > len(parsed[field]):
+                parsed[field] = value
+        return parsed
@@ -0,0 +1,372 @@
+#Kart Eşleştirme Havuzu - Kayıtlı kartlar süreç havuzunda shard'lara bölünür, sorgu tüm shard'lara yayınlanır, en iyi sonuçlar birleştirilir
+
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+try:
+    from .executors import ExecutorOverloaded
+except ImportError:
+    from executors import ExecutorOverloaded
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+CARD_MATCH_WORKERS = int(os.getenv("CARD_MATCH_WORKERS", "0"))                 # Shard (süreç) sayısı, 0 = kapalı (inference thread'inde eşleştirme)
+CARD_SHARD_POLICY = os.getenv("CARD_SHARD_POLICY", "least_loaded").lower()    # least_loaded (yeni kart en küçük shard'a) | hash (user_id % shard)
+CARD_SHARD_IMBALANCE = float(os.getenv("CARD_SHARD_IMBALANCE", "1.25"))       # least_loaded: en büyük / en küçük shard bunu aşınca kart taşınır
+CARD_MATCH_MAX_PENDING = int(os.getenv("CARD_MATCH_MAX_PENDING", "16"))       # Aynı anda havuzda çalışan + bekleyen maksimum sorgu (aşılırsa 503)
+CARD_VERIFY_TOP = int(os.getenv("CARD_VERIFY_TOP", "3"))                      # card_matcher ile aynı: RANSAC'a giren en iyi aday
+
+
+# ---------------------------------------------------------
+# WORKER SÜRECİ
+# Her shard tek süreçlik bir ProcessPoolExecutor'dır: Shard'ın kartları o sürecin belleğinde decode edilmiş
+# (numpy) olarak durur, sorgularda tekrar gönderilmez / decode edilmez.
+# ---------------------------------------------------------
+_matcher = None
+_shard = {}  # user_id -> (keypoint_count, keypoints (n, 6), tanımlayıcılar, ham kayıt)
+
+
+def _worker_init():
+    global _matcher
+    import cv2
+    try:
+        from .card_matcher import CardMatcher
+    except ImportError:
+        from card_matcher import CardMatcher
+    cv2.setNumThreads(1)  # Paralellik süreç sayısından gelir
+    _matcher = CardMatcher(algorithm="orb")
+
+
+def _shard_add(cards: list) -> int:
+    """cards: [(user_id, keypoint_count, keypoint_blob, descriptor_blob)]. Kullanıcının kaydı varsa değiştirilir."""
+    for card in cards:
+        user_id, keypoint_count, keypoint_blob, descriptor_blob = card
+        _shard[user_id] = (keypoint_count, _matcher.unpack_keypoints(keypoint_blob),
+                           _matcher.unpack_descriptors(descriptor_blob), card)
+    return len(_shard)
+
+
+def _shard_take(user_ids: list) -> list:
+    """Kartları shard'dan çıkarır ve ham kayıtlarını döner."""
+    return [_shard.pop(user_id)[3] for user_id in user_ids if user_id in _shard]
+
+
+def _shard_get(user_ids: list) -> list:
+    """Kartların ham kayıtlarını döner, shard'da bırakır (başka shard'a kopyalamak için)."""
+    return [_shard[user_id][3] for user_id in user_ids if user_id in _shard]
+
+
+def _shard_rank(points, descriptors) -> list:
+    """1. aşama: Shard'daki kartlara ucuz skor (CardMatcher.rank_candidates). Dönüş: [(user_id, skor)]"""
+    candidates = [(user_id, count, keypoints, stored) for user_id, (count, keypoints, stored, _) in _shard.items()]
+    scores = _matcher.rank_candidates(points, descriptors, candidates)
+    return [(card[0], score) for card, score in zip(candidates, scores)]
+
+
+def _shard_verify(points, descriptors, user_ids: list, min_confidence: float) -> dict:
+    """2. aşama: Verilen sırayla tam eşleştirme + RANSAC, erken kabul (CardMatcher.verify_candidates, sıralamasız)."""
+    candidates = [(user_id, *_shard[user_id][:3]) for user_id in user_ids if user_id in _shard]
+    return _matcher.verify_candidates(points, descriptors, candidates, min_confidence, verify_top=max(1, len(candidates)))
+
+
+def _shard_ping() -> int:
+    return os.getpid()
+
+
+class CardMatchPool:
+    """
+    Tam taramada kart eşleştirmesini süreçlere dağıtır.
+    - Her shard ayrı bir süreç; kayıtlı kartlar shard'lara bölünür ve süreçlerde sıcak tutulur.
+    - search: Sorgu tüm shard'lara aynı anda gönderilir, shard'lar kendi kartlarını sıralar; genel en iyi adaylar
+      sahibi shard'larda doğrulanır, en yüksek güven kazanır (tek süreçteki aşamalı doğrulamayla aynı aday seti).
+    - Yerleşim: least_loaded -> yeni kart en küçük shard'a, silmelerden sonra dengesizlik CARD_SHARD_IMBALANCE'ı
+      aşarsa kartlar büyük shard'dan küçüğe taşınır. hash -> user_id % shard (taşıma yok).
+    - add / remove / rebalance shard sonuçlarını bekler (bloklar): Event loop dışında (thread'de) çağrılmalıdır.
+    - Ölen shard süreci (BrokenProcessPool) yeniden başlatılır, kartları unutulur ve generation artar;
+      sahibi (sync_card_match_pool) generation değişince kartları veritabanından tekrar yükler.
+    """
+
+    def __init__(self, workers: int = CARD_MATCH_WORKERS, policy: str = CARD_SHARD_POLICY,
+                 imbalance: float = CARD_SHARD_IMBALANCE, max_pending: int = CARD_MATCH_MAX_PENDING):
+        self.workers = max(1, workers)
+        self.policy = policy
+        self.imbalance = imbalance
+        self.max_pending = max(1, max_pending)
+        self._context = multiprocessing.get_context("spawn")  # Thread'li ana süreçten fork edilmez
+        self._shards = [self._new_shard() for _ in range(self.workers)]
+        self._owners = {}  # user_id -> shard
+        self._stamps = {}  # user_id -> son yüklenen kaydın zamanı (değişmeyen kart tekrar gönderilmez)
+        self._sizes = [0] * self.workers
+        self._lock = threading.Lock()        # Sahiplik ve sayaçlar (kısa süreli, aramalar da alır)
+        self._write_lock = threading.Lock()  # add / remove / rebalance sırayla çalışır (taşınan kart eşzamanlı güncellenmesin)
+        self.generation = 0                  # Her shard yeniden başlatıldığında artar
+        self._moved = 0
+        self._pending = 0
+        self._rejected = 0
+        self._respawns = 0
+
+    def __len__(self):
+        return len(self._owners)
+
+    def __contains__(self, user_id):
+        return user_id in self._owners
+
+    def _new_shard(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=1, mp_context=self._context, initializer=_worker_init)
+
+    def _respawn(self, index: int, broken: ProcessPoolExecutor):
+        """Süreci ölen shard'ı yenisiyle değiştirir; shard'ın kartları unutulur (sahibi tekrar yükler)."""
+        with self._lock:
+            if self._shards[index] is not broken:
+                return  # Başka bir çağrı zaten yeniledi
+            self._shards[index] = self._new_shard()
+            lost = [user_id for user_id, shard in self._owners.items() if shard == index]
+            for user_id in lost:
+                del self._owners[user_id]
+                self._stamps.pop(user_id, None)
+            self._sizes[index] = 0
+            self.generation += 1
+            self._respawns += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+        print(f"⚠️ Kart eşleştirme shard'ı #{index} kapandı, yeniden başlatıldı ({len(lost)} kart tekrar yüklenecek)")
+
+    def _submit(self, index: int, fn, *args):
+        """Dönüş: (executor, future). Shard zaten bozuksa yenilenir ve future None olur."""
+        shard = self._shards[index]
+        try:
+            return shard, shard.submit(fn, *args)
+        except BrokenProcessPool:
+            self._respawn(index, shard)
+            return shard, None
+
+    def _wait(self, index: int, submitted):
+        """Bloklayan bekleme; shard süreci öldüyse shard yenilenir ve None döner."""
+        shard, future = submitted
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            self._respawn(index, shard)
+            return None
+
+    async def _run(self, index: int, fn, *args):
+        """search için: Shard süreci öldüyse shard yenilenir ve ExecutorOverloaded (503, istemci tekrar dener) fırlatılır."""
+        shard, future = self._submit(index, fn, *args)
+        try:
+            if future is None:
+                raise BrokenProcessPool(f"shard #{index}")
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            self._respawn(index, shard)
+            raise ExecutorOverloaded("card_match")
+
+    def warm_up(self):
+        """Süreçleri başlatır (spawn + cv2 import ilk sorguda beklenmesin). Bloklar: Event loop dışında çağrılmalıdır."""
+        submitted = [self._submit(i, _shard_ping) for i in range(self.workers)]
+        for i, item in enumerate(submitted):
+            self._wait(i, item)
+
+    def _place(self, user_id: int) -> int:
+        if self.policy == "hash":
+            return user_id % self.workers
+        return int(np.argmin(self._sizes))
+
+    def add(self, cards: list, stamps: list = None):
+        """
+        cards: [(user_id, keypoint_count, keypoint_blob, descriptor_blob)] (get_card_descriptors satırları).
+        stamps: Kartların güncellenme zamanları; aynı zamanla tekrar gelen kart shard'a gönderilmez.
+        """
+        with self._write_lock:
+            batches = [[] for _ in self._shards]
+            with self._lock:
+                for card, stamp in zip(cards, stamps or [None] * len(cards)):
+                    user_id = card[0]
+                    if stamp is not None and self._stamps.get(user_id) == stamp:
+                        continue
+                    shard = self._owners.get(user_id)
+                    if shard is None:
+                        shard = self._place(user_id)
+                        self._owners[user_id] = shard
+                        self._sizes[shard] += 1
+                    self._stamps[user_id] = stamp
+                    batches[shard].append(tuple(card))
+            submitted = {i: self._submit(i, _shard_add, batch) for i, batch in enumerate(batches) if batch}
+            for i, item in submitted.items():
+                self._wait(i, item)
+
+    def remove(self, user_ids):
+        with self._write_lock:
+            batches = [[] for _ in self._shards]
+            with self._lock:
+                for user_id in user_ids:
+                    shard = self._owners.pop(user_id, None)
+                    if shard is not None:
+                        self._stamps.pop(user_id, None)
+                        self._sizes[shard] -= 1
+                        batches[shard].append(user_id)
+            submitted = {i: self._submit(i, _shard_take, batch) for i, batch in enumerate(batches) if batch}
+            for i, item in submitted.items():
+                self._wait(i, item)
+        self.rebalance()
+
+    def rebalance(self) -> int:
+        """
+        least_loaded: En büyük shard en küçüğün imbalance katını aşarsa aradaki farkın yarısı taşınır. Dönüş: Taşınan kart
+        Kartlar önce hedefe kopyalanır, sahiplik kilit altında değiştirilir, sonra kaynaktan silinir:
+        Eşzamanlı arama kartı her an sahibi olarak görünen shard'da bulur.
+        """
+        if self.policy != "least_loaded" or self.workers < 2:
+            return 0
+        moved = 0
+        with self._write_lock:
+            while True:
+                with self._lock:
+                    largest, smallest = int(np.argmax(self._sizes)), int(np.argmin(self._sizes))
+                    gap = self._sizes[largest] - self._sizes[smallest]
+                    if gap < 2 or self._sizes[largest] <= self._sizes[smallest] * self.imbalance:
+                        break
+                    user_ids = [u for u, shard in self._owners.items() if shard == largest][:gap // 2]
+                    generation = self.generation
+
+                cards = self._wait(largest, self._submit(largest, _shard_get, user_ids))
+                if cards is None or self._wait(smallest, self._submit(smallest, _shard_add, cards)) is None:
+                    break  # Shard yeniden başlatıldı, kartlar sahibince tekrar yüklenecek
+                copied = [card[0] for card in cards]
+                if not copied:
+                    break
+                with self._lock:
+                    if self.generation != generation:
+                        break
+                    for user_id in copied:
+                        self._owners[user_id] = smallest
+                    self._sizes[largest] -= len(copied)
+                    self._sizes[smallest] += len(copied)
+                self._wait(largest, self._submit(largest, _shard_take, copied))
+                moved += len(copied)
+        self._moved += moved
+        return moved
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise ExecutorOverloaded("card_match")
+            self._pending += 1
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    @staticmethod
+    def merge(outcomes: list) -> dict:
+        """Shard doğrulama sonuçlarından en yüksek güvenli eşleşme (verify_candidates sonuç formatında)."""
+        best = {"user_id": None, "confidence": 0, "details": None, "early_accept": False,
+                "ranked": 0, "verified": 0, "timings": {"rank_ms": 0.0, "verify_ms": 0.0}}
+        for outcome in outcomes:
+            if outcome["user_id"] is not None and outcome["confidence"] > best["confidence"]:
+                best.update(user_id=outcome["user_id"], confidence=outcome["confidence"], details=outcome["details"],
+                            early_accept=outcome["early_accept"])
+            best["verified"] += outcome["verified"]
+        return best
+
+    async def search(self, points, descriptors, min_confidence: float = 0.0, verify_top: int = None) -> dict:
+        """
+        Tek süreçteki CardMatcher.verify_candidates ile aynı karar, iki yayında:
+        1) Sorgu kartı olan bütün shard'lara gönderilir, her shard kendi kartlarını ucuz skorlar (paralel).
+        2) Skorlar birleştirilir, genel en iyi verify_top aday sahibi shard'larda RANSAC ile doğrulanır.
+        Kart sayısı verify_top'u geçmiyorsa 1. aşama atlanır. Havuz doluysa ExecutorOverloaded (503).
+        Dönüş: verify_candidates sonucu + "shards", "timings.pool_ms"
+        """
+        verify_top = verify_top or CARD_VERIFY_TOP
+        self._acquire()
+        try:
+            start = time.perf_counter()
+            with self._lock:
+                shards = [i for i, size in enumerate(self._sizes) if size]
+                top = list(self._owners) if len(self._owners) <= verify_top else None
+            if descriptors is None or len(descriptors) == 0 or not shards:
+                outcome = self.merge([])
+            else:
+                ranked = 0
+                if top is None:
+                    scores = await asyncio.gather(*(self._run(i, _shard_rank, points, descriptors) for i in shards))
+                    scores = [item for shard_scores in scores for item in shard_scores]
+                    ranked = len(scores)
+                    # Taşınan kart kısa süre iki shard'da olabilir: Kullanıcı bir kez sayılır
+                    top = list(dict.fromkeys(user_id for user_id, _ in sorted(scores, key=lambda item: -item[1])))[:verify_top]
+                rank_ms = (time.perf_counter() - start) * 1000
+
+                verify_start = time.perf_counter()
+                groups = {}
+                with self._lock:
+                    for user_id in top:
+                        if user_id in self._owners:
+                            groups.setdefault(self._owners[user_id], []).append(user_id)
+                outcome = self.merge(await asyncio.gather(*(
+                    self._run(i, _shard_verify, points, descriptors, user_ids, min_confidence)
+                    for i, user_ids in groups.items()
+                )))
+                outcome["ranked"] = ranked
+                outcome["timings"] = {"rank_ms": round(rank_ms, 2),
+                                      "verify_ms": round((time.perf_counter() - verify_start) * 1000, 2)}
+        finally:
+            self._release()
+        outcome["shards"] = len(shards)
+        outcome["timings"]["pool_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return outcome
+
+    def match(self, points, descriptors, min_confidence: float = 0.0, verify_top: int = None) -> dict:
+        """search'in bloklayan sürümü (benchmark / script; çalışan bir event loop içinde kullanılmaz)."""
+        return asyncio.run(self.search(points, descriptors, min_confidence, verify_top))
+
+    def shutdown(self):
+        for shard in self._shards:
+            shard.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "policy": self.policy,
+            "cards": len(self._owners),
+            "shard_sizes": list(self._sizes),
+            "moved": self._moved,
+            "respawns": self._respawns,
+            "generation": self.generation,
+            "pending": self._pending,
+            "rejected": self._rejected
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_card_match_pool():
+    """
+    Süreç başına tek havuz (CARD_MATCH_WORKERS=0 ise None). İlk çağrıda süreçler başlatılır (bloklar):
+    Uygulama açılışında (lifespan) thread'de çağrılır.
+    """
+    global _pool
+    if CARD_MATCH_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = CardMatchPool()
+            _pool.warm_up()
+            print(f"✅ Kart eşleştirme havuzu başlatıldı ({_pool.workers} shard, {_pool.policy})")
+        return _pool
+
+
+def shutdown_card_match_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
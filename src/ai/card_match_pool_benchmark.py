@@ -0,0 +1,85 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from card_matcher import CardMatcher
+from card_match_pool import CardMatchPool
+from card_index_benchmark import make_card, capture
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kart eşleştirme havuzu: Tam taramada giriş gecikmesinin shard (süreç) sayısıyla ölçeklenmesi")
+    parser.add_argument("--cards", type=int, default=300, help="Kayıtlı sentetik kart sayısı")
+    parser.add_argument("--workers", default="1,2,4", help="Denenecek shard sayıları")
+    parser.add_argument("--queries", type=int, default=10, help="Tekrar çekilmiş kayıtlı kart sorgusu")
+    parser.add_argument("--min-confidence", type=float, default=60, help="Kabul için en az güven (login_with_card: 60)")
+    parser.add_argument("--policy", default="least_loaded", help="Shard yerleşimi: least_loaded | hash")
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args()
+
+    workers = [int(count) for count in args.workers.split(",")]
+    rng = np.random.default_rng(args.seed)
+    matcher = CardMatcher(algorithm="orb")
+
+    print(f"⏳ {args.cards} kart üretiliyor...")
+    cards, rows, candidates = [], [], []
+    for user_id in range(args.cards):
+        card = make_card(rng)
+        keypoints, descriptors = matcher.extract_features(card)
+        keypoint_blob, descriptor_blob, keypoint_count = matcher.pack_features(keypoints, descriptors)
+        cards.append(card)
+        rows.append((user_id, keypoint_count, keypoint_blob, descriptor_blob))
+        candidates.append((user_id, keypoint_count, matcher.keypoint_array(keypoints), descriptors))
+
+    queries = []
+    for card_id in rng.integers(0, args.cards, args.queries):
+        keypoints, descriptors = matcher.extract_features(capture(cards[card_id], rng))
+        queries.append((int(card_id), matcher.keypoint_array(keypoints), descriptors))
+
+    def run(search):
+        latencies, decisions = [], []
+        for card_id, points, descriptors in queries:
+            start = time.perf_counter()
+            decisions.append(search(points, descriptors))
+            latencies.append((time.perf_counter() - start) * 1000)
+        hits = sum(user_id == card_id for user_id, (card_id, _, _) in zip(decisions, queries))
+        return np.array(latencies), hits / len(queries), decisions
+
+    # Referans: Tek süreç, inference thread'inde tam tarama (CARD_MATCH_WORKERS=0)
+    baseline, baseline_hits, expected = run(
+        lambda p, d: matcher.verify_candidates(p, d, candidates, args.min_confidence)["user_id"])
+
+    print("\n" + "=" * 84)
+    print(f"KART EŞLEŞTİRME HAVUZU ({args.cards} kart, {len(queries)} sorgu, {os.cpu_count()} CPU, {args.policy})")
+    print("=" * 84)
+    print(f"{'shard':>6} {'yükleme sn':>11} {'shard boyları':>18} {'eşleşme':>8} {'aynı karar':>11} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'hızlanma':>9}")
+    print(f"{'0':>6} {'-':>11} {'-':>18} {baseline_hits:>8.2f} {1.0:>11.2f} {np.percentile(baseline, 50):>8.0f} "
+          f"{np.percentile(baseline, 95):>8.0f} {1.0:>9.2f}")
+
+    for count in workers:
+        pool = CardMatchPool(workers=count, policy=args.policy)
+        try:
+            pool.warm_up()
+            start = time.perf_counter()
+            pool.add(rows)
+            load_s = time.perf_counter() - start
+            pool.match(*queries[0][1:], args.min_confidence)  # Isınma
+            latencies, hits, decisions = run(lambda p, d: pool.match(p, d, args.min_confidence)["user_id"])
+            same = np.mean([a == b for a, b in zip(decisions, expected)])
+            sizes = ",".join(str(size) for size in pool.stats()["shard_sizes"])
+            print(f"{count:>6} {load_s:>11.1f} {sizes:>18} {hits:>8.2f} {same:>11.2f} {np.percentile(latencies, 50):>8.0f} "
+                  f"{np.percentile(latencies, 95):>8.0f} {np.percentile(baseline, 50) / np.percentile(latencies, 50):>9.2f}")
+        finally:
+            pool.shutdown()
+
+    print("-" * 84)
+    print("0 shard: Havuzsuz tam tarama (tek thread). Hızlanma p50 gecikmeye göre; shard sayısı CPU sayısını aşınca artmaz.")
+    print("eşleşme: Doğru kullanıcı eşleşti (is_match + RANSAC). aynı karar: Sonuç havuzsuz tam taramayla aynı.")
+    print("=" * 84)
+
+
+if __name__ == "__main__":
+    main()
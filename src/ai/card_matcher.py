@@ -1,7 +1,22 @@
+import os
+import time
 import cv2
 import numpy as np
 from PIL import Image
 import io
+import base64
+
+# Kayıtlı kart tanımlayıcılarının sürümü: Ön işleme / dedektör ayarı değişirse artırılır,
+# eski sürümlü kayıtlar tekrar hesaplanır (bkz. src/auth/card_backfill.py)
+FEATURE_VERSION = "v1"
+
+# Ayarlar (.env üzerinden değiştirilebilir) - Aşamalı doğrulama (verify_candidates)
+CARD_RANK_FEATURES = int(os.getenv("CARD_RANK_FEATURES", "300"))                   # Ucuz sıralamada kullanılan en güçlü sorgu keypoint'i
+CARD_VERIFY_TOP = int(os.getenv("CARD_VERIFY_TOP", "3"))                           # Tam eşleştirme + RANSAC'a giren en iyi aday
+CARD_MIN_INLIERS = int(os.getenv("CARD_MIN_INLIERS", "15"))                        # Kabul için en az homografi inlier'ı
+CARD_ACCEPT_INLIERS = int(os.getenv("CARD_ACCEPT_INLIERS", "60"))                  # Erken kabul: Bu kadar inlier ...
+CARD_ACCEPT_INLIER_RATIO = float(os.getenv("CARD_ACCEPT_INLIER_RATIO", "0.5"))     # ... ve iyi eşleşmelerin bu oranı inlier ise arama biter
+CARD_RANSAC_THRESHOLD = float(os.getenv("CARD_RANSAC_THRESHOLD", "5.0"))           # RANSAC yeniden izdüşüm hatası (px)
 
 class CardMatcher:
     """
@@ -26,6 +41,11 @@ class CardMatcher:
         else:
             self.detector = cv2.ORB_create(nfeatures=2000)
         
+        # Tanımlayıcı formatı (ORB: 32 byte uint8, SIFT: 128 float32)
+        self.descriptor_dtype = np.float32 if self.algorithm == "sift" else np.uint8
+        self.descriptor_size = self.detector.descriptorSize()
+        self.feature_version = f"{self.algorithm}-{FEATURE_VERSION}"
+        
         # Matcher (eşleştirici)
         if self.algorithm == "sift":
             self.matcher = cv2.BFMatcher(cv2.NORM_L2, crossCheck=False)
@@ -56,6 +76,15 @@ class CardMatcher:
         
         return enhanced
     
+    @staticmethod
+    def load_image(image):
+        """Base64 string (data URL olabilir) ise PIL Image'a çevirir, diğer tipleri olduğu gibi döner."""
+        if isinstance(image, str):
+            if image.startswith('data:image'):
+                image = image.split('base64,')[1] if 'base64,' in image else image
+            image = Image.open(io.BytesIO(base64.b64decode(image)))
+        return image
+    
     def extract_features(self, image):
         """
         Görselden özellik çıkarımı yapar
@@ -84,57 +113,49 @@ class CardMatcher:
         }
         """
         try:
-            # Base64 string kontrolü ve dönüşümü
-            import base64
-            
-            for idx, img in enumerate([card_image1, card_image2]):
-                if isinstance(img, str):
-                    if img.startswith('data:image'):
-                        img = img.split('base64,')[1] if 'base64,' in img else img
-                    
-                    image_bytes = base64.b64decode(img)
-                    img = Image.open(io.BytesIO(image_bytes))
-                    
-                    if idx == 0:
-                        card_image1 = img
-                    else:
-                        card_image2 = img
-            
             # Özellik çıkarımı
-            kp1, desc1 = self.extract_features(card_image1)
-            kp2, desc2 = self.extract_features(card_image2)
-            
-            if desc1 is None or desc2 is None:
+            kp1, desc1 = self.extract_features(self.load_image(card_image1))
+            kp2, desc2 = self.extract_features(self.load_image(card_image2))
+            return self.match_features(len(kp1), desc1, len(kp2), desc2, threshold)
+        
+        except Exception as e:
+            return {
+                "is_match": False,
+                "confidence": 0.0,
+                "error": str(e)
+            }
+    
+    def _good_matches(self, desc1, desc2, threshold):
+        """KNN (k=2) + Lowe's ratio test. Dönüş: (tüm eşleşme sayısı, iyi eşleşmeler [DMatch])"""
+        matches = self.matcher.knnMatch(desc1, desc2, k=2)
+        
+        good_matches = []
+        for match_pair in matches:
+            if len(match_pair) == 2:
+                m, n = match_pair
+                if m.distance < threshold * n.distance:
+                    good_matches.append(m)
+        return len(matches), good_matches
+    
+    def match_features(self, keypoint_count1, desc1, keypoint_count2, desc2, threshold=0.75, points1=None, points2=None):
+        """
+        Önceden çıkarılmış iki tanımlayıcı setini karşılaştırır (match_cards ile aynı karar ve skor).
+        Kayıtlı kartlarda tanımlayıcılar veritabanından gelir, görsel tekrar işlenmez.
+        points1 / points2 (keypoint_array formatı) verilirse iyi eşleşmeler RANSAC homografi ile de doğrulanır:
+        Sonuca inliers ve inlier_ratio eklenir, CARD_MIN_INLIERS altındaki eşleşme reddedilir.
+        """
+        try:
+            if desc1 is None or desc2 is None or len(desc1) == 0 or len(desc2) == 0:
                 return {
                     "is_match": False,
                     "confidence": 0.0,
                     "error": "Özellikleri çıkarılamadı. Görsel kalitesi düşük olabilir."
                 }
             
-            # Eşleştirme
-            if self.algorithm == "sift":
-                # SIFT için KNN matcher
-                matches = self.matcher.knnMatch(desc1, desc2, k=2)
-                
-                # Lowe's ratio test
-                good_matches = []
-                for match_pair in matches:
-                    if len(match_pair) == 2:
-                        m, n = match_pair
-                        if m.distance < threshold * n.distance:
-                            good_matches.append(m)
-            else:
-                # ORB için KNN matcher
-                matches = self.matcher.knnMatch(desc1, desc2, k=2)
-                
-                good_matches = []
-                for match_pair in matches:
-                    if len(match_pair) == 2:
-                        m, n = match_pair
-                        if m.distance < threshold * n.distance:
-                            good_matches.append(m)
+            # Eşleştirme (KNN + Lowe's ratio test)
+            total_matches, good_matches = self._good_matches(desc1, desc2, threshold)
             
-            total_features = min(len(kp1), len(kp2))
+            total_features = min(keypoint_count1, keypoint_count2)
             match_ratio = len(good_matches) / total_features if total_features > 0 else 0
             
             # Benzerlik skoru hesaplama
@@ -143,14 +164,23 @@ class CardMatcher:
             # Eşleşme kararı (en az 30 iyi eşleşme VE %20 benzerlik)
             is_match = len(good_matches) >= 30 and similarity_score >= 20
             
-            return {
+            result = {
                 "is_match": is_match,
                 "confidence": round(similarity_score, 2),
                 "good_matches": len(good_matches),
-                "total_matches": len(matches) if self.algorithm == "sift" else len(matches),
+                "total_matches": total_matches,
                 "similarity_score": round(similarity_score, 2),
                 "algorithm": self.algorithm.upper()
             }
+            
+            # Geometrik doğrulama: Aynı kartın eşleşmeleri tek bir perspektif dönüşümüne (homografi) uyar
+            if points1 is not None and points2 is not None:
+                inliers, inlier_ratio = self.verify_geometry(points1, points2, good_matches)
+                result["inliers"] = inliers
+                result["inlier_ratio"] = round(inlier_ratio, 3)
+                result["is_match"] = is_match and inliers >= CARD_MIN_INLIERS
+            
+            return result
         
         except Exception as e:
             return {
@@ -158,3 +188,97 @@ class CardMatcher:
                 "confidence": 0.0,
                 "error": str(e)
             }
+    
+    @staticmethod
+    def verify_geometry(points1, points2, good_matches, reprojection_threshold=CARD_RANSAC_THRESHOLD):
+        """
+        İyi eşleşmelerin RANSAC homografi ile doğrulanması.
+        Dönüş: (inlier sayısı, inlier oranı = inlier / iyi eşleşme)
+        """
+        if len(good_matches) < 4:
+            return 0, 0.0
+        source = np.float32([points1[m.queryIdx][:2] for m in good_matches]).reshape(-1, 1, 2)
+        target = np.float32([points2[m.trainIdx][:2] for m in good_matches]).reshape(-1, 1, 2)
+        homography, mask = cv2.findHomography(source, target, cv2.RANSAC, reprojection_threshold)
+        if homography is None or mask is None:
+            return 0, 0.0
+        inliers = int(mask.sum())
+        return inliers, inliers / len(good_matches)
+    
+    def verify_candidates(self, query_points, query_descriptors, candidates, min_confidence=0.0, threshold=0.75,
+                          rank_features=CARD_RANK_FEATURES, verify_top=CARD_VERIFY_TOP):
+        """
+        Yüklenen kartı aday kartlarla aşamalı doğrular.
+        candidates: [(user_id, keypoint_count, points, descriptors)], points keypoint_array formatında
+        1) Sıralama: Sorgunun en güçlü rank_features keypoint'i ile her adaya ratio test (ucuz skor: iyi eşleşme sayısı).
+           Aday sayısı verify_top'u geçmiyorsa atlanır.
+        2) Doğrulama: En iyi verify_top aday sırayla tam ratio test + RANSAC homografi.
+        3) Erken kabul: CARD_ACCEPT_INLIERS ve CARD_ACCEPT_INLIER_RATIO'yu geçen (ve güveni min_confidence üstünde)
+           ilk aday kabul edilir, kalan adaylar doğrulanmaz.
+        Dönüş: {"user_id", "confidence", "details", "early_accept", "ranked", "verified", "timings": {"rank_ms", "verify_ms"}}
+        """
+        keypoint_count = len(query_points)
+        outcome = {"user_id": None, "confidence": 0, "details": None, "early_accept": False,
+                   "ranked": 0, "verified": 0, "timings": {"rank_ms": 0.0, "verify_ms": 0.0}}
+        if query_descriptors is None or len(query_descriptors) == 0 or not candidates:
+            return outcome
+        
+        # 1. Ucuz sıralama
+        start = time.perf_counter()
+        order = list(range(len(candidates)))
+        if len(candidates) > verify_top:
+            scores = self.rank_candidates(query_points, query_descriptors, candidates, threshold, rank_features)
+            order = sorted(order, key=lambda i: -scores[i])
+            outcome["ranked"] = len(candidates)
+        outcome["timings"]["rank_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        
+        # 2. En iyi adaylarda tam eşleştirme + RANSAC, 3. erken kabul
+        start = time.perf_counter()
+        for i in order[:verify_top]:
+            user_id, stored_keypoint_count, points, descriptors = candidates[i]
+            result = self.match_features(keypoint_count, query_descriptors, stored_keypoint_count, descriptors,
+                                         threshold, query_points, points)
+            outcome["verified"] += 1
+            if result.get("is_match") and result.get("confidence", 0) > outcome["confidence"]:
+                outcome.update(user_id=user_id, confidence=result["confidence"], details=result)
+                if result["inliers"] >= CARD_ACCEPT_INLIERS and result["inlier_ratio"] >= CARD_ACCEPT_INLIER_RATIO \
+                        and result["confidence"] >= min_confidence:
+                    outcome["early_accept"] = True
+                    break
+        outcome["timings"]["verify_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return outcome
+    
+    def rank_candidates(self, query_points, query_descriptors, candidates, threshold=0.75,
+                        rank_features=CARD_RANK_FEATURES):
+        """verify_candidates 1. aşaması: Sorgunun en güçlü rank_features keypoint'i ile adaylara ucuz skor (iyi eşleşme sayısı)."""
+        strongest = np.argsort(-query_points[:, 4], kind="stable")[:rank_features]
+        subset = query_descriptors[strongest]
+        return [len(self._good_matches(subset, descriptors, threshold)[1]) if len(descriptors) >= 2 else 0
+                for _, _, _, descriptors in candidates]
+    
+    @staticmethod
+    def keypoint_array(keypoints):
+        """cv2.KeyPoint listesi -> (n, 6) float32 [x, y, size, angle, response, octave]"""
+        return np.array([(kp.pt[0], kp.pt[1], kp.size, kp.angle, kp.response, kp.octave) for kp in keypoints],
+                        dtype=np.float32).reshape(-1, 6)
+    
+    def pack_features(self, keypoints, descriptors):
+        """
+        Keypoint ve tanımlayıcıları veritabanında saklanacak ham byte'lara çevirir.
+        Keypoint: (x, y, size, angle, response, octave) float32, tanımlayıcı: dedektörün ham dizisi.
+        Dönüş: (keypoint_blob, descriptor_blob, keypoint_count)
+        """
+        points = self.keypoint_array(keypoints)
+        if descriptors is None:
+            descriptors = np.zeros((0, self.descriptor_size), dtype=self.descriptor_dtype)
+        descriptors = np.ascontiguousarray(descriptors, dtype=self.descriptor_dtype)
+        return points.tobytes(), descriptors.tobytes(), len(keypoints)
+    
+    def unpack_descriptors(self, descriptor_blob):
+        """pack_features ile saklanan tanımlayıcıları kopyalamadan diziye çevirir: (n, descriptor_size)."""
+        return np.frombuffer(descriptor_blob, dtype=self.descriptor_dtype).reshape(-1, self.descriptor_size)
+    
+    @staticmethod
+    def unpack_keypoints(keypoint_blob):
+        """pack_features ile saklanan keypoint'ler: (n, 6) [x, y, size, angle, response, octave]."""
+        return np.frombuffer(keypoint_blob, dtype=np.float32).reshape(-1, 6)
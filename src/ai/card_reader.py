@@ -1,193 +1,169 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import easyocr
 import torch
 import numpy as np
 from facenet_pytorch import MTCNN
 from PIL import Image
 
+try:
+    from .card_layout import CardLayout
+except ImportError:  # Script olarak çalıştırıldığında (card_test.py, benchmark.py)
+    from card_layout import CardLayout
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+CARD_FACE_MAX_SIDE = int(os.getenv("CARD_FACE_MAX_SIDE", "640"))   # Yüz tespiti bu boyuta küçültülmüş kopyada yapılır
+CARD_FACE_THREADS = int(os.getenv("CARD_FACE_THREADS", "2"))       # OCR ile paralel çalışan yüz tespiti thread'i
+
 class SpatialCardReader:
-    def __init__(self):
+    def __init__(self, reader=None, face_max_side: int = CARD_FACE_MAX_SIDE):
+        """
+        reader: Önceden yüklenmiş easyocr.Reader (opsiyonel). Verilirse OCR ağırlıkları tekrar yüklenmez.
+        face_max_side: Yüz tespiti için küçültülmüş kopyanın en uzun kenarı (kutular orijinal koordinata çevrilir).
+        Süreç başına bir kez oluşturulur (model registry), her istekte yeniden yüklenmez.
+        """
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         print(f"SpatialCardReader Final v3 Başlatılıyor... Cihaz: {str(self.device).upper()}")
 
-        self.reader = easyocr.Reader(['tr', 'en'], gpu=(self.device.type == 'cuda'))
+        self.reader = reader if reader is not None else easyocr.Reader(['tr', 'en'], gpu=(self.device.type == 'cuda'))
         self.mtcnn = MTCNN(keep_all=False, device=self.device, select_largest=True, margin=0)
+        self.face_max_side = face_max_side
+        self.layout = CardLayout()
+        # Yüz tespiti OCR ile aynı anda bu havuzda çalışır (torch/easyocr GIL'i bırakır)
+        self._face_executor = ThreadPoolExecutor(max_workers=CARD_FACE_THREADS, thread_name_prefix="card-face")
         
         print("✅ Sistem Hazır.")
 
     def analyze_card(self, image_source, face_margin=0.5):
-        result = {
-            "parsed_data": {},
-            "face_found": False,
-            "face_image": None,
-            "all_text_boxes": [],
-            "error": None
-        }
-
-        try:
-            # 1. Görsel Hazırlığı
-            if isinstance(image_source, str):
-                img = Image.open(image_source).convert('RGB')
-            else:
-                img = image_source
-            
-            width, height = img.size
-            img_np = np.array(img)
-
-            # 2. OCR İşlemi
-            raw_data = self.reader.readtext(img_np, detail=1)
-            result["all_text_boxes"] = raw_data
-
-            # 3. Yüz Tespiti ve Genişletme
-            boxes, _ = self.mtcnn.detect(img)
-            face_bottom_y = 0
-            
-            if boxes is not None:
-                box = boxes[0]
-                x1, y1, x2, y2 = box
-                
-                # Genişletme
-                w_face = x2 - x1
-                h_face = y2 - y1
-                m_x = w_face * face_margin
-                m_y = h_face * face_margin
-                
-                nx1 = max(0, int(x1 - m_x))
-                ny1 = max(0, int(y1 - m_y))
-                nx2 = min(width, int(x2 + m_x))
-                ny2 = min(height, int(y2 + m_y))
-                
-                face_crop = img.crop((nx1, ny1, nx2, ny2))
-                result["face_image"] = face_crop
-                result["face_found"] = True
-                face_bottom_y = y2 
-
-            # 4. Satır Birleştirme
-            merged_lines = self._merge_text_lines(raw_data)
-
-            # --- 5. VERİ ÇIKARMA ---
-            parsed = {
-                "Sirket": None,
-                "Isim_Soyisim": None,
-                "Unvan": None,
-                "ID_Sicil": None,
-                "Email": None,
-                "Konum": None,
-                "Dogum_Tarihi": None,
-                "Cinsiyet": None
+        return self.analyze_cards([image_source], face_margin=face_margin)[0]
+
+    def analyze_cards(self, image_sources, face_margin=0.5) -> list:
+        """
+        Birden fazla kartı analiz eder (tek kart için de aynı yol kullanılır).
+        - Yüz tespiti küçültülmüş kopyalarda, bütün kartlar için batch halinde ve OCR ile aynı anda çalışır.
+        - OCR her kartın tam çözünürlüklü görselinde çalışır.
+        Dönüş: Giriş sırasıyla sonuç listesi; her sonuçta parsed_data'nın yanında "timings" (ms):
+               load, ocr, face (batch'in tamamı), parse, total.
+        """
+        start = time.perf_counter()
+        results = []
+        images = []
+        for image_source in image_sources:
+            result = {
+                "parsed_data": {},
+                "face_found": False,
+                "face_image": None,
+                "all_text_boxes": [],
+                "error": None,
+                "timings": {}
             }
+            results.append(result)
+            load_start = time.perf_counter()
+            try:
+                # 1. Görsel Hazırlığı
+                if isinstance(image_source, str):
+                    img = Image.open(image_source).convert('RGB')
+                else:
+                    img = image_source
+                images.append(img)
+            except Exception as e:
+                result["error"] = str(e)
+                images.append(None)
+            result["timings"]["load"] = (time.perf_counter() - load_start) * 1000
+
+        valid = [i for i, img in enumerate(images) if img is not None]
+
+        # 2. Yüz Tespiti (arka planda) + OCR (bu thread'de) aynı anda
+        face_future = self._face_executor.submit(self._detect_faces, [images[i] for i in valid])
+        raw_data = {}
+        for i in valid:
+            ocr_start = time.perf_counter()
+            try:
+                raw_data[i] = self.reader.readtext(np.array(images[i]), detail=1)
+            except Exception as e:
+                results[i]["error"] = str(e)
+            results[i]["timings"]["ocr"] = (time.perf_counter() - ocr_start) * 1000
 
-            # --- A. Şirket Adı (GÜNCELLENMİŞ MANTIK) ---
-            # Logo yazısını atlayıp, sadece şirket adını almak için strateji:
-            # 1. Üst %25'lik alandaki satırları topla.
-            # 2. Y koordinatına göre sırala.
-            # 3. En alttaki (yani yüze en yakın olan) satırı "Şirket Adı" olarak seç.
+        try:
+            face_boxes, face_ms = face_future.result()
+        except Exception as e:
+            face_boxes, face_ms = None, None
+            for i in valid:
+                results[i]["error"] = results[i]["error"] or str(e)
+
+        # 3. Veri çıkarma
+        for position, i in enumerate(valid):
+            result = results[i]
+            result["timings"]["face"] = face_ms
+            if result["error"]:
+                continue
+            parse_start = time.perf_counter()
+            try:
+                result["all_text_boxes"] = raw_data[i]
+                self._parse_card(images[i], raw_data[i], face_boxes[position], face_margin, result)
+            except Exception as e:
+                result["error"] = str(e)
+            result["timings"]["parse"] = (time.perf_counter() - parse_start) * 1000
+
+        total_ms = (time.perf_counter() - start) * 1000
+        for result in results:
+            result["timings"]["total"] = total_ms
+            result["timings"] = {stage: round(ms, 2) if ms is not None else None for stage, ms in result["timings"].items()}
+        return results
+
+    def _detect_faces(self, images: list):
+        """
+        Yüz tespiti: Görseller en uzun kenarı face_max_side olacak şekilde küçültülür, aynı boyuttakiler
+        MTCNN'e tek batch olarak verilir. Kutular orijinal görsel koordinatına geri ölçeklenir.
+        Dönüş: ([her görsel için en büyük yüz kutusu veya None], süre ms)
+        """
+        start = time.perf_counter()
+        boxes = [None] * len(images)
+        groups = {}
+        for index, img in enumerate(images):
+            scale = min(1.0, self.face_max_side / max(img.size)) if self.face_max_side else 1.0
+            size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            groups.setdefault(size, []).append(index)
+
+        for size, indices in groups.items():
+            small = [images[i] if images[i].size == size else images[i].resize(size, Image.BILINEAR) for i in indices]
+            # MTCNN batch modu sadece aynı boyuttaki görselleri kabul eder
+            detected, _ = self.mtcnn.detect(small if len(small) > 1 else small[0])
+            if len(small) == 1:
+                detected = [detected]
+            for i, image_boxes in zip(indices, detected):
+                if image_boxes is None or len(image_boxes) == 0:
+                    continue
+                scale_x = images[i].width / size[0]
+                scale_y = images[i].height / size[1]
+                boxes[i] = np.asarray(image_boxes[0], dtype=np.float64) * [scale_x, scale_y, scale_x, scale_y]
+        return boxes, (time.perf_counter() - start) * 1000
+
+    def _parse_card(self, img, raw_data, face_box, face_margin, result):
+        width, height = img.size
+
+        # Yüz Genişletme
+        face_bottom_y = 0
+        if face_box is not None:
+            x1, y1, x2, y2 = face_box
             
-            header_candidates = []
-            for line_bbox, line_text in merged_lines:
-                center_y = (line_bbox[0][1] + line_bbox[2][1]) / 2
-                
-                # Kartın üst %25'lik kısmında mı?
-                if center_y < (height * 0.25):
-                    header_candidates.append((center_y, line_text))
+            # Genişletme
+            w_face = x2 - x1
+            h_face = y2 - y1
+            m_x = w_face * face_margin
+            m_y = h_face * face_margin
             
-            if header_candidates:
-                # Y eksenine göre sırala (Küçükten büyüğe -> Yukarıdan aşağıya)
-                header_candidates.sort(key=lambda x: x[0])
-                
-                # Eğer birden fazla satır varsa (Örn: 1. Logo Text, 2. Şirket Adı)
-                # Biz en sondakini (en alttakini) alıyoruz.
-                parsed["Sirket"] = header_candidates[-1][1]
+            nx1 = max(0, int(x1 - m_x))
+            ny1 = max(0, int(y1 - m_y))
+            nx2 = min(width, int(x2 + m_x))
+            ny2 = min(height, int(y2 + m_y))
             
+            face_crop = img.crop((nx1, ny1, nx2, ny2))
+            result["face_image"] = face_crop
+            result["face_found"] = True
+            face_bottom_y = y2 
 
-            # B. İsim ve Unvan
-            if result["face_found"]:
-                candidate_lines = []
-                for line_bbox, line_text in merged_lines:
-                    center_y = (line_bbox[0][1] + line_bbox[2][1]) / 2
-                    if center_y > face_bottom_y:
-                        if center_y < face_bottom_y + (height * 0.3):
-                            candidate_lines.append(line_text)
-                
-                if len(candidate_lines) >= 1:
-                    parsed["Isim_Soyisim"] = candidate_lines[0]
-                if len(candidate_lines) >= 2:
-                    parsed["Unvan"] = candidate_lines[1]
-
-            # C. Etiket Bazlı Arama
-            anchors = {
-                "ID / SICIL NO": "ID_Sicil", "EMAIL": "Email", "KONUM": "Konum",
-                "DOĞUM T.": "Dogum_Tarihi", "CINSIYET": "Cinsiyet",
-                "DOĞUM": "Dogum_Tarihi", "ID": "ID_Sicil"
-            }
-
-            for bbox, text, conf in raw_data:
-                clean_text = text.upper().strip()
-                found_key = None
-                for anchor_text, key_name in anchors.items():
-                    if anchor_text in clean_text:
-                        found_key = key_name
-                        break
-                
-                if found_key:
-                    anchor_bottom_y = bbox[2][1]
-                    anchor_center_x = (bbox[0][0] + bbox[1][0]) / 2
-                    best_match = None
-                    min_dist = float('inf')
-
-                    for val_bbox, val_text, val_conf in raw_data:
-                        if val_bbox == bbox: continue
-                        val_top_y = val_bbox[0][1]
-                        val_center_x = (val_bbox[0][0] + val_bbox[1][0]) / 2
-
-                        if val_top_y > anchor_bottom_y:
-                            if abs(val_center_x - anchor_center_x) < 200:
-                                y_dist = val_top_y - anchor_bottom_y
-                                if y_dist < 120:
-                                    if y_dist < min_dist:
-                                        min_dist = y_dist
-                                        best_match = val_text
-                    
-                    if best_match:
-                        if parsed[found_key] is None or len(best_match) > len(parsed[found_key]):
-                            parsed[found_key] = best_match
-
-            result["parsed_data"] = parsed
-            return result
-
-        except Exception as e:
-            result["error"] = str(e)
-            return result
-
-    def _merge_text_lines(self, raw_data, y_threshold=20): # Threshold biraz artırıldı
-        sorted_data = sorted(raw_data, key=lambda r: (r[0][0][1] + r[0][2][1]) / 2)
-        merged_lines = []
-        current_line_items = []
-        
-        if not sorted_data: return []
-
-        current_line_items.append(sorted_data[0])
-        for i in range(1, len(sorted_data)):
-            item = sorted_data[i]
-            prev_item = current_line_items[0]
-            cy_current = (item[0][0][1] + item[0][2][1]) / 2
-            cy_prev = (prev_item[0][0][1] + prev_item[0][2][1]) / 2
-            
-            if abs(cy_current - cy_prev) < y_threshold:
-                current_line_items.append(item)
-            else:
-                merged_lines.append(self._process_single_line(current_line_items))
-                current_line_items = [item]
-        
-        if current_line_items:
-            merged_lines.append(self._process_single_line(current_line_items))
-        return merged_lines
-
-    def _process_single_line(self, items):
-        items.sort(key=lambda r: r[0][0][0])
-        full_text = " ".join([item[1] for item in items])
-        min_x = min([item[0][0][0] for item in items])
-        min_y = min([item[0][0][1] for item in items])
-        max_x = max([item[0][2][0] for item in items])
-        max_y = max([item[0][2][1] for item in items])
-        new_bbox = [[min_x, min_y], [max_x, min_y], [max_x, max_y], [min_x, max_y]]
-        return (new_bbox, full_text)
\ No newline at end of file
+        # Alan çıkarma (şablon bazlı yerleşim motoru)
+        result["parsed_data"] = self.layout.parse(raw_data, width, height, face_bottom_y if result["face_found"] else None)
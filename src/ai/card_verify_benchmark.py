@@ -0,0 +1,93 @@
+import argparse
+import time
+
+import numpy as np
+
+from card_matcher import CardMatcher
+from card_index_benchmark import make_card, capture
+
+def old_path(matcher, keypoint_count, descriptors, candidates):
+    """Eski karar: Her adaya ratio test, is_match olan en yüksek güven."""
+    best_user, best_confidence = None, 0
+    for user_id, stored_count, _, stored_descriptors in candidates:
+        result = matcher.match_features(keypoint_count, descriptors, stored_count, stored_descriptors)
+        if result.get("is_match") and result["confidence"] > best_confidence:
+            best_user, best_confidence = user_id, result["confidence"]
+    return best_user, best_confidence
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kart girişi aşamalı doğrulama: Eski tam eşleştirme ile gecikme ve yanlış kabul karşılaştırması")
+    parser.add_argument("--candidates", default="10,50", help="Doğrulanan aday sayıları (ön eleme k / küçük veritabanında tam tarama)")
+    parser.add_argument("--genuine", type=int, default=20, help="Kayıtlı kartın tekrar çekilmiş hali (doğru kabul beklenir)")
+    parser.add_argument("--impostors", type=int, default=20, help="Kayıtlı olmayan kart (ret beklenir)")
+    parser.add_argument("--min-confidence", type=float, default=60, help="Kabul için en az güven (login_with_card: 60)")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.candidates.split(",")]
+    rng = np.random.default_rng(args.seed)
+    matcher = CardMatcher(algorithm="orb")
+
+    print(f"⏳ {max(sizes) + args.impostors} kart üretiliyor...")
+    cards, candidates = [], []
+    for user_id in range(max(sizes)):
+        card = make_card(rng)
+        keypoints, descriptors = matcher.extract_features(card)
+        cards.append(card)
+        candidates.append((user_id, len(keypoints), matcher.keypoint_array(keypoints), descriptors))
+
+    def query(image):
+        keypoints, descriptors = matcher.extract_features(image)
+        return matcher.keypoint_array(keypoints), descriptors
+
+    genuine = [(int(i), query(capture(cards[i], rng))) for i in rng.integers(0, min(sizes), args.genuine)]
+    impostors = [(None, query(capture(make_card(rng), rng))) for _ in range(args.impostors)]
+
+    print("\n" + "=" * 92)
+    print(f"AŞAMALI KART DOĞRULAMA ({args.genuine} kayıtlı kart, {args.impostors} kayıtsız kart, güven >= {args.min_confidence})")
+    print("=" * 92)
+    print(f"{'aday':>5} {'yol':<10} {'doğru kabul':>12} {'yanlış kabul':>13} {'ort. ms':>8} {'p95 ms':>8} "
+          f"{'erken kabul':>12} {'RANSAC':>7} {'inlier oranı':>13}")
+
+    for size in sizes:
+        pool = candidates[:size]
+        for name in ("eski", "aşamalı"):
+            accepted = false_accepts = early = verified = 0
+            latencies, inlier_ratios = [], []
+            for expected, (points, descriptors) in genuine + impostors:
+                # Sorgu kartı adaylar arasında rastgele bir sırada (ön eleme sırası bilinmiyor varsayımı)
+                order = [pool[i] for i in rng.permutation(len(pool))]
+                start = time.perf_counter()
+                if name == "eski":
+                    user_id, confidence = old_path(matcher, len(points), descriptors, order)
+                else:
+                    outcome = matcher.verify_candidates(points, descriptors, order, args.min_confidence)
+                    user_id, confidence = outcome["user_id"], outcome["confidence"]
+                    early += outcome["early_accept"]
+                    verified += outcome["verified"]
+                    if outcome["details"] and expected is not None:
+                        inlier_ratios.append(outcome["details"]["inlier_ratio"])
+                latencies.append((time.perf_counter() - start) * 1000)
+
+                ok = user_id is not None and confidence >= args.min_confidence
+                if expected is not None:
+                    accepted += ok and user_id == expected
+                    false_accepts += ok and user_id != expected
+                else:
+                    false_accepts += ok
+
+            total = len(genuine) + len(impostors)
+            staged = name == "aşamalı"
+            print(f"{size:>5} {name:<10} {accepted / len(genuine):>12.2f} {false_accepts / total:>13.3f} "
+                  f"{np.mean(latencies):>8.0f} {np.percentile(latencies, 95):>8.0f} "
+                  f"{(f'{early / total:.2f}' if staged else '-'):>12} {(f'{verified / total:.1f}' if staged else '-'):>7} "
+                  f"{(f'{np.median(inlier_ratios):.2f}' if inlier_ratios else '-'):>13}")
+
+    print("-" * 92)
+    print("RANSAC: Sorgu başına homografi doğrulanan aday (ortalama). Inlier oranı: Kayıtlı kartlarda medyan.")
+    print("=" * 92)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import time
+
+import numpy as np
+
+from card_matcher import CardMatcher
+from card_vote_index import CardVoteIndex, CARD_VOTE_VERIFY
+from card_index_benchmark import make_card, capture
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kart girişi LSH oylama indeksi: Sentetik kartlarla doğruluk, arama ve kurulum süresi")
+    parser.add_argument("--sizes", default="100,300,1000", help="Kayıtlı kart sayıları")
+    parser.add_argument("--queries", type=int, default=30, help="Tekrar çekilip aranan kart sayısı")
+    parser.add_argument("--verify", type=int, default=CARD_VOTE_VERIFY, help="1:1 doğrulamaya giden en çok oy alan kullanıcı")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    rng = np.random.default_rng(args.seed)
+    matcher = CardMatcher(algorithm="orb")
+
+    print(f"⏳ {max(sizes)} kart üretiliyor...")
+    cards, descriptors = [], []
+    for _ in range(max(sizes)):
+        card = make_card(rng)
+        cards.append(card)
+        descriptors.append(matcher.extract_features(card)[1])
+
+    # Sorgular en küçük boyutta da kayıtlı olan kartlardan seçilir
+    query_ids = rng.choice(min(sizes), min(args.queries, min(sizes)), replace=False)
+    queries = []
+    for card_id in query_ids:
+        keypoints, query_descriptors = matcher.extract_features(capture(cards[card_id], rng))
+        queries.append((int(card_id), len(keypoints), query_descriptors))
+
+    # Eski yol: Kayıtlı kartlarla tek tek knnMatch + ratio test
+    match_ms = []
+    for card_id, keypoint_count, query_descriptors in queries[:10]:
+        other = int(rng.integers(0, len(descriptors)))
+        start = time.perf_counter()
+        matcher.match_features(keypoint_count, query_descriptors, len(descriptors[other]), descriptors[other])
+        match_ms.append((time.perf_counter() - start) * 1000)
+    match_ms = float(np.mean(match_ms))
+
+    print("\n" + "=" * 84)
+    print(f"KART OYLAMA İNDEKSİ (FLANN LSH, {len(queries)} sorgu, doğrulama k={args.verify})")
+    print("=" * 84)
+    print(f"{'kart':>6} {'tanımlayıcı':>12} {'kurulum sn':>11} {'top-1':>6} {f'top-{args.verify}':>6} "
+          f"{'oylama ms':>10} {'+ doğrulama ms':>15} {'tam tarama ms':>14} {'bellek MB':>10}")
+
+    for size in sizes:
+        index = CardVoteIndex()
+        for user_id in range(size):
+            index.add(user_id, descriptors[user_id])
+        start = time.perf_counter()
+        index.build()
+        build_s = time.perf_counter() - start
+
+        top1 = topk = 0
+        vote_ms, verify_ms = [], []
+        for card_id, keypoint_count, query_descriptors in queries:
+            start = time.perf_counter()
+            ranked = [user_id for user_id, _ in index.search(query_descriptors, args.verify)]
+            vote_ms.append((time.perf_counter() - start) * 1000)
+            top1 += bool(ranked) and ranked[0] == card_id
+            topk += card_id in ranked
+
+            # 1:1 doğrulama (girişte aynı karar: match_features)
+            start = time.perf_counter()
+            for user_id in ranked:
+                matcher.match_features(keypoint_count, query_descriptors, len(descriptors[user_id]), descriptors[user_id])
+            verify_ms.append((time.perf_counter() - start) * 1000)
+
+        rows = sum(len(descriptors[user_id]) for user_id in range(size))
+        print(f"{size:>6} {rows:>12} {build_s:>11.1f} {top1 / len(queries):>6.2f} {topk / len(queries):>6.2f} "
+              f"{np.percentile(vote_ms, 50):>10.1f} {np.percentile(vote_ms, 50) + np.percentile(verify_ms, 50):>15.1f} "
+              f"{size * match_ms:>14.0f} {index.memory_mb():>10.1f}")
+
+    print("-" * 84)
+    print(f"Sorgu tanımlayıcı (ort.): {np.mean([len(q[2]) for q in queries]):.0f}")
+    print(f"Tek kart eşleştirme     : {match_ms:.1f} ms (tam tarama = kart sayısı x bu süre)")
+    print("=" * 84)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#Kart Oylama İndeksi - Tüm kayıtlı kartların ORB tanımlayıcıları tek FLANN LSH indekste, sorgu tanımlayıcıları tek aramada kullanıcılara oy verir
+
+import os
+import threading
+
+import cv2
+import numpy as np
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+CARD_MATCH_MODE = os.getenv("CARD_MATCH_MODE", "shortlist").lower()   # shortlist (global tanımlayıcı ön eleme) | vote (LSH oylama)
+CARD_LSH_TABLES = int(os.getenv("CARD_LSH_TABLES", "20"))             # LSH hash tablosu sayısı (fazlası: recall ve bellek artar)
+CARD_LSH_KEY_SIZE = int(os.getenv("CARD_LSH_KEY_SIZE", "28"))         # Hash anahtarı bit sayısı (azı: kova büyür, arama yavaşlar)
+CARD_LSH_PROBE = int(os.getenv("CARD_LSH_PROBE", "0"))                # Komşu kova yoklama seviyesi
+CARD_VOTE_PENDING_MAX = int(os.getenv("CARD_VOTE_PENDING_MAX", "50")) # İndeks kurulduktan sonra eklenen kart: bu sayıya kadar brute force, sonra yeniden kurulur
+CARD_VOTE_VERIFY = int(os.getenv("CARD_VOTE_VERIFY", "3"))            # En çok oy alan kaç kullanıcı 1:1 eşleştirmeyle doğrulanır
+
+FLANN_INDEX_LSH = 6
+
+
+class CardVoteIndex:
+    """
+    Kayıtlı kartların tüm tanımlayıcıları tek bir FLANN LSH indekste, her satır sahibinin user_id'si ile etiketli.
+    - vote: Yüklenen kartın tüm tanımlayıcıları tek knnSearch çağrısıyla aranır (k=2), Lowe ratio testi mesafe
+      dizileri üzerinde vektörel uygulanır, geçen eşleşmeler sahiplerine oy olarak sayılır.
+      Maliyet kullanıcı sayısına değil sorgu tanımlayıcı sayısına bağlıdır (LSH kovası kadar aday).
+    - Aynı kart iki kullanıcıda kayıtlıysa komşular eşit uzaklıkta olur, ratio testini geçmez (belirsiz eşleşme oy almaz).
+    - LSH indeksine satır eklenip silinemez: Sonradan eklenen kartlar (CARD_VOTE_PENDING_MAX'a kadar) ayrıca
+      brute force aranır, silinen / güncellenen kartların eski satırları maskelenir; sınır aşılınca indeks yeniden kurulur.
+    """
+
+    def __init__(self, tables: int = CARD_LSH_TABLES, key_size: int = CARD_LSH_KEY_SIZE,
+                 probe_level: int = CARD_LSH_PROBE, pending_max: int = CARD_VOTE_PENDING_MAX):
+        self.index_params = dict(algorithm=FLANN_INDEX_LSH, table_number=tables, key_size=key_size,
+                                 multi_probe_level=probe_level)
+        self.pending_max = pending_max
+        self._cards = {}       # user_id -> tanımlayıcılar (n, 32) uint8
+        self._index = None     # cv2.flann_Index
+        self._owners = np.zeros(0, dtype=np.int64)  # İndeks satırı -> user_id
+        self._indexed = set()  # İndeksteki kullanıcılar
+        self._pending = {}     # İndeks kurulduktan sonra eklenen / güncellenen kartlar
+        self._stale = set()    # İndekste eski satırı kalan (silinen / güncellenen) kullanıcılar
+        self._pending_data = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+
+    def __len__(self):
+        return len(self._cards)
+
+    def __contains__(self, user_id):
+        return user_id in self._cards
+
+    def add(self, user_id: int, descriptors: np.ndarray):
+        """Kartı ekler; kullanıcının kaydı varsa tanımlayıcıları günceller. Tanımlayıcısı olmayan kart eklenmez."""
+        if descriptors is None or len(descriptors) == 0:
+            self.remove(user_id)
+            return
+        with self._lock:
+            current = self._cards.get(user_id)
+            if current is not None and np.array_equal(current, descriptors):
+                return  # Eşitlemede tekrar gelen değişmemiş kart
+            self._cards[user_id] = descriptors
+            self._pending[user_id] = descriptors
+            if user_id in self._indexed:
+                self._stale.add(user_id)
+            self._pending_data = None
+
+    def remove(self, user_id: int):
+        with self._lock:
+            self._cards.pop(user_id, None)
+            if self._pending.pop(user_id, None) is not None:
+                self._pending_data = None
+            if user_id in self._indexed:
+                self._stale.add(user_id)
+
+    def build(self):
+        """Tüm kartlarla LSH indeksini (yeniden) kurar. Kurulum sırasında aramalar eski indeksle devam eder."""
+        with self._build_lock:
+            with self._lock:
+                cards = dict(self._cards)
+            if cards:
+                data = np.concatenate(list(cards.values()))
+                owners = np.concatenate([np.full(len(d), user_id, dtype=np.int64) for user_id, d in cards.items()])
+                index = cv2.flann_Index(data, self.index_params)
+            else:
+                owners, index = np.zeros(0, dtype=np.int64), None
+
+            with self._lock:
+                self._index, self._owners, self._indexed = index, owners, set(cards)
+                # Kurulum sırasında gelen değişiklikler bekleyen olarak kalır
+                self._pending = {u: d for u, d in self._pending.items() if cards.get(u) is not d}
+                self._stale = {u for u in self._indexed if self._cards.get(u) is not cards[u]}
+                self._pending_data = None
+
+    def _needs_build(self) -> bool:
+        return (self._index is None and bool(self._cards)) or \
+            len(self._pending) + len(self._stale) > self.pending_max
+
+    def _snapshot(self):
+        """Arama için tutarlı görünüm: (indeks, satır sahipleri, maskelenecek kullanıcılar, bekleyen tanımlayıcılar, sahipleri)."""
+        with self._lock:
+            if self._pending_data is None and self._pending:
+                descriptors = np.concatenate(list(self._pending.values()))
+                owners = np.concatenate([np.full(len(d), u, dtype=np.int64) for u, d in self._pending.items()])
+                self._pending_data = (descriptors, owners)
+            pending = self._pending_data if self._pending else None
+            stale = np.fromiter(self._stale, dtype=np.int64, count=len(self._stale))
+            return self._index, self._owners, stale, pending
+
+    def _neighbors(self, descriptors: np.ndarray):
+        """Her sorgu tanımlayıcısının en yakın 2 komşusu: (mesafeler (n, 2), sahipler (n, 2)). Bulunamayan komşu: inf, -1"""
+        if self._needs_build():
+            self.build()
+        index, owners, stale, pending = self._snapshot()
+        distances, neighbor_owners = [], []
+
+        if index is not None:
+            rows, dist = index.knnSearch(descriptors, 2, params={})
+            found = rows >= 0
+            row_owners = np.where(found, owners[np.where(found, rows, 0)], -1)
+            # Silinen / güncellenen kartların eski satırları
+            found &= ~np.isin(row_owners, stale)
+            distances.append(np.where(found, dist, np.inf))
+            neighbor_owners.append(np.where(found, row_owners, -1))
+
+        if pending is not None:
+            pending_descriptors, pending_owners = pending
+            k = min(2, len(pending_descriptors))
+            dist = np.full((len(descriptors), 2), np.inf)
+            rows = np.zeros((len(descriptors), 2), dtype=np.int64)
+            for i, pair in enumerate(self._matcher.knnMatch(descriptors, pending_descriptors, k=k)):
+                for j, match in enumerate(pair):
+                    dist[i, j], rows[i, j] = match.distance, match.trainIdx
+            distances.append(dist)
+            neighbor_owners.append(np.where(np.isfinite(dist), pending_owners[rows], -1))
+
+        if not distances:
+            return np.full((len(descriptors), 2), np.inf), np.full((len(descriptors), 2), -1, dtype=np.int64)
+        distances, neighbor_owners = np.hstack(distances), np.hstack(neighbor_owners)
+        order = np.argsort(distances, axis=1, kind="stable")[:, :2]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(neighbor_owners, order, axis=1)
+
+    def vote(self, descriptors: np.ndarray, threshold: float = 0.75) -> dict:
+        """
+        Yüklenen kartın tanımlayıcılarıyla kullanıcı başına iyi eşleşme (oy) sayısı: {user_id: oy}.
+        İyi eşleşme: En yakın komşu ratio testini geçer (d1 < threshold x d2). LSH kovasında tek aday bulunduysa
+        (ikinci komşu yok) eşleşme ayırt edicidir, oy sayılır.
+        """
+        if descriptors is None or len(descriptors) == 0:
+            return {}
+        distances, owners = self._neighbors(np.ascontiguousarray(descriptors, dtype=np.uint8))
+        good = np.isfinite(distances[:, 0]) & (distances[:, 0] < threshold * distances[:, 1])
+        voters, votes = np.unique(owners[good, 0], return_counts=True)
+        return {int(user_id): int(count) for user_id, count in zip(voters, votes)}
+
+    def search(self, descriptors: np.ndarray, k: int = CARD_VOTE_VERIFY, threshold: float = 0.75) -> list:
+        """En çok oy alan k kullanıcı: [(user_id, oy)] oya göre azalan."""
+        votes = self.vote(descriptors, threshold)
+        return sorted(votes.items(), key=lambda item: -item[1])[:k]
+
+    def memory_mb(self) -> float:
+        """Tanımlayıcılar + satır sahipleri + LSH tabloları (tablo başına satır başına ~4 byte, yaklaşık)."""
+        descriptors = sum(d.nbytes for d in self._cards.values())
+        tables = len(self._owners) * self.index_params["table_number"] * 4
+        return round((descriptors + self._owners.nbytes + tables) / 1024 / 1024, 2)
@@ -0,0 +1,199 @@
+#CLIP Görsel Encoder Backend'leri - PyTorch (varsayılan) veya ONNX Runtime (CPU, int8)
+
+import os
+import glob
+import argparse
+import threading
+
+import numpy as np
+import torch
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+CLIP_BACKEND = os.getenv("CLIP_BACKEND", "torch").lower()                         # torch | onnx
+CLIP_ONNX_PATH = os.getenv("CLIP_ONNX_PATH", "models/clip_vision_int8.onnx")     # ONNX modeli yolu
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))              # 0 = ONNX Runtime karar verir
+
+
+class VisionTower(torch.nn.Module):
+    """CLIP'in sadece görsel kısmı: vision_model + visual_projection + L2 normalizasyon."""
+
+    def __init__(self, clip_model):
+        super().__init__()
+        self.vision_model = clip_model.vision_model
+        self.visual_projection = clip_model.visual_projection
+
+    def forward(self, pixel_values):
+        pooled = self.vision_model(pixel_values=pixel_values).pooler_output
+        image_embeds = self.visual_projection(pooled)
+        return image_embeds / image_embeds.norm(p=2, dim=-1, keepdim=True)
+
+
+class TorchVisionBackend:
+    """Mevcut PyTorch fp32 yolu."""
+    name = "torch"
+
+    def __init__(self, clip_model, device):
+        self.tower = VisionTower(clip_model).eval()
+        self.device = device
+
+    def encode(self, pixel_values):
+        with torch.no_grad():
+            return self.tower(pixel_values.to(self.device))
+
+    def release(self):
+        """Fork öncesi bırakılacak süreç durumu yok (ağırlıklar copy-on-write paylaşılır)."""
+
+
+class OnnxVisionBackend:
+    """
+    ONNX Runtime (CPU) ile görsel encoder. fp32 veya int8 quantize edilmiş model çalıştırabilir.
+    InferenceSession ilk çıkarımda, çıkarımı yapan süreçte kurulur: ORT'nin thread havuzu fork'tan sağ çıkmaz,
+    pre-fork sunucuda master'da kurulan oturum worker'lara geçmez (her worker warm-up'ta kendi oturumunu kurar).
+    """
+    name = "onnx"
+
+    def __init__(self, onnx_path: str = CLIP_ONNX_PATH, intra_op_threads: int = ONNX_INTRA_OP_THREADS):
+        import onnxruntime as ort
+
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(
+                f"ONNX modeli bulunamadı: {onnx_path}. Önce 'python src/ai/clip_backends.py --output {onnx_path}' çalıştırın."
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+
+        self.onnx_path = onnx_path
+        self._options = options
+        self._lock = threading.Lock()
+        self.session = None
+        self.input_name = None
+        self._session_pid = None
+
+    def _ensure_session(self):
+        """Bu süreçte oturum yoksa (veya fork'tan önce kurulmuşsa) yeni oturum kurar."""
+        if self.session is None or self._session_pid != os.getpid():
+            with self._lock:
+                if self.session is None or self._session_pid != os.getpid():
+                    import onnxruntime as ort
+                    session = ort.InferenceSession(self.onnx_path, self._options, providers=["CPUExecutionProvider"])
+                    self.input_name = session.get_inputs()[0].name
+                    self.session = session
+                    self._session_pid = os.getpid()
+        return self.session
+
+    def encode(self, pixel_values):
+        session = self._ensure_session()
+        inputs = {self.input_name: pixel_values.detach().cpu().numpy().astype(np.float32)}
+        image_embeds = session.run(None, inputs)[0]
+        return torch.from_numpy(image_embeds)
+
+    def release(self):
+        """Fork öncesi: Kurulmuş oturum bırakılır, worker'lar ilk çıkarımda kendi oturumlarını kurar."""
+        with self._lock:
+            self.session = None
+            self._session_pid = None
+
+
+def create_vision_backend(clip_model, device, backend: str = CLIP_BACKEND):
+    """Ayara göre backend seçer. ONNX sadece CPU için anlamlıdır."""
+    if backend == "onnx":
+        backend_obj = OnnxVisionBackend()
+        print(f"CLIP görsel backend: ONNX Runtime ({backend_obj.onnx_path})")
+        return backend_obj
+    return TorchVisionBackend(clip_model, device)
+
+
+# ---------------------------------------------------------
+# EXPORT VE QUANTIZATION
+# ---------------------------------------------------------
+
+def export_vision_onnx(clip_model, output_path: str, opset: int = 17):
+    """Görsel encoder'ı dinamik batch boyutlu ONNX dosyasına yazar."""
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tower = VisionTower(clip_model.cpu()).eval()
+    image_size = clip_model.config.vision_config.image_size
+    dummy = torch.randn(1, 3, image_size, image_size)
+
+    with torch.no_grad():
+        torch.onnx.export(
+            tower,
+            (dummy,),
+            output_path,
+            input_names=["pixel_values"],
+            output_names=["image_embeds"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+            opset_version=opset,
+            dynamo=False
+        )
+    return output_path
+
+
+def quantize_onnx(input_path: str, output_path: str, mode: str = "dynamic", calibration_pixels=None):
+    """
+    int8 quantization.
+    - dynamic: Ağırlıklar int8, aktivasyonlar çalışma anında quantize edilir (kalibrasyon gerekmez).
+    - static: Aktivasyon aralıkları calibration_pixels (pixel_values listesi) ile önceden ölçülür.
+    """
+    from onnxruntime.quantization import quantize_dynamic, quantize_static, QuantType, QuantFormat, CalibrationDataReader
+
+    if mode == "dynamic":
+        quantize_dynamic(input_path, output_path, weight_type=QuantType.QInt8)
+    elif mode == "static":
+        if not calibration_pixels:
+            raise ValueError("Static quantization için kalibrasyon görselleri gerekli.")
+
+        class _Reader(CalibrationDataReader):
+            def __init__(self, batches):
+                self._batches = iter([{"pixel_values": b.numpy().astype(np.float32)} for b in batches])
+
+            def get_next(self):
+                return next(self._batches, None)
+
+        quantize_static(
+            input_path, output_path, _Reader(calibration_pixels),
+            quant_format=QuantFormat.QDQ, per_channel=True,
+            activation_type=QuantType.QInt8, weight_type=QuantType.QInt8
+        )
+    else:
+        raise ValueError(f"Bilinmeyen quantization modu: {mode}")
+    return output_path
+
+
+def main():
+    from PIL import Image
+    from transformers import CLIPModel, CLIPProcessor
+
+    parser = argparse.ArgumentParser(description="CLIP görsel encoder'ı ONNX'e aktarır ve opsiyonel int8 quantize eder")
+    parser.add_argument("--model", default="openai/clip-vit-base-patch32")
+    parser.add_argument("--output", default=CLIP_ONNX_PATH, help="Oluşturulacak ONNX dosyası")
+    parser.add_argument("--quantize", choices=["none", "dynamic", "static"], default="dynamic")
+    parser.add_argument("--calibration", default=os.path.join(os.path.dirname(__file__), "..", "face", "*.jpg"),
+                        help="Static quantization için kalibrasyon görselleri (glob)")
+    args = parser.parse_args()
+
+    model = CLIPModel.from_pretrained(args.model, use_safetensors=True).eval()
+
+    if args.quantize == "none":
+        export_vision_onnx(model, args.output)
+        print(f"✅ ONNX (fp32) yazıldı: {args.output}")
+        return
+
+    fp32_path = args.output.replace(".onnx", "") + "_fp32.onnx"
+    export_vision_onnx(model, fp32_path)
+    print(f"✅ ONNX (fp32) yazıldı: {fp32_path}")
+
+    calibration_pixels = None
+    if args.quantize == "static":
+        processor = CLIPProcessor.from_pretrained(args.model)
+        paths = sorted(glob.glob(args.calibration))
+        calibration_pixels = [processor(images=Image.open(p).convert("RGB"), return_tensors="pt")["pixel_values"] for p in paths]
+
+    quantize_onnx(fp32_path, args.output, args.quantize, calibration_pixels)
+    print(f"✅ ONNX (int8, {args.quantize}) yazıldı: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
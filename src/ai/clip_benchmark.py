@@ -0,0 +1,93 @@
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+import torch
+from torch.utils.flop_counter import FlopCounterMode
+from PIL import Image
+
+from content_moderator import ContentModerator
+
+
+def load_images(paths, count):
+    """Verilen görselleri açar, yoksa sabit tohumlu rastgele görseller üretir."""
+    images = [Image.open(p).convert("RGB") for p in paths]
+    rng = np.random.default_rng(42)
+    while len(images) < count:
+        images.append(Image.fromarray(rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)))
+    return images[:count]
+
+
+def full_forward(moderator, image):
+    """Eski yol: Tüm etiketler + görsel her seferinde tam CLIPModel'den geçer."""
+    inputs = moderator.processor(text=moderator.labels, images=image, return_tensors="pt", padding=True).to(moderator.device)
+    with torch.no_grad():
+        outputs = moderator.model(**inputs)
+    return moderator.policies.verdicts(outputs.logits_per_image.cpu().numpy())[0]["post"]["all_scores"]
+
+
+def cached_forward(moderator, image):
+    """Yeni yol: sadece vision tower + önbellekteki etiket matrisi."""
+    return moderator.analyze_image(image)["all_scores"]
+
+
+def measure(fn, moderator, images, runs):
+    # Isınma
+    fn(moderator, images[0])
+    latencies = []
+    for _ in range(runs):
+        for image in images:
+            start = time.perf_counter()
+            fn(moderator, image)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def count_flops(fn, moderator, image):
+    counter = FlopCounterMode(display=False)
+    with counter:
+        fn(moderator, image)
+    return counter.get_total_flops()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLIP etiket embedding önbelleği benchmark'ı (CPU)")
+    parser.add_argument("--images", default=os.path.join(os.path.dirname(__file__), "..", "face", "*.jpg"), help="Görsel glob deseni")
+    parser.add_argument("--count", type=int, default=8, help="Kullanılacak görsel sayısı")
+    parser.add_argument("--runs", type=int, default=5, help="Her görsel için tekrar sayısı")
+    args = parser.parse_args()
+
+    torch.set_num_threads(os.cpu_count() or 1)
+    moderator = ContentModerator()
+    if moderator.device != "cpu":
+        print("Uyarı: Benchmark CPU için tasarlandı, model şu an GPU üzerinde.")
+
+    images = load_images(sorted(glob.glob(args.images)), args.count)
+
+    # Kararlar değişmemeli
+    max_diff = max(float(np.abs(full_forward(moderator, img) - cached_forward(moderator, img)).max()) for img in images)
+
+    results = {}
+    for name, fn in [("full_model", full_forward), ("cached_labels", cached_forward)]:
+        latencies = measure(fn, moderator, images, args.runs)
+        results[name] = {
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "mean_ms": float(np.mean(latencies)),
+            "gflops": count_flops(fn, moderator, images[0]) / 1e9
+        }
+
+    print("\n" + "=" * 50)
+    print("CLIP BENCHMARK (görsel başına)")
+    print("=" * 50)
+    for name, r in results.items():
+        print(f"{name:15s} p50: {r['p50_ms']:8.2f} ms | ort: {r['mean_ms']:8.2f} ms | {r['gflops']:.2f} GFLOP")
+    speedup = results["full_model"]["p50_ms"] / results["cached_labels"]["p50_ms"]
+    print(f"Hızlanma (p50)  : x{speedup:.2f}")
+    print(f"Maks. skor farkı: {max_diff:.2e}")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#CPU Executor'ları - Ağır işler (model çıkarımı, görsel işleme, bcrypt) event loop dışında, sınırlı thread havuzlarında çalışır
+
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "2"))                 # Model çıkarımı (torch, EasyOCR, MTCNN, ORB)
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", "64"))        # Çalışan + bekleyen maksimum iş
+IMAGE_THREADS = int(os.getenv("IMAGE_THREADS", "4"))                         # Görsel decode/encode, hash, bcrypt
+IMAGE_MAX_PENDING = int(os.getenv("IMAGE_MAX_PENDING", "128"))
+EXECUTOR_RETRY_AFTER = int(os.getenv("EXECUTOR_RETRY_AFTER", "2"))           # 503 yanıtındaki Retry-After (sn)
+
+
+class ExecutorOverloaded(Exception):
+    """Havuz dolu: İstek kuyruğa alınmadan reddedilir, API 503 + Retry-After döner."""
+
+    def __init__(self, name: str, retry_after: int = EXECUTOR_RETRY_AFTER):
+        super().__init__(f"{name} havuzu dolu")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    Sınırlı ThreadPoolExecutor.
+    - En fazla max_workers iş aynı anda çalışır, en fazla max_pending iş (çalışan + bekleyen) kabul edilir.
+    - Sınır aşılırsa run() beklemeden ExecutorOverloaded fırlatır (back-pressure).
+    - Event loop sadece sonucu bekler, asıl iş havuzdaki thread'de yapılır.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        # Metrikler
+        self._completed = 0
+        self._rejected = 0
+        self._peak_pending = 0
+
+    def _acquire(self, check_limit: bool = True):
+        with self._lock:
+            if check_limit and self._pending >= self.max_pending:
+                self._rejected += 1
+                raise ExecutorOverloaded(self.name)
+            self._pending += 1
+            self._peak_pending = max(self._peak_pending, self._pending)
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+
+    async def run(self, fn, *args, check_limit: bool = True):
+        """
+        fn(*args) havuzda çalıştırılır ve sonucu döner.
+        check_limit=False: Başka bir yerde zaten kabul edilmiş işler içindir (örn. batcher'ın kendi kuyruk sınırı var);
+        bu işler reddedilmez ama bekleyen iş sayısına dahil edilir.
+        """
+        self._acquire(check_limit)
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        # Sayaç, iş gerçekten bittiğinde düşer (bekleyen istek iptal edilse bile thread işi bitirir)
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "peak_pending": self._peak_pending,
+            "completed": self._completed,
+            "rejected": self._rejected
+        }
+
+
+# Model çıkarımı ile görsel işleri ayrı havuzlarda: Uzun süren çıkarımlar decode/encode'u aç bırakmaz
+inference_executor = BoundedExecutor("inference", INFERENCE_THREADS, INFERENCE_MAX_PENDING)
+image_executor = BoundedExecutor("image", IMAGE_THREADS, IMAGE_MAX_PENDING)
+
+
+async def run_inference(fn, *args, check_limit: bool = True):
+    """Model çıkarımını (torch, EasyOCR, MTCNN, ORB eşleştirme) inference havuzunda çalıştırır."""
+    return await inference_executor.run(fn, *args, check_limit=check_limit)
+
+
+async def run_image(fn, *args):
+    """Görsel decode/encode, hash ve bcrypt gibi kısa CPU işlerini image havuzunda çalıştırır."""
+    return await image_executor.run(fn, *args)
+
+
+def executor_stats() -> list:
+    return [inference_executor.stats(), image_executor.stats()]
+
+
+def shutdown_executors():
+    for executor in (inference_executor, image_executor):
+        executor.shutdown()
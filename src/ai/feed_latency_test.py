@@ -0,0 +1,129 @@
+import argparse
+import asyncio
+import io
+import sys
+import time
+import uuid
+from collections import Counter
+
+import httpx
+import numpy as np
+from PIL import Image
+
+
+def random_image(seed: int, size=(1024, 768)) -> bytes:
+    """Her yükleme için farklı (önbelleğe takılmayan) bir JPEG üretir."""
+    rng = np.random.default_rng(seed)
+    arr = rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+    buffered = io.BytesIO()
+    Image.fromarray(arr).save(buffered, format="JPEG")
+    return buffered.getvalue()
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float) -> bool:
+    """Modeller yüklenene kadar bekler (/v1/moderation/ready 200): Soğuk başlangıç ölçüme karışmasın."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        r = await client.get("/v1/moderation/ready")
+        if r.status_code == 200:
+            return True
+        await asyncio.sleep(1)
+    return False
+
+
+async def create_user(client: httpx.AsyncClient) -> str:
+    name = f"latency_{uuid.uuid4().hex[:8]}"
+    r = await client.post("/v1/auth/signup", json={"email": f"{name}@test.com", "username": name, "name": name, "password": "latency-test"})
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+async def seed_feed(client: httpx.AsyncClient, token: str, tag: str, count: int = 5):
+    """Ölçülecek feed için metin gönderileri oluşturur (yanıt boyutu iki aşamada da aynı kalsın)."""
+    for i in range(count):
+        r = await client.post("/v1/posts/", data={"content": f"gecikme testi {i} #{tag}", "token": token})
+        r.raise_for_status()
+
+
+async def sample_feed(client: httpx.AsyncClient, tag: str, count: int, interval: float) -> list:
+    """Feed'i arka arkaya çağırıp her isteğin gecikmesini (ms) döner."""
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        r = await client.get("/v1/posts/feed", params={"limit": 5, "hashtag": tag})
+        latencies.append((time.perf_counter() - start) * 1000)
+        r.raise_for_status()
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def upload(client: httpx.AsyncClient, token: str, seed: int, image: bytes) -> int:
+    files = {"image_file": (f"{seed}.jpg", image, "image/jpeg")}
+    r = await client.post("/v1/posts/", data={"content": "gecikme testi", "token": token}, files=files, timeout=300)
+    return r.status_code
+
+
+def summary(latencies: list) -> dict:
+    return {
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+        "max": float(np.max(latencies))
+    }
+
+
+async def run(args) -> bool:
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        if not await wait_ready(client, args.ready_timeout):
+            print(f"❌ Modeller {args.ready_timeout:.0f} sn içinde yüklenmedi (/v1/moderation/ready)")
+            return False
+        token = await create_user(client)
+        tag = f"feedlatency{uuid.uuid4().hex[:8]}"
+        await seed_feed(client, token, tag)
+
+        # 1) Yük yokken feed gecikmesi
+        baseline = summary(await sample_feed(client, tag, args.samples, args.interval))
+
+        # 2) Görsel yüklemeleri moderasyondayken feed gecikmesi
+        # Görseller önceden üretilir, yoksa istemcinin kendi event loop'u ölçümü bozar
+        images = [random_image(seed, (args.width, args.height)) for seed in range(args.uploads)]
+        uploads = [asyncio.create_task(upload(client, token, seed, image)) for seed, image in enumerate(images)]
+        await asyncio.sleep(0.2)  # Yüklemelerin moderasyona girmesini bekle
+        loaded = summary(await sample_feed(client, tag, args.samples, args.interval))
+        upload_statuses = await asyncio.gather(*uploads, return_exceptions=True)
+
+    print("\n" + "=" * 50)
+    print("FEED GECİKMESİ (ms) - Moderasyon yükü altında")
+    print("=" * 50)
+    print(f"Yük yok        p50: {baseline['p50']:8.2f} | p95: {baseline['p95']:8.2f} | maks: {baseline['max']:8.2f}")
+    print(f"{args.uploads:3d} yükleme    p50: {loaded['p50']:8.2f} | p95: {loaded['p95']:8.2f} | maks: {loaded['max']:8.2f}")
+    print(f"Yükleme durumları: {dict(Counter(s if isinstance(s, int) else type(s).__name__ for s in upload_statuses))}")
+
+    # Feed sabit kalmalı: p95, yüksüz p95'in en fazla 'factor' katı (+ küçük mutlak tolerans) olabilir
+    limit = baseline["p95"] * args.factor + args.slack_ms
+    # Yüklemeler de tamamlanmalı: 5xx / bağlantı hatası varsa ölçüm yükü yansıtmaz
+    uploads_ok = all(isinstance(s, int) and s < 500 for s in upload_statuses)
+    passed = loaded["p95"] <= limit and uploads_ok
+    print(f"Sınır (p95)    : {limit:.2f} ms -> {'✅ GEÇTİ' if passed else '❌ KALDI'}"
+          f"{'' if uploads_ok else ' (başarısız yükleme var)'}")
+    print("=" * 50)
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Görsel moderasyonu sürerken /v1/posts/feed gecikmesinin sabit kaldığını doğrular")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Çalışan API adresi (uvicorn src.main:app)")
+    parser.add_argument("--uploads", type=int, default=8, help="Eşzamanlı görsel yükleme sayısı (DB bağlantı havuzunu aşmayın)")
+    parser.add_argument("--width", type=int, default=1600, help="Yüklenen görsel genişliği")
+    parser.add_argument("--height", type=int, default=1200, help="Yüklenen görsel yüksekliği")
+    parser.add_argument("--samples", type=int, default=40, help="Her aşamada feed isteği sayısı")
+    parser.add_argument("--interval", type=float, default=0.05, help="Feed istekleri arası bekleme (sn)")
+    parser.add_argument("--factor", type=float, default=3.0, help="İzin verilen p95 artış katı")
+    parser.add_argument("--slack-ms", type=float, default=50.0, help="Mutlak tolerans (ms); tek çekirdekte CPU paylaşımı kuyruğu uzatır")
+    parser.add_argument("--ready-timeout", type=float, default=600, help="Modellerin yüklenmesi için beklenecek süre (sn)")
+    args = parser.parse_args()
+
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#Görsel Analiz Önbelleği - Aynı veya çok benzer görseller (meme, repost) tekrar analiz edilmez
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+try:
+    from .model_registry import registry
+except ImportError:  # Script olarak (src/ai içinden) çalıştırıldığında
+    from model_registry import registry
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", "4096"))            # Bellekte tutulacak maksimum kayıt
+IMAGE_CACHE_MAX_HAMMING = int(os.getenv("IMAGE_CACHE_MAX_HAMMING", "3"))  # Benzer sayılacak maksimum dHash farkı (bit, en fazla 3)
+IMAGE_CACHE_PERSIST = os.getenv("IMAGE_CACHE_PERSIST", "1") == "1"       # Kayıtlar veritabanına da yazılsın mı?
+
+# dHash 64 bit -> 4 adet 16 bitlik bant. İki hash arasında en fazla 3 bit fark varsa
+# (güvercin yuvası ilkesi) en az bir bant birebir aynıdır; veritabanında bantlar üzerinden aday aranır.
+DHASH_BANDS = 4
+DHASH_MAX_HAMMING = DHASH_BANDS - 1  # Bant araması bundan büyük farkta eşleşmeleri kaçırır
+
+
+def image_sha256(image: Image.Image) -> str:
+    """Çözülmüş (decode edilmiş) piksel verisinin SHA-256 özeti. Dosya formatından bağımsızdır."""
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """
+    Difference hash (dHash): Görsel (hash_size+1)x(hash_size) gri tona küçültülür,
+    yan yana piksellerin parlaklık karşılaştırması bit olarak saklanır.
+    Yeniden boyutlandırma / sıkıştırma sonrası da büyük ölçüde aynı kalır.
+    """
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def near_duplicate_entry(entry: dict) -> dict:
+    """
+    Benzer (dHash) isabette sadece CLIP görsel analizi paylaşılır: Aynı meme şablonuna yeni yazı eklenmiş olabilir,
+    OCR ve OCR metin moderasyonu her zaman yeniden çalışır. Tam karar yalnızca birebir (SHA-256) isabette kullanılır.
+    """
+    return {"analysis": entry["analysis"], "ocr_text": None, "ocr_moderation": None}
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def dhash_bands(value: int) -> list:
+    """64 bitlik hash'i 16 bitlik bantlara ayırır (yüksek bitten düşüğe)."""
+    width = 64 // DHASH_BANDS
+    mask = (1 << width) - 1
+    return [(value >> (width * (DHASH_BANDS - 1 - i))) & mask for i in range(DHASH_BANDS)]
+
+
+_version_cache = {}
+
+def analysis_version() -> str:
+    """
+    Önbellek sürümü: Model isimleri ve etiket/kategori setinin özeti.
+    Politika (etiketler, kategoriler) veya model değişirse eski kayıtlar otomatik geçersiz olur.
+    """
+    content_mod = registry.get("content_moderator")
+    text_mod = registry.get("text_moderator")
+    key = (id(content_mod), id(text_mod))
+    if key not in _version_cache:
+        payload = json.dumps({
+            "clip_model": content_mod.model_name,
+            "clip_backend": content_mod.vision_backend.name,
+            "policies": content_mod.policies.fingerprint(),
+            "text_model": text_mod.model_name
+        }, sort_keys=True)
+        _version_cache[key] = hashlib.sha256(payload.encode()).hexdigest()[:16]
+    return _version_cache[key]
+
+
+class ImageAnalysisCache:
+    """
+    Bellek içi LRU önbellek.
+    Kayıt: {"analysis": analyze_image sonucu, "ocr_text": str|None, "ocr_moderation": dict|None}
+    ocr_text None ise OCR henüz çalıştırılmamış demektir (örn. görsel zaten reddedildi).
+    Benzer görsel isabetinde OCR alanları boş döner (near_duplicate_entry).
+    """
+
+    def __init__(self, max_entries: int = IMAGE_CACHE_SIZE, max_distance: int = IMAGE_CACHE_MAX_HAMMING):
+        if not 0 <= max_distance <= DHASH_MAX_HAMMING:
+            raise ValueError(f"IMAGE_CACHE_MAX_HAMMING 0-{DHASH_MAX_HAMMING} arasında olmalı "
+                             f"({DHASH_BANDS} bantlı aramada daha büyük fark eşleşmeleri kaçırır): {max_distance}")
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._entries = OrderedDict()  # (version, sha256) -> (dhash, entry)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def get(self, sha256: str, image_dhash: int, version: str):
+        """Önce birebir (SHA-256), yoksa dHash ile benzer görsel arar (benzer isabette sadece görsel analizi)."""
+        with self._lock:
+            key = (version, sha256)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][1]
+
+            if self.max_distance > 0:
+                same_version = [(k, h) for k, (h, _) in self._entries.items() if k[0] == version]
+                if same_version:
+                    hashes = np.array([h for _, h in same_version], dtype=np.uint64)
+                    xor = np.bitwise_xor(hashes, np.uint64(image_dhash))
+                    distances = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+                    best = int(distances.argmin())
+                    if distances[best] <= self.max_distance:
+                        best_key = same_version[best][0]
+                        self._entries.move_to_end(best_key)
+                        self.near_hits += 1
+                        return near_duplicate_entry(self._entries[best_key][1])
+
+            self.misses += 1
+            return None
+
+    def put(self, sha256: str, image_dhash: int, version: str, entry: dict):
+        with self._lock:
+            key = (version, sha256)
+            self._entries[key] = (image_dhash, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses
+        }
+
+
+image_cache = ImageAnalysisCache()
@@ -0,0 +1,222 @@
+#Görsel Alımı (Ingestion) - Yüklenen görsel bir kez decode edilir, tüm tüketiciler aynı türetilmiş tamponları kullanır
+
+import os
+import io
+import time
+import base64
+
+import numpy as np
+from PIL import Image, ImageOps
+
+try:
+    from .model_registry import registry
+    from .image_cache import image_sha256, dhash, analysis_version
+except ImportError:  # Script olarak (src/ai içinden) çalıştırıldığında
+    from model_registry import registry
+    from image_cache import image_sha256, dhash, analysis_version
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+IMAGE_STORAGE_MAX_SIDE = int(os.getenv("IMAGE_STORAGE_MAX_SIDE", "2048"))   # Saklanan görselin en uzun kenarı (0 = sınırsız)
+IMAGE_STORAGE_QUALITY = int(os.getenv("IMAGE_STORAGE_QUALITY", "75"))       # Yeniden kodlamada JPEG kalitesi
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "1280"))                       # OCR'a verilen gri görselin en uzun kenarı
+
+CLIP_INPUT_SIZE = 224   # CLIP ViT-B/32 giriş boyutu
+EXIF_ORIENTATION = 0x0112
+
+# Saklanan JPEG'den çıkarılan metadata segmentleri: APP1 (EXIF/XMP, GPS dahil), APP13 (IPTC)
+_STRIPPED_JPEG_MARKERS = {0xE1, 0xED}
+
+
+def _working_side() -> int:
+    """Analiz ve saklama için gereken en büyük kenar uzunluğu (decode bu boyuta kadar küçültülebilir)."""
+    if IMAGE_STORAGE_MAX_SIDE <= 0:
+        return 0
+    return max(IMAGE_STORAGE_MAX_SIDE, OCR_MAX_SIDE)
+
+
+def _fit_size(size, max_side: int):
+    """En uzun kenarı max_side olacak şekilde oranı koruyan boyut."""
+    width, height = size
+    scale = max_side / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _jpeg_end(data: bytes, position: int):
+    """
+    İlk SOS segmentinden (position) itibaren EOI marker'ının bittiği konum; bulunamazsa None.
+    Sıkıştırılmış verideki 0xFF00 / RST marker'ları ve progressive JPEG'lerde taramalar arası segmentler atlanır.
+    """
+    while True:
+        if position + 2 > len(data):
+            return None
+        if data[position + 1] == 0xD9:  # EOI
+            return position + 2
+        if position + 4 > len(data):
+            return None
+        length = int.from_bytes(data[position + 2:position + 4], "big")
+        if length < 2 or position + 2 + length > len(data):
+            return None
+        position += 2 + length
+        # Sonraki marker (SOS sonrası sıkıştırılmış veri atlanır)
+        while True:
+            position = data.find(b"\xff", position)
+            if position < 0 or position + 1 >= len(data):
+                return None
+            following = data[position + 1]
+            if following == 0x00 or following == 0xFF or 0xD0 <= following <= 0xD7:
+                position += 1
+                continue
+            break
+
+
+def strip_jpeg_metadata(data: bytes):
+    """
+    JPEG'i yeniden kodlamadan (kayıpsız) EXIF/XMP/IPTC segmentlerini çıkarır.
+    Konum (GPS) gibi bilgiler saklanan görselde kalmaz. EOI'den sonra eklenmiş baytlar (gizlenmiş dosya vb.) atılır.
+    Dosya beklenen yapıda değilse None döner (görsel yeniden kodlanır).
+    """
+    if data[:2] != b"\xff\xd8":
+        return None
+
+    output = bytearray(b"\xff\xd8")
+    position = 2
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xDA:  # SOS: Görsel verisi başlıyor, EOI'ye kadar olduğu gibi kopyalanır
+            end = _jpeg_end(data, position)
+            if end is None:
+                return None
+            output += data[position:end]
+            return bytes(output)
+        length = int.from_bytes(data[position + 2:position + 4], "big")
+        segment_end = position + 2 + length
+        if length < 2 or segment_end > len(data):
+            return None
+        if marker not in _STRIPPED_JPEG_MARKERS:
+            output += data[position:segment_end]
+        position = segment_end
+    return None
+
+
+def open_image(contents: bytes, max_side: int = None):
+    """
+    Görseli tek seferde, gerektiği kadar küçük çözünürlükte açar.
+    - JPEG: draft() ile DCT ölçekleme (1/2, 1/4, 1/8) sayesinde tam çözünürlük hiç decode edilmez.
+    - Diğer formatlar: decode sonrası reduce() ile hızlı tam sayı küçültme.
+    - EXIF yönü (telefon fotoğrafları) uygulanır, görsel RGB'ye çevrilir.
+    max_side: None = analiz/saklama için gereken boyut, 0 = tam çözünürlük (küçültme yok).
+    Dönüş: (RGB görsel, kaynak bilgisi)
+    """
+    max_side = _working_side() if max_side is None else max_side
+    image = Image.open(io.BytesIO(contents))
+    source = {
+        "format": image.format,
+        "mode": image.mode,
+        "size": image.size,
+        "orientation": image.getexif().get(EXIF_ORIENTATION, 1),
+        "reduced": False
+    }
+
+    if max_side and max(image.size) > max_side:
+        if image.format == "JPEG":
+            image.draft("RGB", _fit_size(image.size, max_side))
+        image.load()
+        factor = max(image.size) // max_side
+        if factor > 1:
+            image = image.reduce(factor)
+        if max(image.size) > max_side:
+            image = image.resize(_fit_size(image.size, max_side), Image.BILINEAR, reducing_gap=2.0)
+        source["reduced"] = True
+
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image, source
+
+
+class IngestedImage:
+    """
+    Bir yüklemenin tüm tüketicilerinin paylaştığı tamponlar:
+    - clip_pixels: CLIP girişi (3x224x224 tensor), batcher doğrudan kullanır
+    - ocr_array:   OCR için en fazla OCR_MAX_SIDE boyutunda gri numpy dizisi
+    - keys:        Analiz önbelleği anahtarları (sürüm, SHA-256, dHash)
+    - storage:     Saklanacak JPEG (uygun JPEG yüklemelerinde yeniden kodlanmaz)
+    """
+
+    def __init__(self, image, source: dict, original: bytes, clip_pixels, ocr_array, keys: tuple, timings: dict):
+        self.image = image
+        self.source = source
+        self.clip_pixels = clip_pixels
+        self.ocr_array = ocr_array
+        self.keys = keys
+        self.timings = timings
+        self._original = original
+        self._storage = None
+
+    def _storage_passthrough(self):
+        """Yükleme zaten uygun bir JPEG ise (RGB/gri, yönü düz, boyutu sınır içinde) metadata'sı temizlenmiş hali."""
+        source = self.source
+        if source["format"] != "JPEG" or source["mode"] not in ("RGB", "L"):
+            return None
+        if source["reduced"] or source["orientation"] != 1:
+            return None
+        return strip_jpeg_metadata(self._original)
+
+    def storage_bytes(self) -> bytes:
+        """Saklanacak JPEG. Gerekirse kodlama burada (bir kez) yapılır; image havuzunda çağrılmalıdır."""
+        if self._storage is None:
+            start = time.perf_counter()
+            storage = self._storage_passthrough()
+            if storage is None:
+                image = self.image
+                if IMAGE_STORAGE_MAX_SIDE and max(image.size) > IMAGE_STORAGE_MAX_SIDE:
+                    image = image.resize(_fit_size(image.size, IMAGE_STORAGE_MAX_SIDE), Image.BICUBIC, reducing_gap=2.0)
+                buffered = io.BytesIO()
+                image.save(buffered, format="JPEG", quality=IMAGE_STORAGE_QUALITY)
+                storage = buffered.getvalue()
+                self.timings["encode_ms"] = (time.perf_counter() - start) * 1000
+            else:
+                self.timings["encode_ms"] = 0.0
+            self._storage = storage
+            self._original = None  # Artık gerek yok
+        return self._storage
+
+    def storage_data_uri(self) -> str:
+        image_base64 = base64.b64encode(self.storage_bytes()).decode('utf-8')
+        return f"data:image/jpeg;base64,{image_base64}"
+
+
+def ingest_image(contents: bytes, preprocess=None, version: str = None) -> IngestedImage:
+    """
+    Yüklenen görseli bir kez decode eder ve türetilmiş tamponları üretir. image havuzunda çalışır.
+    analysis_version() ve CLIP ön işleme lazy modda modeli yükleyebileceği için bunlar da event loop dışındadır.
+    preprocess / version: Varsayılan olarak kayıtlı ContentModerator kullanılır (benchmark'ta değiştirilebilir).
+    """
+    preprocess = preprocess or registry.get("content_moderator").preprocess
+    timings = {}
+    start = time.perf_counter()
+    image, source = open_image(contents)
+    timings["decode_ms"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    # CLIP: Önce kısa kenar ~2x224 olana kadar hızlı tam sayı küçültme, son boyutlandırma CLIP işlemcisinde
+    clip_factor = max(1, min(image.size) // (2 * CLIP_INPUT_SIZE))
+    clip_source = image.reduce(clip_factor) if clip_factor > 1 else image
+    clip_pixels = preprocess(clip_source)
+
+    # OCR: Gri ve küçültülmüş (EasyOCR zaten griye çeviriyor)
+    ocr_image = image.convert("L")
+    if OCR_MAX_SIDE and max(ocr_image.size) > OCR_MAX_SIDE:
+        ocr_image = ocr_image.resize(_fit_size(ocr_image.size, OCR_MAX_SIDE), Image.BILINEAR, reducing_gap=2.0)
+    ocr_array = np.asarray(ocr_image)
+
+    # Önbellek anahtarları: Birebir anahtar (SHA-256) OCR'ın da okuduğu çözülmüş görselin tamamından,
+    # benzerlik anahtarı (dHash) küçük kopyadan. Küçük kopyada yalnızca ince yazısı farklı olan
+    # yüklemeler aynı SHA-256'yı alıp birbirinin OCR sonucunu paylaşırdı.
+    keys = (version or analysis_version(), image_sha256(image), dhash(clip_source))
+    timings["derive_ms"] = (time.perf_counter() - start) * 1000
+
+    return IngestedImage(image, source, contents, clip_pixels, ocr_array, keys, timings)
@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Uygulama import edilirken yüklenmemesi gereken ağır AI paketleri (modeller ilk kullanımda yüklenir)
+HEAVY_MODULES = ["torch", "torchvision", "transformers", "easyocr", "cv2", "facenet_pytorch", "onnxruntime"]
+
+PROBE = (
+    "import sys, json, src.main; "
+    f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+)
+
+
+def measure(mode: str) -> dict:
+    """
+    'python -X importtime -c "import src.main"' çalıştırır.
+    Dönüş: src.main kümülatif import süresi (ms), en pahalı üst seviye modüller ve yüklenen ağır paketler.
+    """
+    env = dict(os.environ, AI_MODE=mode, MODEL_PRELOAD="lazy")
+    env.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/import_time.db")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+
+    # Satır formatı: "import time: <self us> | <cumulative us> | <girinti><modül>"
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        timings.append((name.strip(), int(cumulative_us.strip()), depth))
+
+    # Çocuk modüller ebeveynden önce yazılır: src.main satırından geriye doğru bir alt seviye toplanır
+    index = next(i for i, (name, _, depth) in enumerate(timings) if name == "src.main" and depth == 0)
+    total_us = timings[index][1]
+    children = []
+    for name, cumulative, depth in reversed(timings[:index]):
+        if depth == 0:
+            break
+        if depth == 1:
+            children.append((name, cumulative))
+    top_level = sorted(children, key=lambda item: -item[1])
+    return {
+        "total_ms": total_us / 1000,
+        "top": [(name, cumulative / 1000) for name, cumulative in top_level[:10]],
+        "heavy": json.loads(result.stdout.strip().splitlines()[-1])
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="src.main import süresi bütçesi: Ağır AI paketleri açılışta import edilmemeli")
+    parser.add_argument("--mode", default="lite", choices=["lite", "full"], help="AI_MODE (full modda da modeller import anında yüklenmemeli)")
+    parser.add_argument("--budget-ms", type=float, default=2000.0, help="src.main için izin verilen kümülatif import süresi")
+    parser.add_argument("--runs", type=int, default=3, help="Ölçüm tekrarı (en iyi sonuç alınır, disk önbelleği etkisi azalır)")
+    args = parser.parse_args()
+
+    results = [measure(args.mode) for _ in range(args.runs)]
+    best = min(results, key=lambda r: r["total_ms"])
+    heavy = sorted({module for r in results for module in r["heavy"]})
+
+    print("\n" + "=" * 55)
+    print(f"IMPORT SÜRESİ - src.main (AI_MODE={args.mode}, {args.runs} ölçüm)")
+    print("=" * 55)
+    print(f"  {'src.main':<40} {best['total_ms']:9.1f} ms")
+    for name, ms in best["top"]:
+        print(f"    {name:<38} {ms:9.1f} ms")
+    print("-" * 55)
+    runs = ", ".join(f"{r['total_ms']:.0f}" for r in results)
+    print(f"Toplam (en iyi)  : {best['total_ms']:.1f} ms | ölçümler: {runs} ms")
+    print(f"Ağır paketler    : {', '.join(heavy) if heavy else 'yok'}")
+
+    passed = best["total_ms"] <= args.budget_ms and not heavy
+    print(f"Bütçe            : {args.budget_ms:.0f} ms -> {'✅ GEÇTİ' if passed else '❌ KALDI'}")
+    print("=" * 55)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import io
+import multiprocessing
+import resource
+import time
+
+import numpy as np
+from PIL import Image
+
+
+def make_photo(width: int, height: int) -> bytes:
+    """Telefon fotoğrafına benzer, EXIF yönü (6 = 90° döndür) işaretli büyük bir JPEG üretir."""
+    rng = np.random.default_rng(42)
+    # Tamamen rastgele gürültü yerine yumuşak geçişli bir görsel (gerçek fotoğraflara yakın sıkıştırma)
+    small = rng.integers(0, 255, (height // 64, width // 64, 3), dtype=np.uint8)
+    image = Image.fromarray(small).resize((width, height), Image.BILINEAR)
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=90, exif=exif.tobytes())
+    return buffered.getvalue()
+
+
+def clip_preprocess():
+    """Model ağırlıkları olmadan CLIP ön işlemesi (varsayılan CLIPImageProcessor ayarları ViT-B/32 ile aynı)."""
+    from transformers import CLIPImageProcessor
+    processor = CLIPImageProcessor()
+    return lambda image: processor(images=image, return_tensors="pt")["pixel_values"][0]
+
+
+def legacy_path(contents: bytes, preprocess):
+    """Eski yol: Tam çözünürlükte decode, her tüketici kendi kopyasını üretir, saklama için yeniden kodlama."""
+    from image_cache import image_sha256, dhash
+    image = Image.open(io.BytesIO(contents))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    preprocess(image)
+    np.asarray(image.convert("L"))
+    image_sha256(image), dhash(image)
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG")
+    return buffered.getvalue()
+
+
+def ingest_path(contents: bytes, preprocess):
+    """Yeni yol: Tek decode (draft/reduce), paylaşılan tamponlar."""
+    from image_ingest import ingest_image
+    ingested = ingest_image(contents, preprocess=preprocess, version="benchmark")
+    return ingested.storage_bytes()
+
+
+def _worker(method: str, contents: bytes, runs: int, queue):
+    """Her yöntem ayrı süreçte ölçülür; ru_maxrss süreç boyunca sadece artabildiği için."""
+    preprocess = clip_preprocess()
+    fn = legacy_path if method == "legacy" else ingest_path
+    fn(contents, preprocess)  # Isınma (import ve ilk ayırmalar)
+
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        stored = fn(contents, preprocess)
+        latencies.append((time.perf_counter() - start) * 1000)
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put({
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "mean_ms": float(np.mean(latencies)),
+        "peak_rss_mb": rss_after / 1024,
+        "stored_kb": len(stored) / 1024
+    })
+
+
+def _baseline_rss(queue):
+    """Aynı importlar yapılmış ama görsel işlenmemiş bir sürecin tepe RSS'i."""
+    clip_preprocess()
+    import image_ingest  # noqa: F401
+    queue.put(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+
+
+def run_isolated(target, *args):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=target, args=(*args, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tek decode görsel alımı benchmark'ı (decode süresi ve tepe RSS)")
+    parser.add_argument("--width", type=int, default=6000, help="Görsel genişliği (varsayılan 24MP)")
+    parser.add_argument("--height", type=int, default=4000, help="Görsel yüksekliği")
+    parser.add_argument("--runs", type=int, default=5, help="Tekrar sayısı")
+    args = parser.parse_args()
+
+    contents = make_photo(args.width, args.height)
+    baseline_mb = run_isolated(_baseline_rss)
+    results = {method: run_isolated(_worker, method, contents, args.runs) for method in ("legacy", "ingest")}
+
+    print("\n" + "=" * 50)
+    print(f"GÖRSEL ALIMI BENCHMARK ({args.width}x{args.height}, {len(contents) / 1024:.0f} KB JPEG)")
+    print("=" * 50)
+    for name, r in results.items():
+        print(f"{name:8s} p50: {r['p50_ms']:8.2f} ms | ort: {r['mean_ms']:8.2f} ms | "
+              f"tepe RSS: +{r['peak_rss_mb'] - baseline_mb:7.1f} MB | saklanan: {r['stored_kb']:7.1f} KB")
+    print(f"Hızlanma (p50)     : x{results['legacy']['p50_ms'] / results['ingest']['p50_ms']:.2f}")
+    print(f"Tepe RSS azalması  : x{(results['legacy']['peak_rss_mb'] - baseline_mb) / max(results['ingest']['peak_rss_mb'] - baseline_mb, 1):.2f}")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+#Model Registry - Her model süreç (process) başına sadece bir kez yüklenir
+
+import gc
+import os
+import asyncio
+import sys
+import time
+import threading
+
+import numpy as np
+from PIL import Image
+
+try:
+    import psutil
+except ImportError:  # psutil yoksa bellek raporu boş döner
+    psutil = None
+
+# eager: Modeller uygulama açılışında (lifespan) arka planda yüklenir
+# lazy: Modeller ilk kullanıldıkları istekte yüklenir
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "eager").lower()
+# full: AI özellikleri açık (varsayılan)
+# lite: Hiçbir model yüklenmez (torch/easyocr/cv2 import edilmez), AI gerektiren endpoint'ler 503 döner.
+#       Sadece feed/profil gibi istekleri karşılayan worker'lar için.
+AI_MODE = os.getenv("AI_MODE", "full").lower()
+
+
+class AIUnavailable(RuntimeError):
+    """AI_MODE=lite iken AI gerektiren bir işlem istendiğinde fırlatılır (API'de 503'e çevrilir)."""
+
+    def __init__(self, name: str = None):
+        self.name = name
+        super().__init__(f"AI özellikleri bu sunucuda kapalı (AI_MODE=lite){f': {name}' if name else ''}")
+
+
+def require_ai():
+    """AI gerektiren route'lar için dependency: Lite modda istek gövdesi okunmadan 503 döndürülür."""
+    if AI_MODE == "lite":
+        raise AIUnavailable()
+
+
+def _current_rss_mb():
+    """Sürecin o anki resident bellek kullanımını (MB) döner."""
+    if psutil is None:
+        return None
+    return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+
+
+def memory_breakdown(pid: int = None):
+    """
+    Sürecin paylaşılan / özel bellek dağılımı (MB), /proc/<pid>/smaps üzerinden (sadece Linux).
+    - shared: Başka süreçlerle (ör. fork edilmiş worker'lar) paylaşılan sayfalar
+    - private: Sadece bu sürece ait sayfalar (copy-on-write ile kopyalananlar dahil)
+    - pss: Paylaşılan sayfalar süreç sayısına bölünerek; tüm worker'ların PSS toplamı gerçek bellek kullanımıdır
+    - mapped_weights: Bellek eşlemli (mmap) .safetensors dosyalarının bellekteki kısmı
+    """
+    pid = pid or os.getpid()
+    fields = {"Rss": 0, "Pss": 0, "Shared_Clean": 0, "Shared_Dirty": 0, "Private_Clean": 0, "Private_Dirty": 0}
+    mapped_weights = 0
+    try:
+        with open(f"/proc/{pid}/smaps") as f:
+            in_weights = False
+            for line in f:
+                key, _, rest = line.partition(":")
+                if " " in key:
+                    # Yeni eşleme başlığı: "adres izinler offset cihaz inode [yol]"
+                    in_weights = line.rstrip().endswith(".safetensors")
+                    continue
+                if key in fields:
+                    value = int(rest.split()[0])
+                    fields[key] += value
+                    if key == "Rss" and in_weights:
+                        mapped_weights += value
+    except OSError:
+        return None
+    return {
+        "rss_mb": round(fields["Rss"] / 1024, 1),
+        "pss_mb": round(fields["Pss"] / 1024, 1),
+        "shared_mb": round((fields["Shared_Clean"] + fields["Shared_Dirty"]) / 1024, 1),
+        "private_mb": round((fields["Private_Clean"] + fields["Private_Dirty"]) / 1024, 1),
+        "mapped_weights_mb": round(mapped_weights / 1024, 1)
+    }
+
+
+class ModelRegistry:
+    """
+    Ağır AI modellerini (CLIP, BERT, EasyOCR, MTCNN) süreç başına tek kopya olarak tutar.
+    - Lazy: get() ilk çağrıldığında model yüklenir.
+    - Eager: load_all() ile uygulama açılışında (lifespan) hepsi yüklenir.
+    Her model için yükleme süresi, warm-up süresi ve bellek artışı raporlanır.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._warmups = {}
+        self._models = {}
+        self._stats = {}
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+        self._preload_targets = []
+
+    def register(self, name: str, loader, warmup=None, preload: bool = True):
+        """
+        Yeni bir model tanımı ekler.
+        loader: Modeli oluşturan parametresiz fonksiyon.
+        warmup: Model yüklendikten sonra çalıştırılacak örnek çıkarım fonksiyonu (opsiyonel).
+        preload: True ise load_all() bu modeli de yükler ve hazır olma durumuna dahil edilir.
+        """
+        with self._registry_lock:
+            self._loaders[name] = loader
+            self._warmups[name] = warmup
+            self._locks[name] = threading.Lock()
+            self._stats[name] = {"loaded": False, "load_seconds": None, "warmup_seconds": None, "rss_delta_mb": None, "error": None}
+            if preload and name not in self._preload_targets:
+                self._preload_targets.append(name)
+
+    def get(self, name: str):
+        """Modeli döner, henüz yüklenmediyse yükler (thread-safe)."""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        if name not in self._loaders:
+            raise KeyError(f"Kayıtlı olmayan model: {name}")
+        if AI_MODE == "lite":
+            raise AIUnavailable(name)
+
+        # Aynı model için eşzamanlı iki yükleme olmasın
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is not None:
+                return model
+
+            stats = self._stats[name]
+            rss_before = _current_rss_mb()
+            start = time.perf_counter()
+            try:
+                model = self._loaders[name]()
+            except (Exception, SystemExit) as e:
+                # Modüller yükleme hatasında sys.exit() çağırıyor, süreci öldürmemesi için yakalıyoruz
+                stats["error"] = str(e) or e.__class__.__name__
+                raise RuntimeError(f"{name} yüklenemedi: {stats['error']}") from e
+
+            stats["load_seconds"] = round(time.perf_counter() - start, 3)
+            rss_after = _current_rss_mb()
+            if rss_before is not None and rss_after is not None:
+                stats["rss_delta_mb"] = round(rss_after - rss_before, 1)
+            stats["loaded"] = True
+            stats["error"] = None
+
+            self._models[name] = model
+            print(f"✅ {name} yüklendi ({stats['load_seconds']} sn)")
+            return model
+
+    async def ensure_loaded(self, *names):
+        """
+        Yüklenmemiş modelleri event loop ve sınırlı CPU havuzları dışında (varsayılan thread havuzu) yükler.
+        Havuza iş göndermeden önce çağrılır: İlk isteğin (lazy mod veya eager yükleme bitmeden gelen istek)
+        model yüklemesi inference / image havuzunda slot tutmaz, diğer istekleri bekletmez.
+        """
+        for name in names:
+            if name not in self._models:
+                await asyncio.to_thread(self.get, name)
+
+    def peek(self, name: str):
+        """Model yüklüyse döner, değilse None (yükleme tetiklemez)."""
+        return self._models.get(name)
+
+    def warmup(self, name: str):
+        """Modele örnek bir çıkarım yaptırır (ilk isteğin yavaş olmaması için)."""
+        warmup_fn = self._warmups.get(name)
+        if warmup_fn is None or self._stats[name]["warmup_seconds"] is not None:
+            return
+        model = self.get(name)
+        start = time.perf_counter()
+        warmup_fn(model)
+        self._stats[name]["warmup_seconds"] = round(time.perf_counter() - start, 3)
+
+    def load_all(self, names=None, warmup: bool = True):
+        """
+        Verilen (veya preload olarak işaretli tüm) modelleri yükler.
+        Bir modelin hatası diğerlerinin yüklenmesini engellemez.
+        """
+        if AI_MODE == "lite":
+            return
+        for name in (names or list(self._preload_targets)):
+            try:
+                self.get(name)
+                if warmup:
+                    self.warmup(name)
+            except Exception as e:
+                print(f"❌ {e}")
+
+    def prepare_for_fork(self) -> dict:
+        """
+        Pre-fork sunucuda worker'lar fork edilmeden önce master süreçte çağrılır.
+        - Yüklü modellerdeki torch modülleri eval + requires_grad=False yapılır; çıkarım ağırlıklara yazmadığı için
+          ağırlık sayfaları worker'lar arasında copy-on-write ile paylaşılmış olarak kalır.
+        - Ağırlıklar kopyalanmaz / taşınmaz (.to(), .float() yok); mmap ile yüklenen safetensors eşlemeleri korunur.
+        - gc.freeze(): Master'da oluşan nesneler GC taramasına girmez, GC sayfalara yazıp kopyalanmalarına yol açmaz.
+        - prepare_for_fork() metodu olan modeller fork'tan sağ çıkmayan durumlarını bırakır (ör. ONNX Runtime oturumu);
+          worker'lar bunları warm-up'ta kendileri kurar.
+        Dönüş: Paylaşıma hazırlanan modül sayısı ve parametre boyutu (MB).
+        """
+        for model in self._models.values():
+            hook = getattr(model, "prepare_for_fork", None)
+            if callable(hook):
+                hook()
+
+        modules, parameter_bytes = 0, 0
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            seen = set()
+            for model in self._models.values():
+                # Model nesnesinin kendisi veya bir seviye alttaki nitelikleri (ör. .model, .mtcnn, .detector)
+                candidates = [model] + list(getattr(model, "__dict__", {}).values())
+                for candidate in candidates:
+                    if not isinstance(candidate, torch.nn.Module) or id(candidate) in seen:
+                        continue
+                    seen.add(id(candidate))
+                    candidate.eval()
+                    candidate.requires_grad_(False)
+                    modules += 1
+                    parameter_bytes += sum(p.numel() * p.element_size() for p in candidate.parameters())
+        gc.collect()
+        gc.freeze()
+        return {"modules": modules, "parameters_mb": round(parameter_bytes / (1024 * 1024), 1)}
+
+    def is_ready(self) -> bool:
+        """
+        Preload listesindeki bütün modeller yüklendiyse True.
+        Lazy ve lite modlarda beklenecek bir yükleme olmadığı için her zaman True.
+        """
+        if MODEL_PRELOAD == "lazy" or AI_MODE == "lite":
+            return True
+        return all(name in self._models for name in self._preload_targets)
+
+    def pending(self) -> list:
+        """Henüz yüklenmemiş preload modellerinin listesi."""
+        return [name for name in self._preload_targets if name not in self._models]
+
+    def report(self) -> dict:
+        """Model başına yükleme süresi, warm-up süresi ve bellek artışı raporu."""
+        return {
+            "ready": self.is_ready(),
+            "ai_mode": AI_MODE,
+            "process_rss_mb": round(_current_rss_mb(), 1) if psutil is not None else None,
+            "process_memory": memory_breakdown(),
+            "models": {name: dict(stats) for name, stats in self._stats.items()}
+        }
+
+
+# ---------------------------------------------------------
+# MODEL TANIMLARI
+# Importlar fonksiyon içinde yapılır; modül import edildiğinde torch yüklenmez.
+# ---------------------------------------------------------
+
+def _load_content_moderator():
+    from .content_moderator import ContentModerator
+    return ContentModerator()
+
+def _warmup_content_moderator(moderator):
+    moderator.analyze_image(Image.new("RGB", (224, 224), color=(128, 128, 128)))
+
+
+def _load_text_moderator():
+    from .text_moderator import TextModerator
+    return TextModerator()
+
+def _warmup_text_moderator(moderator):
+    moderator.analyze_text("merhaba dünya")
+
+
+def _load_ocr_reader():
+    import easyocr
+    import torch
+    return easyocr.Reader(['tr', 'en'], gpu=torch.cuda.is_available())
+
+def _warmup_ocr_reader(reader):
+    reader.readtext(np.full((64, 256, 3), 255, dtype=np.uint8), detail=0)
+
+
+def _load_ocr_service():
+    from .ocr_service import OCRService
+    # Okuyucu havuzu registry'deki tek EasyOCR Reader'ın ağırlıklarını paylaşır
+    return OCRService(registry.get("ocr_reader"))
+
+def _warmup_ocr_service(service):
+    service.read(np.full((64, 256), 255, dtype=np.uint8))
+
+
+def _load_card_reader():
+    from .card_reader import SpatialCardReader
+    # OCR okuyucusu gönderi moderasyonu ile paylaşılır (aynı ağırlıklar iki kez yüklenmez)
+    return SpatialCardReader(reader=registry.get("ocr_reader"))
+
+
+def _load_card_matcher():
+    from .card_matcher import CardMatcher
+    return CardMatcher(algorithm="orb")
+
+
+registry = ModelRegistry()
+registry.register("content_moderator", _load_content_moderator, _warmup_content_moderator)
+registry.register("text_moderator", _load_text_moderator, _warmup_text_moderator)
+registry.register("ocr_reader", _load_ocr_reader, _warmup_ocr_reader)
+registry.register("ocr_service", _load_ocr_service, _warmup_ocr_service)
+registry.register("card_reader", _load_card_reader)
+registry.register("card_matcher", _load_card_matcher)
@@ -0,0 +1,189 @@
+#Moderasyon Batcher - Eşzamanlı istekleri tek bir forward pass'te toplar
+
+import os
+import time
+import asyncio
+from collections import Counter, deque
+
+import numpy as np
+
+from .model_registry import registry
+from .executors import run_inference
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+BATCH_WINDOW_MS = float(os.getenv("MODERATION_BATCH_WINDOW_MS", "10"))   # İlk istekten sonra ne kadar beklenecek
+MAX_BATCH_SIZE = int(os.getenv("MODERATION_MAX_BATCH_SIZE", "16"))        # Bir batch'teki maksimum görsel
+MAX_QUEUE_SIZE = int(os.getenv("MODERATION_MAX_QUEUE_SIZE", "256"))       # Kuyruk dolunca yeni istek reddedilir
+TEXT_MAX_BATCH_SIZE = int(os.getenv("MODERATION_TEXT_MAX_BATCH_SIZE", "32"))  # Bir batch'teki maksimum metin
+
+
+class MicroBatcher:
+    """
+    Async micro-batching kuyruğu.
+    - submit(item) çağrıları kuyruğa girer ve her çağıran kendi future'ını bekler.
+    - İlk elemandan sonra window_ms kadar (veya max_batch_size dolana kadar) toplanan
+      elemanlar process_batch(list) ile tek seferde işlenir.
+    - process_batch senkron bir fonksiyondur ve event loop'u bloklamaması için inference havuzunda çalışır.
+    - Kuyruk doluysa submit asyncio.QueueFull fırlatır (back-pressure).
+    """
+
+    def __init__(self, process_batch, window_ms: float = BATCH_WINDOW_MS, max_batch_size: int = MAX_BATCH_SIZE,
+                 max_queue_size: int = MAX_QUEUE_SIZE, name: str = "batcher"):
+        self.process_batch = process_batch
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.max_queue_size = max_queue_size
+        self.name = name
+
+        self._queue = None
+        self._worker = None
+
+        # Metrikler
+        self._batch_sizes = Counter()
+        self._queue_waits_ms = deque(maxlen=2048)
+        self._processing_ms = deque(maxlen=2048)
+        self._submitted = 0
+        self._rejected = 0
+
+    def _ensure_worker(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def submit(self, item):
+        """Elemanı kuyruğa ekler ve batch işlendiğinde kendi sonucunu döner."""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self._rejected += 1
+            raise
+        self._submitted += 1
+        return await future
+
+    async def _collect(self):
+        """İlk elemanı bekler, sonra pencere kapanana veya batch dolana kadar toplar."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.window
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+
+            # Beklerken iptal edilen istekleri modele göndermeyiz
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                continue
+
+            now = time.perf_counter()
+            for _, _, enqueued_at in batch:
+                self._queue_waits_ms.append((now - enqueued_at) * 1000)
+            self._batch_sizes[len(batch)] += 1
+
+            try:
+                # Elemanlar kuyruğa girerken kabul edildi (MAX_QUEUE_SIZE), batch havuz sınırına takılmaz
+                results = await run_inference(self.process_batch, [item for item, _, _ in batch], check_limit=False)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self._processing_ms.append((time.perf_counter() - now) * 1000)
+
+            # Eksik / fazla sonuç: zip sessizce keserdi ve eşleşmeyen istekler sonsuza kadar beklerdi
+            if results is None or len(results) != len(batch):
+                error = RuntimeError(f"{self.name}: {len(batch)} eleman için "
+                                     f"{'sonuç yok' if results is None else f'{len(results)} sonuç'} döndü")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def stats(self) -> dict:
+        """Batch boyutu dağılımı ve kuyrukta bekleme süreleri."""
+        def percentiles(values):
+            if not values:
+                return {"p50": None, "p95": None, "max": None}
+            arr = np.fromiter(values, dtype=float)
+            return {
+                "p50": round(float(np.percentile(arr, 50)), 2),
+                "p95": round(float(np.percentile(arr, 95)), 2),
+                "max": round(float(arr.max()), 2)
+            }
+
+        total_batches = sum(self._batch_sizes.values())
+        return {
+            "name": self.name,
+            "config": {
+                "window_ms": self.window * 1000,
+                "max_batch_size": self.max_batch_size,
+                "max_queue_size": self.max_queue_size
+            },
+            "submitted": self._submitted,
+            "rejected": self._rejected,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches": total_batches,
+            "mean_batch_size": round(sum(size * n for size, n in self._batch_sizes.items()) / total_batches, 2) if total_batches else None,
+            "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+            "queue_wait_ms": percentiles(self._queue_waits_ms),
+            "processing_ms": percentiles(self._processing_ms)
+        }
+
+
+_image_batcher = None
+
+def get_image_batcher() -> MicroBatcher:
+    """Görsel moderasyonu için süreç başına tek batcher (ContentModerator.analyze_images)."""
+    global _image_batcher
+    if _image_batcher is None:
+        _image_batcher = MicroBatcher(
+            lambda images: registry.get("content_moderator").analyze_images(images),
+            name="image_moderation"
+        )
+    return _image_batcher
+
+
+_text_batcher = None
+
+def get_text_batcher() -> MicroBatcher:
+    """Metin moderasyonu için süreç başına tek batcher (TextModerator.analyze_texts, uzunluk kovalı)."""
+    global _text_batcher
+    if _text_batcher is None:
+        _text_batcher = MicroBatcher(
+            lambda texts: registry.get("text_moderator").analyze_texts(texts),
+            max_batch_size=TEXT_MAX_BATCH_SIZE,
+            name="text_moderation"
+        )
+    return _text_batcher
+
+
+def active_batchers() -> list:
+    """Oluşturulmuş (kullanılmış) batcher'lar."""
+    return [b for b in [_image_batcher, _text_batcher] if b is not None]
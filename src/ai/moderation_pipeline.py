@@ -0,0 +1,271 @@
+#Moderasyon Pipeline - Bağımsız aşamaları eşzamanlı çalıştırır, ilk ret anında kalanları iptal eder
+
+import time
+import asyncio
+from collections import defaultdict, deque
+
+import numpy as np
+from fastapi import HTTPException, status
+
+from .model_registry import registry
+from .moderation_batcher import get_image_batcher, get_text_batcher
+from .executors import run_inference, ExecutorOverloaded
+from .text_cache import text_cache, text_key
+from .profanity_filter import get_profanity_filter, PROFANITY_FILTER
+
+# Aynı anda biten aşamalarda hangi ret mesajının döneceği (eski seri sıralama ile aynı)
+STAGE_PRIORITY = {"image": 0, "ocr": 1, "caption": 2}
+
+
+def image_violation(content_result: dict) -> HTTPException:
+    """Görsel içerik politikası ihlali (451) hatasını oluşturur. Gönderi, profil fotoğrafı ve kart yüklemeleri ortak kullanır."""
+    # Detaylı ve Türkçe hata mesajı oluştur
+    category_tr = content_result.get("category_tr", "Uygunsuz İçerik")
+    confidence = content_result.get("score", 0)
+    detected_label = content_result.get("label", "")
+    
+    error_message = f"🚫 Görsel İçerik Politikası İhlali\n\n"
+    error_message += f"Tespit Edilen Kategori: {category_tr}\n"
+    error_message += f"Güven Oranı: %{confidence:.1f}\n\n"
+    
+    # Kategoriye özel detaylı açıklama
+    category = content_result.get("category", "")
+    if category == "violence":
+        error_message += "⚠️ Bu görsel içerir:\n"
+        error_message += "• Fiziksel şiddet veya kavga sahnesi\n"
+        error_message += "• Kan, yara veya vahşet\n"
+        error_message += "• Ceset veya ağır kaza görüntüsü\n"
+        error_message += "• İşkence veya acı çektiren içerik\n\n"
+        error_message += "Lütfen şiddet içermeyen bir görsel yükleyin."
+        
+    elif category == "nsfw":
+        error_message += "⚠️ Bu görsel içerir:\n"
+        error_message += "• Açık saçık cinsel içerik\n"
+        error_message += "• Çıplaklık veya cinsel organlar\n"
+        error_message += "• Erotik veya müstehcen pozlar\n"
+        error_message += "• Pornografik materyal\n\n"
+        error_message += "Lütfen uygun bir görsel yükleyin."
+        
+    elif category == "weapon":
+        error_message += "⚠️ Bu görsel içerir:\n"
+        error_message += "• Ateşli silah (tabanca, tüfek vb.)\n"
+        error_message += "• Tehditkar şekilde tutulan kesici aletler\n"
+        error_message += "• Yasadışı uyuşturucu madde\n"
+        error_message += "• Terör veya savaş görüntüsü\n\n"
+        error_message += "Lütfen silah veya tehdit içermeyen bir görsel yükleyin."
+        
+    elif category == "hate":
+        error_message += "⚠️ Bu görsel içerir:\n"
+        error_message += "• Hakaret edici el işaretleri\n"
+        error_message += "• Nefret söylemi sembolleri\n"
+        error_message += "• Irkçı veya ayrımcı içerik\n\n"
+        error_message += "Lütfen saygılı bir görsel yükleyin."
+    else:
+        error_message += "Lütfen topluluk kurallarına uygun bir görsel yükleyin."
+    
+    clean_result = {k: v for k, v in content_result.items() if k != 'all_scores'}
+    return HTTPException(
+        status_code=status.HTTP_451_UNAVAILABLE_FOR_LEGAL_REASONS,
+        detail={
+            "message": error_message,
+            "category": category_tr,
+            "confidence": confidence,
+            "detected_label": detected_label,
+            "moderation_details": clean_result
+        }
+    )
+
+
+class ModerationPipeline:
+    """
+    Gönderi moderasyonu aşamaları:
+    - caption: Gönderi metni (en ucuz aşama, hemen başlar)
+    - image:   CLIP görsel analizi (batcher üzerinden)
+    - ocr:     Görseldeki yazı (OCR servisi: tespit, yazı varsa tanıma) + yazının metin moderasyonu
+    caption, image ve ocr paralel çalışır. Herhangi bir aşama reddederse kalan aşamalar iptal edilir.
+
+    Hata davranışı eski seri akışla aynıdır:
+    - image aşamasındaki hata yukarı fırlatılır (görsel işlenemedi).
+    - ocr ve caption hataları loglanır, gönderiyi engellemez.
+    - Havuz/kuyruk dolu (ExecutorOverloaded, QueueFull) hatası her aşamada yukarı fırlatılır; moderasyonu atlanmış gönderi kabul edilmez.
+    """
+
+    def __init__(self):
+        self._timings = defaultdict(lambda: deque(maxlen=1024))
+        self._rejections = defaultdict(int)
+        self._lexicon_rejections = 0
+        self._runs = 0
+
+    async def _moderate_text(self, text, new_texts, text_lookup=None):
+        """
+        Metin moderasyonu: Önce küfür sözlüğü (mikrosaniyeler), sonra önbellek (normalize edilmiş metin), yoksa text batcher.
+        text_lookup: Bellekte olmayan metin için kalıcı önbellek sorgusu (async, sonuç veya None); caption ve OCR metni için aynı.
+        Eşzamanlı isteklerin metinleri (caption + OCR) batcher'da tek forward pass'te sınıflandırılır.
+        Model henüz yüklenmediyse (lazy) önbelleğe bakılmaz; model kimliği bilinmiyor.
+        """
+        if PROFANITY_FILTER:
+            lexicon_result = get_profanity_filter().check(text)
+            if lexicon_result is not None:
+                self._lexicon_rejections += 1
+                return lexicon_result
+
+        model = registry.peek("text_moderator")
+        if model is not None:
+            cached = text_cache.get(text_key(model.model_name, text))
+            if cached is None and text_lookup is not None:
+                cached = await text_lookup(text)
+            if cached is not None:
+                return cached
+
+        text_result = await get_text_batcher().submit(text)
+        model = registry.peek("text_moderator")
+        if model is not None:
+            text_cache.put(text_key(model.model_name, text), model.model_name, text_result)
+            new_texts.append((text, text_result))
+        return text_result
+
+    async def _caption_stage(self, caption, timings, new_texts, text_lookup):
+        start = time.perf_counter()
+        try:
+            text_result = await self._moderate_text(caption, new_texts, text_lookup)
+            return text_result.get("is_toxic", False), text_result
+        finally:
+            timings["caption"] = (time.perf_counter() - start) * 1000
+
+    async def _image_stage(self, image, cached, timings):
+        start = time.perf_counter()
+        try:
+            if cached is not None:
+                content_result = dict(cached["analysis"])
+            else:
+                # Eşzamanlı yüklemeler batcher'da toplanıp tek forward pass'te analiz edilir
+                content_result = await get_image_batcher().submit(image.clip_pixels)
+                # Numpy array'i listeye çevir
+                if 'all_scores' in content_result:
+                    content_result['all_scores'] = content_result['all_scores'].tolist()
+            return not content_result.get("is_shareable", True), content_result
+        finally:
+            timings["image"] = (time.perf_counter() - start) * 1000
+
+    async def _ocr_stage(self, image, cached, timings, new_texts, text_lookup):
+        start = time.perf_counter()
+        try:
+            if cached is not None and cached.get("ocr_text") is not None:
+                # Önbellekte OCR metni ve moderasyon sonucu var
+                extracted_text, text_result = cached["ocr_text"], cached["ocr_moderation"]
+            else:
+                # Önce sadece yazı tespiti; yazı yoksa tanıma hiç çalışmaz
+                ocr_result = await run_inference(registry.get("ocr_service").read, image.ocr_array)
+                timings["ocr_read"] = (time.perf_counter() - start) * 1000
+                timings["ocr_detect"] = ocr_result["timings"]["detect_ms"]
+                if ocr_result["regions"]:
+                    timings["ocr_recognize"] = ocr_result["timings"]["recognize_ms"]
+                extracted_text = ocr_result["text"]
+                text_result = None
+
+                if extracted_text:
+                    text_start = time.perf_counter()
+                    text_result = await self._moderate_text(extracted_text, new_texts, text_lookup)
+                    timings["ocr_text"] = (time.perf_counter() - text_start) * 1000
+
+            is_rejected = bool(text_result) and text_result.get("is_toxic", False)
+            return is_rejected, {"text": extracted_text, "moderation": text_result}
+        finally:
+            timings["ocr"] = (time.perf_counter() - start) * 1000
+
+    async def run(self, image=None, caption: str = None, cached: dict = None, text_lookup=None) -> dict:
+        """
+        Dönüş:
+        {
+            "rejected": bool,
+            "stage": Reddeden aşama ("image" | "ocr" | "caption") veya None,
+            "results": {aşama: sonuç},   # Sadece tamamlanan aşamalar
+            "errors": {aşama: hata},     # Loglanıp yutulan hatalar
+            "cancelled": [aşama],
+            "timings": {aşama: ms, "total": ms},
+            "new_texts": [(metin, sonuç)]  # Bu çalıştırmada modelden geçen metinler (kalıcı önbelleğe yazılır)
+        }
+        image: ingest_image() sonucu (IngestedImage); CLIP ve OCR hazır tamponları kullanır.
+        cached: Görsel analiz önbelleği kaydı (varsa image/ocr aşamaları modeli çalıştırmaz).
+        text_lookup: Kalıcı metin önbelleği sorgusu (async metin -> sonuç | None); caption ve OCR metni modelden önce sorulur.
+        """
+        run_start = time.perf_counter()
+        timings = {}
+        new_texts = []
+
+        # Modeller havuz dışında yüklenir (ilk istek havuz slotu tutarak model yüklemesin)
+        await registry.ensure_loaded(*(["text_moderator"] if caption else []),
+                                     *(["content_moderator", "ocr_service"] if image is not None else []))
+
+        # Caption en ucuz aşama, önce başlatılır
+        tasks = {}
+        if caption:
+            tasks["caption"] = asyncio.create_task(self._caption_stage(caption, timings, new_texts, text_lookup))
+        if image is not None:
+            tasks["image"] = asyncio.create_task(self._image_stage(image, cached, timings))
+            tasks["ocr"] = asyncio.create_task(self._ocr_stage(image, cached, timings, new_texts, text_lookup))
+
+        stage_of = {task: name for name, task in tasks.items()}
+        outcome = {"rejected": False, "stage": None, "results": {}, "errors": {}, "cancelled": [], "timings": timings,
+                   "new_texts": new_texts}
+        pending = set(tasks.values())
+
+        try:
+            while pending and not outcome["rejected"]:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in sorted(done, key=lambda t: STAGE_PRIORITY[stage_of[t]]):
+                    stage = stage_of[task]
+                    try:
+                        is_rejected, result = task.result()
+                    except Exception as e:
+                        if stage == "image" or isinstance(e, (ExecutorOverloaded, asyncio.QueueFull)):
+                            raise
+                        outcome["errors"][stage] = str(e)
+                        print(f"{'OCR' if stage == 'ocr' else 'Metin'} moderasyon uyarısı: {str(e)}")
+                        continue
+
+                    outcome["results"][stage] = result
+                    if is_rejected and not outcome["rejected"]:
+                        outcome["rejected"] = True
+                        outcome["stage"] = stage
+        finally:
+            # Ret (veya image hatası) sonrası kalan işler iptal edilir
+            for task in pending:
+                task.cancel()
+                outcome["cancelled"].append(stage_of[task])
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            # Aynı anda biten ama işlenmeden kalan aşamaların hataları okunur ("never retrieved" uyarısı olmasın)
+            for task in tasks.values():
+                if task.done() and not task.cancelled():
+                    task.exception()
+
+        timings["total"] = (time.perf_counter() - run_start) * 1000
+        self._record(outcome)
+        return outcome
+
+    def _record(self, outcome):
+        self._runs += 1
+        for stage, ms in outcome["timings"].items():
+            self._timings[stage].append(ms)
+        if outcome["rejected"]:
+            self._rejections[outcome["stage"]] += 1
+
+    def stats(self) -> dict:
+        """Aşama başına süre dağılımı (ms) ve ret sayıları."""
+        return {
+            "runs": self._runs,
+            "rejections": dict(self._rejections),
+            "lexicon_rejections": self._lexicon_rejections,
+            "timings_ms": {
+                stage: {
+                    "p50": round(float(np.percentile(values, 50)), 2),
+                    "p95": round(float(np.percentile(values, 95)), 2)
+                }
+                for stage, values in self._timings.items() if values
+            }
+        }
+
+
+moderation_pipeline = ModerationPipeline()
@@ -0,0 +1,252 @@
+#Moderasyon Politikaları - Tek CLIP forward pass, birden fazla yüzey (gönderi, profil fotoğrafı, kart) için karar
+
+import os
+import json
+
+import numpy as np
+
+# Politika dosyası (.env üzerinden değiştirilebilir). Verilirse DEFAULT_POLICIES yerine kullanılır.
+MODERATION_POLICY_FILE = os.getenv("MODERATION_POLICY_FILE", "")
+DEFAULT_POLICY = "post"
+
+# ---------------------------------------------------------
+# ETİKETLER
+# Tüm politikaların ortak etiket havuzu. Görsel embedding'i bu listenin tamamıyla bir kez çarpılır,
+# her politika kendi etiket alt kümesi üzerinde softmax alır.
+# ---------------------------------------------------------
+LABELS = [
+    # ---------------------------------------------------------
+    # [GRUP A] ŞİDDET, KAN VE VAHŞET (Indices: 0-4)
+    # ---------------------------------------------------------
+    "physical violence, street fighting, or people punching each other", # 0: Kavga
+    "real human blood, bleeding wound, or gore scene",                  # 1: Gerçek kan/yara
+    "a dead body, corpse, or murder scene",                             # 2: Ceset
+    "severe car accident with injuries",                                # 3: Ağır kaza
+    "torture, suffering, or disturbing content",                        # 4: İşkence
+
+    # ---------------------------------------------------------
+    # [GRUP B] CİNSELLİK VE ÇIPLAKLIK (Indices: 5-9)
+    # ---------------------------------------------------------
+    "explicit nudity, pornography, or sexual intercourse",              # 5: Porno
+    "exposed genitals, penis, or vagina",                               # 6: Cinsel organ
+    "a person in sexy lingerie or lace underwear",                      # 7: İç çamaşırı (Dantelli vs.)
+    "erotic pose or sexually suggestive content",                       # 8: Erotik
+    "cartoon hentai or animated pornography",                           # 9: Hentai
+
+    # ---------------------------------------------------------
+    # [GRUP C] SİLAH VE TEHDİT (Indices: 10-13)
+    # ---------------------------------------------------------
+    "a person holding a real firearm, pistol, or rifle",                # 10: Ateşli Silah (Elde)
+    "a person holding a knife or dagger in a threatening way",          # 11: Bıçak (Tehditkar)
+    "illegal drugs, cocaine lines, or heroin syringe",                  # 12: Uyuşturucu
+    "a terrorist, militia, or war zone",                                # 13: Terör
+
+    # ---------------------------------------------------------
+    # [GRUP D] NEFRET VE HAKARET (Indices: 14-15)
+    # ---------------------------------------------------------
+    "a middle finger gesture",                                          # 14: Orta parmak
+    "hate symbol, swastika, or racism",                                 # 15: Nefret sembolü
+
+    # =========================================================
+    # [GRUP E] GÜVENLİ BÖLGE & TUZAKLAR (DECOYS) (Indices: 16-35)
+    # Burası modelin yanlış alarm vermesini önleyen "Benzeyen ama Güvenli" şeylerdir.
+    # =========================================================
+
+    # --- RENK YANILGISINI ÖNLEYENLER (Kan sanılmasın diye) ---
+    "a red sports car or red vehicle",                                  # 16: Kırmızı Araba
+    "red roses, flowers, or tulips",                                    # 17: Kırmızı Çiçek
+    "red paint, art supplies, or spilled ketchup",                      # 18: Boya/Salça
+    "a person wearing a red dress or red t-shirt",                      # 19: Kırmızı Kıyafet
+    "raw meat or steak for cooking",                                    # 20: Çiğ et (Yemek)
+
+    # --- OBJE YANILGISINI ÖNLEYENLER (Silah sanılmasın diye) ---
+    "a person holding a black smartphone or taking a selfie",           # 21: Telefon
+    "a person holding a wallet or credit card",                         # 22: Cüzdan
+    "a person holding a remote control or game controller",             # 23: Kumanda
+    "kitchen knife on a cutting board with vegetables",                 # 24: Mutfak bıçağı (Yemek yaparken)
+    "a toy water gun or plastic toy",                                   # 25: Oyuncak silah
+    "medical vaccine injection or doctor visit",                        # 26: Aşı (Uyuşturucu sanılmasın)
+
+    # --- TEN RENGİ/TEMAS YANILGISINI ÖNLEYENLER (NSFW/Şiddet sanılmasın diye) ---
+    "people hugging, wrestling sport, or dancing",                      # 27: Temas (Şiddet değil)
+    "a person wearing swimwear, bikini, or gym shorts at beach",        # 28: Mayo (Porno değil)
+    "a shirtless man doing sports or swimming",                         # 29: Üstsüz sporcu
+    "a breastfeeding mother or baby care",                              # 30: Emzirme/Bebek
+    "marble statue or artistic painting",                               # 31: Sanat heykeli
+
+    # --- GENEL GÜVENLİ ---
+    "a standard portrait or group selfie",                              # 32: Normal İnsan
+    "landscape, nature, or city street",                                # 33: Manzara
+    "a photo of documents, text, or screenshots",                       # 34: Belge
+    "food, drinks, or restaurant scene",                                # 35: Yemek
+
+    # =========================================================
+    # [GRUP F] KART YÜZEYİ (Indices: 36+) - Sadece kart politikası kullanır
+    # =========================================================
+    "an employee ID card, badge, or identity card with a photo",        # 36: Kimlik kartı
+    "a business card or printed name tag",                              # 37: Kartvizit
+]
+
+# Türkçe kategori isimleri
+CATEGORY_NAMES_TR = {
+    "violence": "Şiddet/Kan",
+    "nsfw": "Cinsel İçerik",
+    "weapon": "Silah/Suç",
+    "hate": "Nefret/Hakaret",
+    "safe": "Güvenli"
+}
+
+# ---------------------------------------------------------
+# POLİTİKALAR
+# labels:     Politikanın kullandığı etiket indeksleri (softmax sadece bunlar üzerinde alınır)
+# categories: Yasaklı kategori -> {"labels": indeksler, "threshold": olasılık eşiği}
+#             En yüksek skorlu etiket yasaklıysa veya bir yasaklı etiket eşiği geçerse görsel reddedilir.
+# ---------------------------------------------------------
+DEFAULT_POLICIES = {
+    # Gönderiler: Eski ContentModerator davranışının birebir aynısı
+    "post": {
+        "labels": list(range(0, 36)),
+        "categories": {
+            "violence": {"labels": [0, 1, 2, 3, 4], "threshold": 0.50},
+            "nsfw":     {"labels": [5, 6, 7, 8, 9], "threshold": 0.50},
+            "weapon":   {"labels": [10, 11, 12, 13], "threshold": 0.50},
+            "hate":     {"labels": [14, 15], "threshold": 0.50}
+        }
+    },
+    # Profil fotoğrafları: Herkese açık ve küçük gösterildiği için daha sıkı
+    "profile": {
+        "labels": list(range(0, 36)),
+        "categories": {
+            "violence": {"labels": [0, 1, 2, 3, 4], "threshold": 0.35},
+            "nsfw":     {"labels": [5, 6, 7, 8, 9, 28], "threshold": 0.30},
+            "weapon":   {"labels": [10, 11, 12, 13], "threshold": 0.35},
+            "hate":     {"labels": [14, 15], "threshold": 0.30}
+        }
+    },
+    # Kart görselleri: Belge beklenir; kart/belge etiketleri güçlü tuzak olarak eklenir
+    "card": {
+        "labels": list(range(0, 16)) + [21, 22, 32, 34, 36, 37],
+        "categories": {
+            "violence": {"labels": [0, 1, 2, 3, 4], "threshold": 0.50},
+            "nsfw":     {"labels": [5, 6, 7, 8, 9], "threshold": 0.40},
+            "weapon":   {"labels": [10, 11, 12, 13], "threshold": 0.50},
+            "hate":     {"labels": [14, 15], "threshold": 0.40}
+        }
+    }
+}
+
+
+def load_policies() -> dict:
+    """MODERATION_POLICY_FILE verilmişse JSON politikaları, yoksa DEFAULT_POLICIES."""
+    if not MODERATION_POLICY_FILE:
+        return DEFAULT_POLICIES
+    with open(MODERATION_POLICY_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class PolicyEngine:
+    """
+    Bildirimsel politikaları bir kez indeks/eşik dizilerine derler, sonra her görseli
+    tüm politikalara karşı tek seferde (döngüsüz, vektörel NumPy) puanlar.
+
+    Derlenmiş diziler (P = politika sayısı, L = etiket sayısı):
+    - mask:       (P, L) bool   -> Etiket politikada var mı
+    - category:   (P, L) int    -> Etiketin yasaklı kategori numarası, güvenliyse -1
+    - thresholds: (P, L) float  -> Yasaklı etiket eşiği, güvenliyse inf
+    """
+
+    def __init__(self, labels: list = None, policies: dict = None):
+        self.labels = list(labels or LABELS)
+        self.policies = policies or load_policies()
+        self.names = list(self.policies)
+        self._compile()
+
+    def _compile(self):
+        label_count = len(self.labels)
+        self.categories = []  # Kategori numarası -> isim (tüm politikalarda ortak)
+        self.mask = np.zeros((len(self.names), label_count), dtype=bool)
+        self.category = np.full((len(self.names), label_count), -1, dtype=np.int64)
+        self.thresholds = np.full((len(self.names), label_count), np.inf, dtype=np.float32)
+
+        for p, name in enumerate(self.names):
+            policy = self.policies[name]
+            indices = np.asarray(policy.get("labels", range(label_count)), dtype=np.int64)
+            if indices.size == 0 or indices.min() < 0 or indices.max() >= label_count:
+                raise ValueError(f"'{name}' politikasında geçersiz etiket indeksi")
+            self.mask[p, indices] = True
+
+            for category_name, rule in policy.get("categories", {}).items():
+                if category_name not in self.categories:
+                    self.categories.append(category_name)
+                category_indices = np.asarray(rule["labels"], dtype=np.int64)
+                if not self.mask[p, category_indices].all():
+                    raise ValueError(f"'{name}' politikasında '{category_name}' etiketleri politikanın etiketlerinde yok")
+                self.category[p, category_indices] = self.categories.index(category_name)
+                self.thresholds[p, category_indices] = rule.get("threshold", 0.5)
+
+        self.forbidden = self.category >= 0
+        # Politikada olmayan etiketler softmax'ta -inf ile maskelenir
+        self._logit_mask = np.where(self.mask, 0.0, -np.inf).astype(np.float32)
+        self._category_names = np.asarray(self.categories + ["safe"], dtype=object)
+
+    def fingerprint(self) -> dict:
+        """Önbellek sürümü için politika özeti (etiketler + politika tanımları)."""
+        return {"labels": self.labels, "policies": self.policies}
+
+    def score(self, logits) -> dict:
+        """
+        logits: (B, L) görsel-etiket logit matrisi (logit_scale uygulanmış).
+        Dönüş: Her politika için (B,) boyutlu diziler:
+        {"probs": (B, P, L), "shareable": (B, P), "reason": (B, P), "score": (B, P), "category": (B, P)}
+        """
+        logits = np.asarray(logits, dtype=np.float32)
+
+        # Politika başına maskeli softmax: (B, 1, L) + (1, P, L) -> (B, P, L)
+        masked = logits[:, None, :] + self._logit_mask[None, :, :]
+        masked -= masked.max(axis=2, keepdims=True)
+        probs = np.exp(masked)
+        probs /= probs.sum(axis=2, keepdims=True)
+
+        # 1. Kural: En yüksek skorlu etiket yasaklı mı?
+        top = probs.argmax(axis=2)                                          # (B, P)
+        policy_index = np.arange(len(self.names))[None, :]
+        top_forbidden = self.forbidden[policy_index, top]                   # (B, P)
+
+        # 2. Kural: Herhangi bir yasaklı etiket eşiği geçti mi? (İlk geçen etiket sebep olur)
+        over = probs > self.thresholds[None, :, :]                         # (B, P, L)
+        any_over = over.any(axis=2)
+        first_over = over.argmax(axis=2)
+
+        reason = np.where(any_over, first_over, top)
+        reason_category = self.category[policy_index, reason]
+        return {
+            "probs": probs,
+            "shareable": ~(top_forbidden | any_over),
+            "reason": reason,
+            "score": np.take_along_axis(probs, reason[:, :, None], axis=2)[:, :, 0] * 100,
+            "category": np.where(top_forbidden | any_over, reason_category, -1)
+        }
+
+    def verdicts(self, logits) -> list:
+        """
+        Her görsel için politika adı -> karar sözlüğü listesi.
+        Karar formatı eski ContentModerator sonucuyla aynıdır (label, category, category_tr, score, is_shareable, all_scores).
+        all_scores sadece politikanın etiketleri üzerindeki olasılıklardır (diğerleri 0).
+        """
+        scored = self.score(logits)
+        categories = self._category_names[scored["category"]]  # -1 -> "safe"
+        results = []
+        for b in range(scored["probs"].shape[0]):
+            image_verdicts = {}
+            for p, name in enumerate(self.names):
+                category = categories[b, p]
+                image_verdicts[name] = {
+                    "label": self.labels[scored["reason"][b, p]],
+                    "category": category,
+                    "category_tr": CATEGORY_NAMES_TR.get(category, category),
+                    "score": round(float(scored["score"][b, p]), 2),
+                    "is_shareable": bool(scored["shareable"][b, p]),
+                    "all_scores": scored["probs"][b, p]
+                }
+            results.append(image_verdicts)
+        return results
@@ -0,0 +1,147 @@
+#OCR Servisi - Paylaşılan EasyOCR okuyucu havuzu, iki aşamalı OCR: Önce sadece yazı tespiti, yazı varsa tanıma
+
+import os
+import copy
+import math
+import time
+import queue
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+OCR_POOL_SIZE = int(os.getenv("OCR_POOL_SIZE", "2"))                       # Aynı anda çalışabilecek OCR işi
+OCR_DETECT_MAX_SIDE = int(os.getenv("OCR_DETECT_MAX_SIDE", "800"))         # Tespit (CRAFT) girdisinin en uzun kenarı
+OCR_RECOGNIZE_BATCH_SIZE = int(os.getenv("OCR_RECOGNIZE_BATCH_SIZE", "16"))  # Tanıma modeline tek seferde verilen kırpıntı
+
+
+class OCRService:
+    """
+    EasyOCR ile iki aşamalı OCR.
+    1) Tespit: Görsel küçültülmüş olarak (OCR_DETECT_MAX_SIDE) sadece yazı bölgesi tespitinden geçer.
+       Bölge yoksa hemen döner, tanıma modeli hiç çalışmaz (sosyal medya fotoğraflarının çoğu).
+    2) Tanıma: Sadece tespit edilen bölgeler tam çözünürlüklü griden kırpılır ve batch'ler halinde tanınır.
+
+    Havuz: Okuyucular tek bir EasyOCR Reader'ın yüzeysel kopyalarıdır; ağırlıklar (detector/recognizer) paylaşılır,
+    her iş havuzdan bir okuyucu ödünç alır. Havuz boyutu aynı anda çalışan OCR işi sayısını sınırlar.
+    """
+
+    def __init__(self, reader, pool_size: int = OCR_POOL_SIZE, detect_max_side: int = OCR_DETECT_MAX_SIDE,
+                 batch_size: int = OCR_RECOGNIZE_BATCH_SIZE):
+        self.detect_max_side = detect_max_side
+        self.batch_size = batch_size
+        self.pool_size = max(1, pool_size)
+        self._pool = queue.Queue()
+        for i in range(self.pool_size):
+            self._pool.put(reader if i == 0 else copy.copy(reader))
+
+        # Metrikler
+        self._lock = threading.Lock()
+        self._images = 0
+        self._with_text = 0
+        self._regions = 0
+        self._detect_ms = deque(maxlen=1024)
+        self._recognize_ms = deque(maxlen=1024)
+
+    @contextmanager
+    def _reader(self):
+        reader = self._pool.get()
+        try:
+            yield reader
+        finally:
+            self._pool.put(reader)
+
+    def detect(self, reader, gray: np.ndarray):
+        """
+        Sadece yazı bölgesi tespiti. Görsel en uzun kenarı detect_max_side olacak şekilde küçültülür
+        (EasyOCR canvas_size), kutular tam çözünürlüklü koordinatlara geri ölçeklenmiş döner.
+        Dönüş: (yatay kutular [x_min, x_max, y_min, y_max], serbest kutular [4 köşe])
+        """
+        horizontal_list, free_list = reader.detect(gray, canvas_size=min(self.detect_max_side, max(gray.shape)))
+        return horizontal_list[0], free_list[0]
+
+    def recognize(self, reader, gray: np.ndarray, horizontal_list: list, free_list: list) -> list:
+        """
+        Tespit edilen bölgeleri batch'ler halinde tanır. Dönüş: Yukarıdan aşağıya sıralı [(kutu, metin, güven)].
+        EasyOCR CPU'da kutuları tek tek tanır; burada aynı genişlik sınıfındaki (ceil(en/boy)) kırpıntılar
+        birlikte çalıştırılır. Aynı sınıftaki kırpıntılar aynı genişliğe pad'lendiği için sonuç tek tek tanıma ile aynıdır.
+        """
+        from easyocr import easyocr as easyocr_module
+        from easyocr.utils import get_image_list
+        from easyocr.recognition import get_text
+
+        model_height = getattr(easyocr_module, "imgH", 64)
+        image_list, _ = get_image_list(horizontal_list, free_list, gray, model_height=model_height)
+        ignore_char = "".join(set(reader.character) - set(reader.lang_char))
+
+        groups = {}
+        for index, (box, crop) in enumerate(image_list):
+            ratio = max(1, math.ceil(crop.shape[1] / crop.shape[0]))
+            groups.setdefault(ratio, []).append(index)
+
+        results = [None] * len(image_list)
+        for ratio, indices in groups.items():
+            for begin in range(0, len(indices), self.batch_size):
+                chunk = indices[begin:begin + self.batch_size]
+                predictions = get_text(reader.character, model_height, ratio * model_height, reader.recognizer,
+                                       reader.converter, [image_list[i] for i in chunk], ignore_char,
+                                       batch_size=len(chunk), workers=0, device=reader.device)
+                for i, prediction in zip(chunk, predictions):
+                    results[i] = prediction
+        return results
+
+    def read(self, gray: np.ndarray) -> dict:
+        """
+        Gri görseldeki yazıyı okur.
+        Dönüş: {"text": birleştirilmiş metin, "lines": [metin], "regions": tespit edilen bölge sayısı,
+                "timings": {"detect_ms", "recognize_ms"}}
+        """
+        with self._reader() as reader:
+            start = time.perf_counter()
+            horizontal_list, free_list = self.detect(reader, gray)
+            detect_ms = (time.perf_counter() - start) * 1000
+
+            regions = len(horizontal_list) + len(free_list)
+            recognize_ms = 0.0
+            lines = []
+            if regions:
+                start = time.perf_counter()
+                lines = [text for _, text, _ in self.recognize(reader, gray, horizontal_list, free_list) if text]
+                recognize_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self._images += 1
+            self._with_text += bool(regions)
+            self._regions += regions
+            self._detect_ms.append(detect_ms)
+            if regions:
+                self._recognize_ms.append(recognize_ms)
+
+        return {
+            "text": " ".join(lines),
+            "lines": lines,
+            "regions": regions,
+            "timings": {"detect_ms": round(detect_ms, 2), "recognize_ms": round(recognize_ms, 2)}
+        }
+
+    def stats(self) -> dict:
+        def percentiles(values):
+            if not values:
+                return None
+            return {"p50": round(float(np.percentile(values, 50)), 2), "p95": round(float(np.percentile(values, 95)), 2)}
+
+        with self._lock:
+            detect_ms, recognize_ms = list(self._detect_ms), list(self._recognize_ms)
+        return {
+            "pool_size": self.pool_size,
+            "available_readers": self._pool.qsize(),
+            "detect_max_side": self.detect_max_side,
+            "images": self._images,
+            "with_text": self._with_text,
+            "recognition_skipped": self._images - self._with_text,
+            "regions": self._regions,
+            "detect_ms": percentiles(detect_ms),
+            "recognize_ms": percentiles(recognize_ms)
+        }
@@ -0,0 +1,104 @@
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from content_moderator import ContentModerator
+from clip_backends import OnnxVisionBackend, CLIP_ONNX_PATH, ONNX_INTRA_OP_THREADS
+
+
+def load_images(pattern, synthetic):
+    """Sabit görsel seti: glob ile bulunan görseller + sabit tohumlu sentetik görseller."""
+    images = [Image.open(p).convert("RGB") for p in sorted(glob.glob(pattern))]
+    rng = np.random.default_rng(1234)
+    for _ in range(synthetic):
+        images.append(Image.fromarray(rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)))
+    return images
+
+
+def run_backend(moderator, backend, images):
+    moderator.vision_backend = backend
+    return moderator.analyze_images(images)
+
+
+def measure(moderator, backend, images, batch_size, runs):
+    moderator.vision_backend = backend
+    moderator.analyze_images(images[:batch_size])  # Isınma
+
+    single = []
+    for _ in range(runs):
+        for image in images:
+            start = time.perf_counter()
+            moderator.analyze_image(image)
+            single.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    processed = 0
+    for _ in range(runs):
+        for i in range(0, len(images), batch_size):
+            batch = images[i:i + batch_size]
+            moderator.analyze_images(batch)
+            processed += len(batch)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "p50_ms": float(np.percentile(single, 50)),
+        "p95_ms": float(np.percentile(single, 95)),
+        "throughput_img_s": processed / elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Torch vs ONNX Runtime CLIP backend uyum ve hız karşılaştırması")
+    parser.add_argument("--onnx", default=CLIP_ONNX_PATH, help="Karşılaştırılacak ONNX modeli")
+    parser.add_argument("--images", default=os.path.join(os.path.dirname(__file__), "..", "face", "*.jpg"), help="Görsel glob deseni")
+    parser.add_argument("--synthetic", type=int, default=16, help="Eklenecek sentetik görsel sayısı")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=ONNX_INTRA_OP_THREADS, help="ONNX intra-op thread sayısı")
+    args = parser.parse_args()
+
+    moderator = ContentModerator()
+    torch_backend = moderator.vision_backend
+    onnx_backend = OnnxVisionBackend(args.onnx, args.threads)
+    images = load_images(args.images, args.synthetic)
+
+    # 1. Uyum testi: Aynı görsel setinde kategori kararları
+    torch_results = run_backend(moderator, torch_backend, images)
+    onnx_results = run_backend(moderator, onnx_backend, images)
+
+    category_agree = sum(t["category"] == o["category"] for t, o in zip(torch_results, onnx_results))
+    decision_agree = sum(t["is_shareable"] == o["is_shareable"] for t, o in zip(torch_results, onnx_results))
+    label_agree = sum(t["label"] == o["label"] for t, o in zip(torch_results, onnx_results))
+    max_prob_diff = max(float(np.abs(t["all_scores"] - o["all_scores"]).max()) for t, o in zip(torch_results, onnx_results))
+
+    # 2. Gecikme / verim karşılaştırması
+    torch_perf = measure(moderator, torch_backend, images, args.batch_size, args.runs)
+    onnx_perf = measure(moderator, onnx_backend, images, args.batch_size, args.runs)
+
+    n = len(images)
+    print("\n" + "=" * 60)
+    print(f"UYUM RAPORU ({n} görsel) - {args.onnx}")
+    print("=" * 60)
+    print(f"Kategori uyumu      : {category_agree}/{n} (%{category_agree / n * 100:.1f})")
+    print(f"Paylaşım kararı     : {decision_agree}/{n} (%{decision_agree / n * 100:.1f})")
+    print(f"En yüksek etiket    : {label_agree}/{n} (%{label_agree / n * 100:.1f})")
+    print(f"Maks. olasılık farkı: {max_prob_diff:.4f}")
+    for i, (t, o) in enumerate(zip(torch_results, onnx_results)):
+        if t["category"] != o["category"]:
+            print(f"  ! #{i}: torch={t['category']} ({t['score']}) onnx={o['category']} ({o['score']})")
+
+    print("\n" + "=" * 60)
+    print(f"HIZ (batch={args.batch_size})")
+    print("=" * 60)
+    for name, perf in [("torch", torch_perf), ("onnx", onnx_perf)]:
+        print(f"{name:6s} p50: {perf['p50_ms']:8.2f} ms | p95: {perf['p95_ms']:8.2f} ms | {perf['throughput_img_s']:7.1f} görsel/sn")
+    print(f"Hızlanma (p50): x{torch_perf['p50_ms'] / onnx_perf['p50_ms']:.2f}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
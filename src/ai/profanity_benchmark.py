@@ -0,0 +1,94 @@
+import argparse
+import time
+
+import numpy as np
+
+from profanity_filter import ProfanityFilter, load_wordlist
+from benchmark import TEXTS
+from profanity_test import MUST_PASS
+
+# Sözlükteki kelimelere benzeyen ama küfür olmayan metinler (yanlış alarm kontrolü, profanity_test.py ile aynı liste)
+NEAR_MISSES = MUST_PASS
+
+SENTENCES = [
+    "bu ne ya {}",
+    "{} herkes görsün",
+    "yine mi sen {}",
+    "Toplantı iptal olmuş {}!!",
+]
+
+
+def obfuscate(word: str, rng) -> str:
+    """Küfrü gerçek trafikteki gibi gizler: Leetspeak, araya nokta, harf tekrarı, büyük harf."""
+    leet = {"o": "0", "i": "1", "e": "3", "a": "4", "s": "5"}
+    style = int(rng.integers(0, 5))
+    if style == 0:
+        return "".join(leet.get(c, c) for c in word)
+    if style == 1:
+        return ".".join(word)
+    if style == 2:
+        position = int(rng.integers(0, len(word)))
+        return word[:position] + word[position] * 4 + word[position + 1:]
+    if style == 3:
+        return word.upper()
+    return word
+
+
+def make_traffic(words: list, count: int, toxic_share: float, seed: int = 42):
+    """(metin, beklenen_küfür) listesi: Temiz + benzer-ama-temiz + gizlenmiş küfürlü metinler karışık."""
+    rng = np.random.default_rng(seed)
+    traffic = []
+    clean_pool = TEXTS + NEAR_MISSES
+    for _ in range(count):
+        if rng.random() < toxic_share:
+            word = words[int(rng.integers(0, len(words)))]
+            sentence = SENTENCES[int(rng.integers(0, len(SENTENCES)))]
+            traffic.append((sentence.format(obfuscate(word, rng)), True))
+        else:
+            traffic.append((clean_pool[int(rng.integers(0, len(clean_pool)))], False))
+    return traffic
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Küfür ön filtresi: Karışık trafikte modele gitmeyen metin oranı ve tarama süresi")
+    parser.add_argument("--count", type=int, default=10000, help="Metin sayısı")
+    parser.add_argument("--toxic-share", type=float, default=0.2, help="Açık küfür içeren metin oranı")
+    parser.add_argument("--model-ms", type=float, default=25.0, help="Tek metin için transformer süresi (ms), tasarruf tahmini için")
+    args = parser.parse_args()
+
+    entries = load_wordlist()
+    start = time.perf_counter()
+    lexicon = ProfanityFilter(entries)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    # Sözlükteki ifadeler (kök ve '!' işaretleri olmadan) küfür örneği olarak kullanılır
+    words = [entry.lstrip("!").rstrip("*") for entry in entries]
+    traffic = make_traffic(words, args.count, args.toxic_share)
+
+    scan_us, caught, false_positives, missed = [], 0, 0, 0
+    for text, is_toxic in traffic:
+        start = time.perf_counter()
+        result = lexicon.check(text)
+        scan_us.append((time.perf_counter() - start) * 1e6)
+        if result is not None:
+            caught += 1
+            false_positives += not is_toxic
+        elif is_toxic:
+            missed += 1
+
+    toxic_total = sum(is_toxic for _, is_toxic in traffic)
+    avoided = caught / len(traffic)
+    print("\n" + "=" * 55)
+    print(f"KÜFÜR ÖN FİLTRESİ ({len(entries)} ifade, otomat kurulumu {build_ms:.2f} ms)")
+    print("=" * 55)
+    print(f"Trafik               : {len(traffic)} metin (%{args.toxic_share * 100:.0f} küfürlü)")
+    print(f"Tarama süresi        : p50 {np.percentile(scan_us, 50):.1f} µs | p99 {np.percentile(scan_us, 99):.1f} µs")
+    print(f"Modele gitmeyen      : {caught} metin (%{avoided * 100:.1f} model çağrısı önlendi)")
+    print(f"Yakalanan küfür      : {caught - false_positives}/{toxic_total} (kaçan {missed}, modele gider)")
+    print(f"Yanlış alarm         : {false_positives}")
+    print(f"Tahmini tasarruf     : {caught * args.model_ms / 1000:.1f} sn model süresi ({args.model_ms:.0f} ms/metin)")
+    print("=" * 55)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#Küfür Ön Filtresi - Aho-Corasick sözlük taraması, açık küfürler transformer'a gitmeden reddedilir
+
+import os
+import time
+import threading
+import unicodedata
+
+import numpy as np
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+PROFANITY_WORDLIST = os.getenv("PROFANITY_WORDLIST", os.path.join(os.path.dirname(__file__), "profanity_tr.txt"))
+PROFANITY_FILTER = os.getenv("PROFANITY_FILTER", "1") == "1"   # 0 = ön filtre kapalı, tüm metinler modele gider
+
+# Türkçe karakterler ASCII'ye katlanır (Türkçe klavyesi olmayan yazımlar da eşleşsin); I/İ/ı hepsi i olur
+_FOLD = str.maketrans({
+    "I": "i", "İ": "i",
+    "ı": "i", "ş": "s", "ç": "c", "ğ": "g", "ö": "o", "ü": "u", "â": "a", "î": "i", "û": "u",
+    "Ş": "s", "Ç": "c", "Ğ": "g", "Ö": "o", "Ü": "u", "Â": "a", "Î": "i", "Û": "u"
+})
+# '!' ile işaretli ifadelerde ASCII karşılığıyla eşleşmeyen harfler ("!piç" -> "pic" İngilizce kelimeyle çakışır)
+_STRICT_LETTERS = "çşğöüÇŞĞÖÜ"
+# Leetspeak
+_LEET = {"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b", "9": "g", "@": "a", "$": "s", "€": "e"}
+
+
+def _normalize(text: str):
+    """
+    normalize_stream'in ayrıntılı hali. Dönüş: (normalize metin, konumlar, tekrar sayıları, kesintiler)
+    - tekrar sayıları: Her normalize harfin orijinalde kaç kez art arda yazıldığı ("siiiktir" -> i: 3)
+    - kesintiler: Harften önce noktalama / sembol atlandı mı ("bu.siktir" -> s: True)
+    """
+    chars, positions, runs, breaks = [], [], [], []
+    skipped = False
+    for index, char in enumerate(unicodedata.normalize("NFC", text)):
+        char = char.translate(_FOLD).lower()
+        char = _LEET.get(char, char)
+        if char.isalpha():
+            if chars and chars[-1] == char:
+                runs[-1] += 1
+                skipped = False
+                continue
+        elif char.isspace():
+            if not chars or chars[-1] == " ":
+                continue
+            char = " "
+        else:
+            skipped = True
+            continue  # Noktalama / sembol: Atla (kelimeyi bölmesin, ama kelime sınırı da olabilir)
+        chars.append(char)
+        positions.append(index)
+        runs.append(1)
+        breaks.append(skipped)
+        skipped = False
+    return "".join(chars), positions, runs, breaks
+
+
+def normalize_stream(text: str):
+    """
+    Metni eşleştirme için normalize eder ve her karakterin orijinal metindeki konumunu döner.
+    - Küçük harf + Türkçe karakterler ASCII, leetspeak harfe çevrilir
+    - Kelime içine konan noktalama atlanır ("s.i.k.t.i.r" -> "siktir")
+    - Tekrar eden harfler teke iner ("siiiktir" -> "siktir")
+    - Boşluklar tek bir ' ' olur (kelime sınırı)
+    Dönüş: (normalize metin, konumlar listesi)
+    """
+    stream, positions, _, _ = _normalize(text)
+    return stream, positions
+
+
+class ProfanityFilter:
+    """
+    Aho-Corasick otomatı: Tüm sözlük tek geçişte, metin uzunluğunda doğrusal sürede taranır.
+    Otomat bir kez kurulur; sözlük değişirse yeni bir nesne kurulup atomik olarak değiştirilir (reload_profanity_filter).
+
+    Katlama ve harf birleştirme yanlış alarm üretmesin diye otomat eşleşmesi orijinal metinle doğrulanır:
+    - İfadede çift yazılan harf metinde de en az iki kez yazılmalı ("dallama" -> "dalamak" eşleşmez)
+    - İfadedeki noktalı i metinde noktasız ı olamaz ("sikiş" -> "sıkışık" eşleşmez). Büyük 'I' metinde 'İ' de geçiyorsa
+      (yazan I/İ ayrımı yapıyor) ya da tamamı büyük harf yazılmışsa ("SIKIŞIK") belirsizdir, noktalı i sayılmaz; modele gider.
+      İfadedeki ı ise i ile de eşleşir.
+    - '!' ile başlayan ifadelerde ç, ş, ğ, ö, ü metinde de aynen yazılmalı ("!piç" -> "pic" eşleşmez)
+    """
+
+    def __init__(self, entries: list):
+        start = time.perf_counter()
+        self.patterns = []  # (orijinal ifade, normalize ifade, kök mü, çift harf konumları, noktalı i konumları, katlanmaz harfler)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for entry in entries:
+            is_strict = entry.startswith("!")
+            is_prefix = entry.endswith("*")
+            word = entry[1 if is_strict else 0:-1 if is_prefix else None]
+            normalized, positions, runs, _ = _normalize(word)
+            normalized = normalized.strip()
+            if normalized:
+                source = unicodedata.normalize("NFC", word)
+                doubles = tuple(k for k, run in enumerate(runs) if run > 1)
+                dotted = tuple(k for k, position in enumerate(positions) if source[position] in "iİ")
+                strict = tuple((k, source[position].lower()) for k, position in enumerate(positions)
+                               if is_strict and source[position] in _STRICT_LETTERS)
+                self._add(normalized, len(self.patterns))
+                self.patterns.append((word, normalized, is_prefix, doubles, dotted, strict))
+        self._build_failure_links()
+        self.build_ms = (time.perf_counter() - start) * 1000
+
+        # Metrikler
+        self._scans = 0
+        self._matches = 0
+        self._scan_us = []
+
+    def _add(self, word: str, pattern_id: int):
+        node = 0
+        for char in word:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(pattern_id)
+
+    def _build_failure_links(self):
+        """BFS ile failure bağlantıları; her düğümün çıktısına fail zincirindeki çıktılar eklenir."""
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def scan(self, text: str, first_only: bool = False) -> list:
+        """
+        Metindeki sözlük eşleşmelerini döner: [{"word", "start", "end"}] (start/end orijinal metindeki konum).
+        Tam kelime ifadeler iki taraftan, kök ifadeler sadece baştan kelime sınırında olmalıdır.
+        Boşluk ve kelimeler arasındaki noktalama kelime sınırıdır ("bu.siktir").
+        """
+        start_time = time.perf_counter()
+        stream, positions, runs, breaks = _normalize(text)
+        source = unicodedata.normalize("NFC", text)
+        distinguishes_i = "İ" in source
+        matches = []
+        node = 0
+        goto, fail, output, patterns = self._goto, self._fail, self._output, self.patterns
+
+        for index, char in enumerate(stream):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if not output[node]:
+                continue
+            for pattern_id in output[node]:
+                word, normalized, is_prefix, doubles, dotted, strict = patterns[pattern_id]
+                begin = index - len(normalized) + 1
+                if begin > 0 and stream[begin - 1] != " " and not breaks[begin]:
+                    continue
+                if not is_prefix and index + 1 < len(stream) and stream[index + 1] != " " and not breaks[index + 1]:
+                    continue
+                if any(runs[begin + k] < 2 for k in doubles):
+                    continue
+                if dotted:
+                    span = source[positions[begin]:positions[index] + 1]
+                    dotless = "ıI" if distinguishes_i or span.isupper() else "ı"
+                    if any(source[positions[begin + k]] in dotless for k in dotted):
+                        continue
+                if any(source[positions[begin + k]].lower() != letter for k, letter in strict):
+                    continue
+                matches.append({"word": word, "start": positions[begin], "end": positions[index] + 1})
+                if first_only:
+                    break
+            if first_only and matches:
+                break
+
+        self._scans += 1
+        self._matches += bool(matches)
+        self._scan_us.append((time.perf_counter() - start_time) * 1e6)
+        if len(self._scan_us) > 2048:
+            del self._scan_us[:1024]
+        return matches
+
+    def check(self, text: str):
+        """
+        Açık küfür varsa analyze_text formatında ret sonucu, yoksa None (metin modele gitmeli).
+        """
+        if not text:
+            return None
+        matches = self.scan(text, first_only=True)
+        if not matches:
+            return None
+        match = matches[0]
+        return {
+            "is_toxic": True,
+            "score": 100.0,
+            "label": "KÜFÜRLÜ",
+            "source": "lexicon",
+            "matched": text[match["start"]:match["end"]],
+            "span": [match["start"], match["end"]]
+        }
+
+    def stats(self) -> dict:
+        scan_us = np.asarray(self._scan_us) if self._scan_us else None
+        return {
+            "patterns": len(self.patterns),
+            "nodes": len(self._goto),
+            "build_ms": round(self.build_ms, 2),
+            "scans": self._scans,
+            "matches": self._matches,
+            "scan_us": {
+                "p50": round(float(np.percentile(scan_us, 50)), 2),
+                "p99": round(float(np.percentile(scan_us, 99)), 2)
+            } if scan_us is not None else None
+        }
+
+
+def load_wordlist(path: str = None) -> list:
+    path = path or PROFANITY_WORDLIST
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+_filter = None
+_filter_lock = threading.Lock()
+
+def get_profanity_filter() -> ProfanityFilter:
+    """Süreç başına tek otomat (ilk kullanımda kurulur)."""
+    global _filter
+    if _filter is None:
+        with _filter_lock:
+            if _filter is None:
+                _filter = ProfanityFilter(load_wordlist())
+    return _filter
+
+
+def reload_profanity_filter(path: str = None) -> ProfanityFilter:
+    """
+    Sözlüğü diskten tekrar okuyup yeni otomat kurar. Kurulum bitene kadar eski otomat kullanılmaya devam eder,
+    sonra referans atomik olarak değiştirilir (taramalar kilitsiz çalışır).
+    """
+    global _filter
+    new_filter = ProfanityFilter(load_wordlist(path))
+    with _filter_lock:
+        _filter = new_filter
+    print(f"✅ Küfür sözlüğü yüklendi ({len(new_filter.patterns)} ifade, {new_filter.build_ms:.1f} ms)")
+    return new_filter
@@ -0,0 +1,77 @@
+import sys
+
+from profanity_filter import ProfanityFilter, load_wordlist
+
+# Sözlük köklerine benzeyen gündelik metinler: Hiçbiri ön filtrede reddedilmemeli (modele gider)
+# Katlama (ı -> i, ç -> c) ve harf birleştirme (ll -> l) yüzünden yanlış alarm veren her örnek buraya eklenir.
+MUST_PASS = [
+    "Trafik çok sıkışık bugün",
+    "Kapıda sıkıştım",
+    "Dosyayı sıkıştırdım",
+    "Sıkışık program",
+    "SIKIŞIK BİR HAFTA",
+    "Sıkıntı yok, hallederiz",
+    "Çok sıkıldım, hafta sonu bir yerlere gidelim.",
+    "Dalamak istemiyorum",
+    "Arı dalamış, eli şişti",
+    "Amca bugün bize geldi, akşam yemeğine kaldı.",
+    "Amin dedi ve sofradan kalktı.",
+    "Kitapları kütüphaneye götürdüm.",
+    "Sikke koleksiyonunu müzeye bağışladı.",
+    "Yarasa mağaradan uçtu.",
+    "Yarak kelimesi eski Türkçede silah demek.",
+    "Dalga sesini dinlemek çok rahatlatıcı.",
+    "Piknikte pikachu kostümü giyen çocuk herkesi güldürdü.",
+    "Gavurdağı'na çıktık.",
+    "I got it, thanks!",
+    "SIKIŞIK YOL",
+    "YOLLAR SIKIŞIK",
+    "Nice pic!",
+    "new profile pic",
+    "Pic of the day",
+    "Otel pic",
+]
+
+# Gizlenmiş açık küfürler: Hepsi ön filtrede reddedilmeli
+MUST_BLOCK = [
+    "siktir git",
+    "SİKTİR",
+    "s.i.k.t.i.r",
+    "siiiktir",
+    "bu.siktir",
+    "bu,amk",
+    "amina koyayim",
+    "amına koyayım",
+    "orospu çocuğu",
+    "dallama",
+    "dalllamaaa",
+    "sikiş",
+    "sikis",
+    "$erefsiz",
+    "piç.",
+    "PİÇ",
+]
+
+
+def main():
+    lexicon = ProfanityFilter(load_wordlist())
+    false_positives = [text for text in MUST_PASS if lexicon.check(text) is not None]
+    missed = [text for text in MUST_BLOCK if lexicon.check(text) is None]
+
+    print("\n--- KÜFÜR ÖN FİLTRESİ REGRESYON TESTİ ---")
+    for text in false_positives:
+        result = lexicon.check(text)
+        print(f"🚫 YANLIŞ ALARM: {text!r} (eşleşen: {result['matched']!r})")
+    for text in missed:
+        print(f"⚠️ KAÇIRILDI: {text!r}")
+
+    print(f"Geçmesi gereken: {len(MUST_PASS) - len(false_positives)}/{len(MUST_PASS)} | "
+          f"Reddedilmesi gereken: {len(MUST_BLOCK) - len(missed)}/{len(MUST_BLOCK)}")
+    if false_positives or missed:
+        print("❌ BAŞARISIZ")
+        sys.exit(1)
+    print("✅ GEÇTİ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import torch
+
+from text_moderator import TextModerator
+from benchmark import TEXTS
+
+
+def make_corpus(count: int) -> list:
+    """Kısa açıklamalardan uzun OCR metinlerine kadar karışık uzunlukta sabit korpus."""
+    rng = np.random.default_rng(42)
+    corpus = []
+    for _ in range(count):
+        # 1-8 cümle birleştir: Uzunluk dağılımı gerçek trafikteki gibi dengesiz olsun
+        parts = rng.choice(len(TEXTS), size=int(rng.integers(1, 9)))
+        corpus.append(" ".join(TEXTS[i] for i in parts))
+    return corpus
+
+
+def single_path(moderator, texts):
+    """Eski yol: Her metin ayrı tokenize + ayrı forward pass."""
+    return [moderator.analyze_texts([text])[0] for text in texts]
+
+
+def padded_batch_path(moderator, texts, batch_size):
+    """Kovasız batch: Giriş sırasıyla, her batch en uzun metnine göre pad edilir."""
+    results = []
+    for start in range(0, len(texts), batch_size):
+        inputs = moderator.tokenizer(texts[start:start + batch_size], return_tensors="pt", truncation=True, padding=True).to(moderator.device)
+        with torch.inference_mode():
+            logits = moderator.model(**inputs).logits
+        results.extend({"is_toxic": pred == 0} for pred in logits.argmax(dim=1).tolist())
+    return results
+
+
+def bucketed_path(moderator, texts, batch_size):
+    """Yeni yol: Uzunluk kovalı analyze_texts."""
+    return moderator.analyze_texts(texts, batch_size=batch_size)
+
+
+def measure(fn, runs):
+    fn()  # Isınma
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return float(np.median(durations))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TextModerator tekli vs batch (uzunluk kovalı) verim karşılaştırması (CPU)")
+    parser.add_argument("--texts", type=int, default=256, help="Korpustaki metin sayısı")
+    parser.add_argument("--batch-sizes", default="8,32", help="Virgülle ayrılmış batch boyutları")
+    parser.add_argument("--runs", type=int, default=3, help="Tekrar sayısı (medyan alınır)")
+    args = parser.parse_args()
+
+    torch.set_num_threads(os.cpu_count() or 1)
+    moderator = TextModerator()
+    texts = make_corpus(args.texts)
+
+    single_results = single_path(moderator, texts)
+    rows = [("single", 1, measure(lambda: single_path(moderator, texts), args.runs), None)]
+
+    for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+        bucketed_results = bucketed_path(moderator, texts, batch_size)
+        # Kararlar değişmemeli
+        mismatches = sum(a["is_toxic"] != b["is_toxic"] for a, b in zip(single_results, bucketed_results))
+        rows.append(("padded", batch_size, measure(lambda: padded_batch_path(moderator, texts, batch_size), args.runs), None))
+        rows.append(("bucketed", batch_size, measure(lambda: bucketed_path(moderator, texts, batch_size), args.runs), mismatches))
+
+    single_seconds = rows[0][2]
+    print("\n" + "=" * 60)
+    print(f"METİN MODERASYONU VERİMİ ({len(texts)} metin)")
+    print("=" * 60)
+    for name, batch_size, seconds, mismatches in rows:
+        line = f"{name:9s} batch={batch_size:3d} | {len(texts) / seconds:8.1f} metin/sn | x{single_seconds / seconds:5.2f}"
+        if mismatches is not None:
+            line += f" | karar farkı: {mismatches}"
+        print(line)
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#Metin Moderasyon Önbelleği - Aynı (normalize edilmiş) metin tekrar BERT'ten geçmez
+
+import os
+import re
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+TEXT_CACHE_SIZE = int(os.getenv("TEXT_CACHE_SIZE", "8192"))          # Bellekte tutulacak maksimum kayıt
+TEXT_CACHE_TTL = int(os.getenv("TEXT_CACHE_TTL", "86400"))           # Kayıt ömrü (sn), 0 = süresiz
+TEXT_CACHE_PERSIST = os.getenv("TEXT_CACHE_PERSIST", "0") == "1"     # Kayıtlar veritabanına da yazılsın mı?
+
+# Türkçe büyük/küçük harf: I -> ı, İ -> i (str.lower() "İ"yi "i̇" yapar, "I"yı "i" yapar)
+_TURKISH_LOWER = str.maketrans({"I": "ı", "İ": "i"})
+_WHITESPACE = re.compile(r"\s+")
+# 3 veya daha fazla tekrar eden karakter 2'ye indirilir ("çoooook" -> "çook");
+# Türkçedeki gerçek çift harfler ("saat", "mülk") bozulmaz
+_REPEATED = re.compile(r"(.)\1{2,}")
+
+
+def normalize_text(text: str) -> str:
+    """Önbellek anahtarı için Türkçe kurallarına uygun normalize edilmiş metin."""
+    text = unicodedata.normalize("NFC", text or "")
+    text = text.translate(_TURKISH_LOWER).lower()
+    text = _WHITESPACE.sub(" ", text).strip()
+    return _REPEATED.sub(r"\1\1", text)
+
+
+def text_key(model_id: str, text: str) -> str:
+    """Önbellek anahtarı: Model kimliği + normalize edilmiş metnin SHA-256 özeti."""
+    return hashlib.sha256(f"{model_id}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class TextModerationCache:
+    """
+    Bellek içi, boyutu sınırlı ve süreli (TTL) LRU önbellek.
+    - Anahtar model kimliğini içerdiği için model değişince eski kayıtlar zaten isabet etmez;
+      invalidate() ile bellekten de temizlenir.
+    - Kayıt: analyze_text sonucu (sözlük). Çağırana kopyası verilir.
+    """
+
+    def __init__(self, max_entries: int = TEXT_CACHE_SIZE, ttl: int = TEXT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (model_id, expires_at, result)
+        self._lock = threading.Lock()
+        self._model_id = None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __contains__(self, key: str) -> bool:
+        """Sayaçları etkilemeden (süresi dolmamış) kayıt var mı."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (entry[1] is None or entry[1] >= time.monotonic())
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            _, expires_at, result = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def put(self, key: str, model_id: str, result: dict):
+        with self._lock:
+            if self._model_id is not None and model_id != self._model_id:
+                # Model değişti: Eski modelin kayıtları artık kullanılmaz
+                self._invalidate_locked(self._model_id)
+            self._model_id = model_id
+            expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+            self._entries[key] = (model_id, expires_at, dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _invalidate_locked(self, model_id: str = None) -> int:
+        if model_id is None:
+            removed = len(self._entries)
+            self._entries.clear()
+        else:
+            stale = [key for key, (entry_model, _, _) in self._entries.items() if entry_model == model_id]
+            for key in stale:
+                del self._entries[key]
+            removed = len(stale)
+        self.invalidations += 1
+        return removed
+
+    def invalidate(self, model_id: str = None) -> int:
+        """model_id verilirse sadece o modelin kayıtlarını, verilmezse hepsini siler. Silinen kayıt sayısını döner."""
+        with self._lock:
+            return self._invalidate_locked(model_id)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "model_id": self._model_id,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "persist": TEXT_CACHE_PERSIST
+        }
+
+
+text_cache = TextModerationCache()
@@ -1,16 +1,27 @@
+import os
 import warnings
 import torch
 import sys
+import threading
 from transformers import AutoModelForSequenceClassification, AutoTokenizer
 
 warnings.filterwarnings("ignore", category=UserWarning)
 
+# Ayarlar (.env üzerinden değiştirilebilir)
+TEXT_BATCH_SIZE = int(os.getenv("TEXT_BATCH_SIZE", "32"))                  # Bir forward pass'teki maksimum metin
+TEXT_MAX_BATCH_TOKENS = int(os.getenv("TEXT_MAX_BATCH_TOKENS", "8192"))    # Bir batch'teki maksimum token (padding dahil)
+TEXT_CHUNK_OVERLAP = int(os.getenv("TEXT_CHUNK_OVERLAP", "64"))            # Uzun metin pencereleri arası örtüşme (token)
+TEXT_CHUNK_EARLY_STOP = os.getenv("TEXT_CHUNK_EARLY_STOP", "1") == "1"     # İlk küfürlü pencere grubundan sonra dur
+
 class TextModerator:
     def __init__(self, model_name: str = "thothai/turkce-kufur-tespiti"):
         """
         Token parametresi kaldırıldı. Sistemdeki kayıtlı girişi kullanır.
         """
+        self.model_name = model_name
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        # Fast tokenizer (Rust) aynı nesne üzerinden eşzamanlı çağrılara izin vermez ("Already borrowed")
+        self._tokenizer_lock = threading.Lock()
         print(f"TextModerator Başlatılıyor... Cihaz: {self.device}")
 
         try:
@@ -35,24 +46,128 @@ class TextModerator:
             sys.exit()
 
     def analyze_text(self, text: str) -> dict:
-        if not text or text.strip() == "":
-            return {"text": "", "is_toxic": False, "score": 0.0, "label": "BOŞ"}
+        return self.analyze_texts([text])[0]
+
+    def _max_length(self) -> int:
+        """Modelin tek seferde alabileceği maksimum token (özel tokenlar dahil)."""
+        return min(self.tokenizer.model_max_length, self.model.config.max_position_embeddings)
 
-        inputs = self.tokenizer(text, return_tensors="pt", truncation=True, padding=True).to(self.device)
+    def _classify(self, sequences: list) -> list:
+        """Token dizilerini tek padded batch olarak sınıflandırır. Dönüş: [(is_toxic, güven %)]"""
+        with self._tokenizer_lock:
+            inputs = self.tokenizer.pad({"input_ids": sequences}, return_tensors="pt").to(self.device)
 
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            logits = outputs.logits
+        with torch.inference_mode():
+            logits = self.model(**inputs).logits
             probs = torch.softmax(logits, dim=1)
-            pred_class_id = torch.argmax(logits, dim=1).item()
-            confidence = probs[0][pred_class_id].item() * 100
+            pred_class_ids = torch.argmax(logits, dim=1)
+            confidences = probs.gather(1, pred_class_ids[:, None])[:, 0] * 100
 
         # Modelde 0 = KÜFÜR, 1 = TEMİZ
-        is_toxic = (pred_class_id == 0)
-        label_text = "KÜFÜRLÜ" if is_toxic else "TEMİZ"
+        return [(pred_class_id == 0, confidence) for pred_class_id, confidence in zip(pred_class_ids.tolist(), confidences.tolist())]
 
+    @staticmethod
+    def _result(is_toxic: bool, confidence: float) -> dict:
         return {
             "is_toxic": is_toxic,
             "score": round(confidence, 2),
-            "label": label_text
-        }
\ No newline at end of file
+            "label": "KÜFÜRLÜ" if is_toxic else "TEMİZ"
+        }
+
+    def analyze_texts(self, texts: list, batch_size: int = TEXT_BATCH_SIZE, max_batch_tokens: int = TEXT_MAX_BATCH_TOKENS) -> list:
+        """
+        Birden fazla metni batch'ler halinde sınıflandırır (OCR satırları, açıklamalar, biyografiler, toplu tarama).
+        - Metinler önce padding'siz tokenize edilir, token uzunluğuna göre sıralanıp kovalara (bucket) bölünür;
+          böylece her batch'te benzer uzunluktaki metinler olur ve padding az kalır.
+        - Bir kova en fazla batch_size metin ve en fazla max_batch_tokens (uzunluk x metin) token içerir.
+        - Modelin sınırını aşan uzun metinler kesilmez, analyze_long_text ile pencerelere bölünür.
+        Dönüş: analyze_text ile aynı formatta sonuç listesi (giriş sırasıyla).
+        """
+        results = [None] * len(texts)
+        positions = []
+        for i, text in enumerate(texts):
+            if not text or text.strip() == "":
+                results[i] = {"text": "", "is_toxic": False, "score": 0.0, "label": "BOŞ"}
+            else:
+                positions.append(i)
+
+        if not positions:
+            return results
+
+        with self._tokenizer_lock:
+            encoded = self.tokenizer([texts[i] for i in positions], truncation=False, verbose=False)["input_ids"]
+
+        # Uzun metinler ayrı yoldan (kayan pencere), kısa metinler eskisi gibi tek parça
+        max_length = self._max_length()
+        short = []
+        for k, ids in enumerate(encoded):
+            if len(ids) > max_length:
+                results[positions[k]] = self.analyze_long_text(texts[positions[k]], batch_size=batch_size)
+            else:
+                short.append(k)
+
+        # Uzunluğa göre sırala ve kovalara böl
+        order = sorted(short, key=lambda k: len(encoded[k]))
+        buckets, bucket = [], []
+        for k in order:
+            # Sıralı olduğu için kovanın en uzun elemanı en son eklenen
+            if bucket and (len(bucket) >= batch_size or len(encoded[k]) * (len(bucket) + 1) > max_batch_tokens):
+                buckets.append(bucket)
+                bucket = []
+            bucket.append(k)
+        if bucket:
+            buckets.append(bucket)
+
+        for bucket in buckets:
+            predictions = self._classify([encoded[k] for k in bucket])
+            for k, (is_toxic, confidence) in zip(bucket, predictions):
+                results[positions[k]] = self._result(is_toxic, confidence)
+        return results
+
+    def analyze_long_text(self, text: str, batch_size: int = TEXT_BATCH_SIZE, stride: int = TEXT_CHUNK_OVERLAP,
+                          early_stop: bool = TEXT_CHUNK_EARLY_STOP) -> dict:
+        """
+        Model sınırından uzun metni örtüşen token pencerelerine bölerek sınıflandırır (sondaki küfür de kaçmaz).
+        - Her pencere max_length token (özel tokenlar dahil), ardışık pencereler 'stride' token örtüşür.
+          Pencere sayısı metin uzunluğuyla doğrusal artar.
+        - early_stop=True: Pencereler batch_size'lık gruplar halinde sırayla çalışır, küfürlü pencere bulunan
+          gruptan sonra durulur. False: Tüm pencereler tek padded batch olarak çalışır.
+        Dönüş: analyze_text formatı + "span" (ilgili pencerenin metindeki [başlangıç, bitiş] karakter aralığı),
+        "chunks" (değerlendirilen pencere), "total_chunks".
+        """
+        with self._tokenizer_lock:
+            encoding = self.tokenizer(text, truncation=False, return_offsets_mapping=True,
+                                      return_special_tokens_mask=True, verbose=False)
+        # Baştaki/sondaki özel tokenlar ([CLS] / [SEP]) her pencereye aynen eklenir
+        mask = encoding["special_tokens_mask"]
+        head = mask.index(0)
+        end = len(mask) - mask[::-1].index(0)
+        all_ids = encoding["input_ids"]
+        prefix, suffix = all_ids[:head], all_ids[end:]
+        ids, offsets = all_ids[head:end], encoding["offset_mapping"][head:end]
+
+        window = self._max_length() - len(prefix) - len(suffix)
+        step = max(1, window - min(stride, window // 2))
+        starts = list(range(0, max(len(ids) - window, 0) + step, step))
+        windows = [(start, min(start + window, len(ids))) for start in starts]
+        group_size = batch_size if early_stop else len(windows)
+
+        evaluated, toxic, clean = 0, [], []
+        for group_start in range(0, len(windows), group_size):
+            group = windows[group_start:group_start + group_size]
+            sequences = [prefix + ids[begin:end] + suffix for begin, end in group]
+            for (begin, end), (is_toxic, confidence) in zip(group, self._classify(sequences)):
+                span = [offsets[begin][0], offsets[end - 1][1]]
+                (toxic if is_toxic else clean).append((confidence, span))
+            evaluated += len(group)
+            if early_stop and toxic:
+                break
+
+        # Küfürlü pencere varsa en emin olunanı, yoksa en az emin olunan temiz pencere raporlanır
+        if toxic:
+            confidence, span = max(toxic)
+        else:
+            confidence, span = min(clean)
+        result = self._result(bool(toxic), confidence)
+        result.update({"span": span, "chunks": evaluated, "total_chunks": len(windows)})
+        return result
@@ -0,0 +1,117 @@
+#Kart Tanımlayıcı Backfill - Kartı olan mevcut kullanıcılar için ORB ve global tanımlayıcıları hesaplayıp saklar
+#Kullanım: python -m src.auth.card_backfill [--force] [--vocabulary] [--batch-size 100]
+
+import time
+import argparse
+
+from ..database import Base, engine, SessionLocal
+from .. import api  # noqa: F401 - Tüm modeller (ilişkiler) kayıtlı olsun
+from .models import User, CardDescriptor
+from .service import (card_features, store_card_descriptor, active_card_vocabulary, card_vocabulary_sample,
+                      save_card_vocabulary, missing_card_global_descriptors, card_global_vector,
+                      store_card_global_descriptor)
+from ..ai.model_registry import registry
+
+
+def backfill(force: bool = False, batch_size: int = 100) -> dict:
+    """
+    Tanımlayıcısı olmayan veya eski sürümlü kartları hesaplar (force: hepsini).
+    Kullanıcılar id sırasıyla batch'ler halinde işlenir, her batch ayrı commit edilir (yarıda kesilirse kaldığı yerden devam eder).
+    """
+    Base.metadata.create_all(bind=engine)
+    version = registry.get("card_matcher").feature_version
+    stats = {"processed": 0, "failed": 0, "stored_bytes": 0}
+    last_id = 0
+
+    while True:
+        db = SessionLocal()
+        try:
+            query = db.query(User.id, User.card_image).filter(User.card_image.isnot(None), User.id > last_id)
+            if not force:
+                query = query.outerjoin(
+                    CardDescriptor, (CardDescriptor.user_id == User.id) & (CardDescriptor.version == version)
+                ).filter(CardDescriptor.id.is_(None))
+            users = query.order_by(User.id).limit(batch_size).all()
+            if not users:
+                break
+
+            for user_id, card_image in users:
+                try:
+                    features = card_features(card_image)
+                except Exception as e:
+                    print(f"❌ Kullanıcı #{user_id} kartı işlenemedi: {str(e)}")
+                    features = (version, b"", b"", 0)
+                    stats["failed"] += 1
+                store_card_descriptor(db, user_id, features)
+                stats["processed"] += 1
+                stats["stored_bytes"] += len(features[1]) + len(features[2])
+            db.commit()
+            last_id = users[-1][0]
+            print(f"✅ {stats['processed']} kart işlendi (son kullanıcı #{last_id})")
+        finally:
+            db.close()
+    return stats
+
+
+def backfill_global(retrain: bool = False, batch_size: int = 100) -> dict:
+    """
+    Kart ön eleme indeksi: Sözlük yoksa (veya retrain) kayıtlı kartlardan eğitilir, global tanımlayıcısı
+    eksik kartlar saklanan ORB tanımlayıcılarından hesaplanır (kart görselleri decode edilmez).
+    """
+    from ..ai.card_index import BinaryVocabulary, CARD_VOCABULARY_MIN_CARDS
+
+    stats = {"vocabulary": None, "trained": False, "processed": 0}
+    db = SessionLocal()
+    try:
+        vocabulary = active_card_vocabulary(db)
+        if vocabulary is None or retrain:
+            descriptor_sets = card_vocabulary_sample(db)
+            if len(descriptor_sets) < CARD_VOCABULARY_MIN_CARDS and not retrain:
+                print(f"ℹ️ {len(descriptor_sets)} kart: Sözlük {CARD_VOCABULARY_MIN_CARDS} karttan sonra eğitilir (giriş tam tarama ile)")
+                return stats
+            if not descriptor_sets:
+                return stats
+            vocabulary = save_card_vocabulary(db, BinaryVocabulary.train(descriptor_sets), len(descriptor_sets))
+            stats["trained"] = True
+        stats["vocabulary"] = vocabulary.vocabulary_id
+
+        while True:
+            missing = missing_card_global_descriptors(db, vocabulary, limit=batch_size)
+            if not missing:
+                break
+            for user_id, descriptor_blob in missing:
+                store_card_global_descriptor(db, user_id, vocabulary, card_global_vector(vocabulary, descriptor_blob))
+            db.commit()
+            stats["processed"] += len(missing)
+            print(f"✅ {stats['processed']} global tanımlayıcı hesaplandı")
+    finally:
+        db.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kartla giriş için kayıtlı kartların ORB tanımlayıcılarını hesaplar")
+    parser.add_argument("--force", action="store_true", help="Güncel sürümdeki kayıtlar dahil hepsini tekrar hesapla")
+    parser.add_argument("--vocabulary", action="store_true", help="Ön eleme sözlüğünü tekrar eğit (tüm global tanımlayıcılar yenilenir)")
+    parser.add_argument("--batch-size", type=int, default=100, help="Commit başına kullanıcı")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = backfill(args.force, args.batch_size)
+    global_stats = backfill_global(args.vocabulary, args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    print("\n" + "=" * 55)
+    print("KART TANIMLAYICI BACKFILL")
+    print("=" * 55)
+    print(f"İşlenen kart     : {stats['processed']} ({stats['failed']} hatalı)")
+    print(f"Saklanan veri    : {stats['stored_bytes'] / 1024 / 1024:.2f} MB")
+    vocabulary = f"#{global_stats['vocabulary']}" if global_stats["vocabulary"] else "yok (tam tarama)"
+    print(f"Ön eleme sözlüğü : {vocabulary}{' (yeni eğitildi)' if global_stats['trained'] else ''}")
+    print(f"Global vektör    : {global_stats['processed']} kart")
+    print(f"Süre             : {elapsed:.1f} sn")
+    print("=" * 55)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 #Veritabanı için kullanılacak modeller burada oluşturulur.
 
-from sqlalchemy import Column, Date, DateTime, ForeignKey, Integer, String, Enum, ForeignKey
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Integer, String, Enum, ForeignKey, LargeBinary
 from datetime import datetime
 from sqlalchemy.orm import relationship
 
@@ -48,4 +48,42 @@ class User(Base):
     following_count = Column(Integer, default=0)
 
 
+class CardDescriptor(Base):
+    """
+    Kullanıcı kartının önceden çıkarılmış ORB özellikleri (kart kaydedilirken bir kez hesaplanır).
+    Kartla girişte kayıtlı kartlar tekrar decode edilip işlenmez, sadece bu tanımlayıcılarla eşleştirilir.
+    """
+    __tablename__ = "card_descriptors"
 
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), unique=True, index=True)
+    version = Column(String(32), nullable=False, index=True) #CardMatcher.feature_version (farklıysa tekrar hesaplanır)
+    keypoint_count = Column(Integer, nullable=False)
+    keypoints = Column(LargeBinary, nullable=False) #(n, 6) float32: x, y, size, angle, response, octave
+    descriptors = Column(LargeBinary, nullable=False) #ORB: (n, 32) uint8
+
+    updated_dt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class CardVocabulary(Base):
+    """Kart ön eleme indeksinin görsel kelime sözlüğü (ORB k-majority). En son kayıt aktiftir."""
+    __tablename__ = "card_vocabularies"
+
+    id = Column(Integer, primary_key=True, index=True)
+    feature_version = Column(String(32), nullable=False) #Eğitildiği tanımlayıcıların CardMatcher.feature_version'ı
+    words = Column(LargeBinary, nullable=False) #(kelime, 32) uint8
+    card_count = Column(Integer) #Eğitimde kullanılan kart sayısı
+
+    created_dt = Column(DateTime, default=datetime.utcnow)
+
+
+class CardGlobalDescriptor(Base):
+    """Kartın sözlüğe göre global tanımlayıcısı (ön eleme indeksinde tek satır)."""
+    __tablename__ = "card_global_descriptors"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), unique=True, index=True)
+    vocabulary_id = Column(Integer, ForeignKey("card_vocabularies.id", ondelete="CASCADE"), nullable=False, index=True)
+    vector = Column(LargeBinary, nullable=False) #(kelime / 8,) uint8, paketli kelime bit kümesi
+
+    updated_dt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
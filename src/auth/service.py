@@ -1,6 +1,9 @@
 #Business Logic = Service Katmanı
 
 import os
+import asyncio
+import threading
+import numpy as np
 from dotenv import load_dotenv
 from fastapi import Depends
 from sqlalchemy.orm import Session
@@ -10,8 +13,11 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from datetime import timedelta, datetime
 
-from .models import User
+from .models import User, CardDescriptor, CardVocabulary, CardGlobalDescriptor
+from ..database import SessionLocal
 from .schemas import UserCreate, UserUpdate
+from ..ai.executors import run_image, run_inference, ExecutorOverloaded
+from ..ai.model_registry import registry, AI_MODE
 
 # .env dosyasından environment variables'ları yükle
 load_dotenv()
@@ -21,6 +27,9 @@ oauth2_bearer = OAuth2PasswordBearer(tokenUrl= "v1/auth/token") #Kullanıcı Bea
 SECRET_KEY = os.getenv("SECRET_KEY", "mysecretkey")  # .env'den al, yoksa fallback
 ALGORITHM = "HS256"
 TOKEN_EXPIRE_MINS = 60 * 24 * 30 #Token expire süresi 30 gün olacak.
+CARD_INDEX_SYNC_SLACK = 60 #Kart ön eleme indeksi eşitlenirken geriye bakılan pay (sn)
+CARD_GLOBAL_INLINE_LIMIT = 20 #Girişte bundan fazla eksik global tanımlayıcı varsa arka planda hesaplanır (giriş tam tarama ile)
+CARD_DESCRIPTOR_INLINE_LIMIT = 20 #Girişte bundan fazla eksik kart tanımlayıcısı varsa arka planda hesaplanır (backfill komutu önerilir)
 
 
 #Mevcut Kullanıcıları Kontrol
@@ -68,7 +77,7 @@ async def create_user(db: Session, user: UserCreate):
     db_user = User(
         email = user.email.lower().strip(),
         username = user.username.lower().strip(),
-        hashed_password = bcrypt_context.hash(user.password),
+        hashed_password = await run_image(bcrypt_context.hash, user.password), # bcrypt bilerek yavaştır, event loop dışında çalışır
         birthDate = user.birthDate or None,
         gender = user.gender or None,
         biography = user.biography or None,
@@ -80,6 +89,9 @@ async def create_user(db: Session, user: UserCreate):
     db.add(db_user)
     db.commit()
 
+    if db_user.card_image:
+        await save_card_descriptor(db, db_user)
+
     return db_user
 
 #Authentication
@@ -97,7 +109,7 @@ async def authenticate(db: Session, username: str, password: str):
         return None
     
     # Şifreyi kontrol et
-    if not bcrypt_context.verify(password, db_user.hashed_password):
+    if not await run_image(bcrypt_context.verify, password, db_user.hashed_password):
         return None
     
     return db_user
@@ -114,6 +126,9 @@ async def update_user(db:Session, db_user: User, user_update: UserUpdate):
 
     db.commit()
 
+    if user_update.card_image:
+        await save_card_descriptor(db, db_user)
+
 #Delete User
 async def delete_user(db: Session, user_id: int):
     """
@@ -171,8 +186,482 @@ async def delete_user(db: Session, user_id: int):
     if user_post_ids:
         db.query(Post).filter(Post.author_id == user_id).delete(synchronize_session=False)
     
-    # 7. Kullanıcıyı sil
+    # 7. Kart tanımlayıcılarını sil (bu süreçteki ön eleme / oylama indekslerinden de)
+    db.query(CardDescriptor).filter(CardDescriptor.user_id == user_id).delete(synchronize_session=False)
+    db.query(CardGlobalDescriptor).filter(CardGlobalDescriptor.user_id == user_id).delete(synchronize_session=False)
+    await forget_card_candidates([user_id])
+    
+    # 8. Kullanıcıyı sil
     db.delete(db_user)
     db.commit()
     
-    return True
\ No newline at end of file
+    return True
+
+#Kart Tanımlayıcıları (kartla giriş için kayıt sırasında bir kez hesaplanır)
+def card_features(card_image: str):
+    """
+    Kart görselinden (base64) ORB özelliklerini çıkarır. inference havuzunda veya backfill komutunda çalışır.
+    Dönüş: (sürüm, keypoint_blob, descriptor_blob, keypoint_count)
+    """
+    matcher = registry.get("card_matcher")
+    keypoints, descriptors = matcher.extract_features(matcher.load_image(card_image))
+    return (matcher.feature_version,) + matcher.pack_features(keypoints, descriptors)
+
+
+def store_card_descriptor(db: Session, user_id: int, features: tuple):
+    """card_features sonucunu kullanıcının kaydına yazar (varsa günceller). Commit çağırana aittir."""
+    version, keypoints, descriptors, keypoint_count = features
+    record = db.query(CardDescriptor).filter(CardDescriptor.user_id == user_id).first()
+    if record is None:
+        record = CardDescriptor(user_id=user_id)
+        db.add(record)
+    record.version = version
+    record.keypoints = keypoints
+    record.descriptors = descriptors
+    record.keypoint_count = keypoint_count
+
+
+async def save_card_descriptor(db: Session, db_user: User) -> bool:
+    """
+    Kullanıcının kartı için tanımlayıcıları (ve sözlük varsa global tanımlayıcıyı) hesaplayıp saklar.
+    db_user: User veya id, username, card_image sütunlarını içeren satır.
+    Hesaplanamazsa (lite mod, yoğunluk, bozuk görsel) kayıt işlemi bozulmaz; eksik kayıt ilk kartla girişte
+    veya backfill komutu ile (python -m src.auth.card_backfill) tamamlanır.
+    """
+    if AI_MODE == "lite":
+        print(f"ℹ️ AI_MODE=lite: {db_user.username} kart tanımlayıcısı backfill ile hesaplanacak")
+        return False
+    features, global_vector = None, None
+    try:
+        await registry.ensure_loaded("card_matcher")
+        features = await run_inference(card_features, db_user.card_image)
+        vocabulary = active_card_vocabulary(db)
+        if vocabulary is not None:
+            global_vector = await run_inference(card_global_vector, vocabulary, features[2])
+    except ExecutorOverloaded:
+        # Kullanıcı zaten kaydedildi: Hiçbir şey yazılmaz, istek 503 ile bozulmaz
+        print(f"⚠️ Sunucu yoğun: {db_user.username} kart tanımlayıcısı ilk kartla girişte hesaplanacak")
+        return False
+    except Exception as e:
+        print(f"❌ Kart tanımlayıcısı hesaplanamadı ({db_user.username}): {str(e)}")
+        if features is None:
+            # Bozuk görsel: Boş kayıt yazılır, her girişte tekrar denenmez (kart yeniden yüklenince hesaplanır)
+            features = (registry.get("card_matcher").feature_version, b"", b"", 0)
+    store_card_descriptor(db, db_user.id, features)
+    if global_vector is not None:
+        store_card_global_descriptor(db, db_user.id, vocabulary, global_vector)
+    db.commit()
+    return True
+
+
+def missing_card_descriptors(db: Session, after_id: int = 0, limit: int = None) -> list:
+    """Tanımlayıcısı olmayan veya eski sürümlü kartlar: [(id, username, card_image)] (id sırasıyla, en fazla limit)."""
+    version = registry.get("card_matcher").feature_version
+    query = db.query(User.id, User.username, User.card_image).outerjoin(
+        CardDescriptor, (CardDescriptor.user_id == User.id) & (CardDescriptor.version == version)
+    ).filter(User.card_image.isnot(None), CardDescriptor.id.is_(None), User.id > after_id).order_by(User.id)
+    return query.limit(limit).all() if limit else query.all()
+
+
+async def fill_missing_card_descriptors(db: Session):
+    """
+    Eksik veya eski sürümlü kart tanımlayıcılarını hesaplar (backfill çalıştırılmadıysa girişte).
+    CARD_DESCRIPTOR_INLINE_LIMIT kadarı girişte hesaplanır; daha fazlası arka plana bırakılır,
+    o kartlar hesaplanana kadar kartla giriş yapamaz (python -m src.auth.card_backfill önerilir).
+    """
+    missing = missing_card_descriptors(db, limit=CARD_DESCRIPTOR_INLINE_LIMIT + 1)
+    if len(missing) > CARD_DESCRIPTOR_INLINE_LIMIT:
+        start_card_descriptor_backfill()
+        return
+    if missing:
+        print(f"⚠️ {len(missing)} kartın tanımlayıcısı yok veya eski, hesaplanıyor (python -m src.auth.card_backfill önerilir)")
+        for row in missing:
+            await save_card_descriptor(db, row)
+
+
+_card_backfill_task = None
+
+
+async def backfill_card_descriptors(batch_size: int = 100):
+    """
+    Arka plan işi: Eksik kart tanımlayıcılarını id sırasıyla batch'ler halinde hesaplar (card_backfill komutunun sunucu içi hali).
+    Kendi oturumunu kullanır; hesaplama inference havuzunda çalışır. Hesaplanamayan (yoğunluk) kartlar sonraki girişlerde tekrar denenir.
+    """
+    db = SessionLocal()
+    processed, last_id = 0, 0
+    try:
+        print("⏳ Eksik kart tanımlayıcıları arka planda hesaplanıyor (python -m src.auth.card_backfill önerilir)")
+        while True:
+            missing = missing_card_descriptors(db, after_id=last_id, limit=batch_size)
+            if not missing:
+                break
+            for row in missing:
+                processed += await save_card_descriptor(db, row)
+            last_id = missing[-1].id
+        print(f"✅ {processed} kartın tanımlayıcısı hesaplandı")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Kart tanımlayıcıları hesaplanamadı: {str(e)}")
+    finally:
+        db.close()
+
+
+def start_card_descriptor_backfill():
+    """backfill_card_descriptors zaten çalışmıyorsa başlatır."""
+    global _card_backfill_task
+    if _card_backfill_task is None or _card_backfill_task.done():
+        _card_backfill_task = asyncio.create_task(backfill_card_descriptors())
+
+
+def get_card_descriptors(db: Session, user_ids: list = None) -> list:
+    """
+    Kartı olan kullanıcıların güncel sürümdeki özellikleri: [(user_id, keypoint_count, keypoint_blob, descriptor_blob)].
+    user_ids verilirse sadece o kullanıcılar (ön eleme adayları).
+    """
+    version = registry.get("card_matcher").feature_version
+    query = db.query(CardDescriptor.user_id, CardDescriptor.keypoint_count, CardDescriptor.keypoints,
+                     CardDescriptor.descriptors).join(
+        User, (CardDescriptor.user_id == User.id) & (CardDescriptor.version == version)
+    ).filter(User.card_image.isnot(None))
+    if user_ids is not None:
+        query = query.filter(CardDescriptor.user_id.in_(user_ids))
+    return query.all()
+
+
+#Kart Ön Eleme İndeksi (global tanımlayıcılar, süreç başına bellekte; veritabanından artımlı güncellenir)
+_vocabulary = None
+_card_index = None
+_card_index_synced = None
+_card_index_lock = threading.Lock()
+_card_index_task = None
+
+
+def card_global_vector(vocabulary, descriptor_blob: bytes) -> bytes:
+    """Saklanan ORB tanımlayıcılarından global tanımlayıcı (paketli bit kümesi). Görsel tekrar işlenmez."""
+    descriptors = registry.get("card_matcher").unpack_descriptors(descriptor_blob)
+    return vocabulary.global_descriptor(descriptors).tobytes()
+
+
+def store_card_global_descriptor(db: Session, user_id: int, vocabulary, vector: bytes):
+    """Global tanımlayıcıyı yazar (varsa günceller). Commit çağırana aittir."""
+    record = db.query(CardGlobalDescriptor).filter(CardGlobalDescriptor.user_id == user_id).first()
+    if record is None:
+        record = CardGlobalDescriptor(user_id=user_id)
+        db.add(record)
+    record.vocabulary_id = vocabulary.vocabulary_id
+    record.vector = vector
+
+
+def active_card_vocabulary(db: Session):
+    """
+    Güncel tanımlayıcı sürümüyle eğitilmiş en son sözlük (yoksa None: Giriş tam tarama ile yapılır).
+    Süreç içinde önbelleklenir; başka bir süreç daha yeni sözlük eğittiyse o yüklenir ve indeks sıfırlanır.
+    """
+    global _vocabulary, _card_index, _card_index_synced
+    from ..ai.card_index import BinaryVocabulary
+
+    latest = db.query(CardVocabulary.id).filter(
+        CardVocabulary.feature_version == registry.get("card_matcher").feature_version
+    ).order_by(CardVocabulary.id.desc()).first()
+    if latest is None:
+        return None
+    with _card_index_lock:
+        if _vocabulary is None or _vocabulary.vocabulary_id != latest.id:
+            record = db.query(CardVocabulary).filter(CardVocabulary.id == latest.id).first()
+            words = registry.get("card_matcher").unpack_descriptors(record.words)
+            _vocabulary = BinaryVocabulary(words, vocabulary_id=record.id)
+            _card_index = None
+            _card_index_synced = None
+        return _vocabulary
+
+
+def card_vocabulary_sample(db: Session, max_cards: int = 2000) -> list:
+    """Sözlük eğitimi için kayıtlı kartların tanımlayıcıları (en fazla max_cards kart, user_id sırasında eşit aralıklı)."""
+    matcher = registry.get("card_matcher")
+    user_ids = [row.user_id for row in db.query(CardDescriptor.user_id).filter(
+        CardDescriptor.version == matcher.feature_version, CardDescriptor.keypoint_count > 0
+    ).order_by(CardDescriptor.user_id).all()]
+    sample = user_ids[::max(1, len(user_ids) // max_cards)][:max_cards]
+    return [matcher.unpack_descriptors(blob) for _, _, _, blob in get_card_descriptors(db, sample)]
+
+
+def save_card_vocabulary(db: Session, vocabulary, card_count: int):
+    """Eğitilen sözlüğü kaydeder; en son sözlük aktiftir (eski global tanımlayıcılar tekrar hesaplanır)."""
+    record = CardVocabulary(feature_version=registry.get("card_matcher").feature_version,
+                            words=vocabulary.words.tobytes(), card_count=card_count)
+    db.add(record)
+    db.commit()
+    print(f"✅ Kart sözlüğü eğitildi (#{record.id}, {vocabulary.size} kelime, {card_count} kart)")
+    return active_card_vocabulary(db)
+
+
+def missing_card_global_descriptors(db: Session, vocabulary, limit: int = None) -> list:
+    """Aktif sözlükte global tanımlayıcısı olmayan kartlar: [(user_id, descriptor_blob)]."""
+    query = db.query(CardDescriptor.user_id, CardDescriptor.descriptors).outerjoin(
+        CardGlobalDescriptor, (CardGlobalDescriptor.user_id == CardDescriptor.user_id)
+        & (CardGlobalDescriptor.vocabulary_id == vocabulary.vocabulary_id)
+    ).filter(
+        CardDescriptor.version == registry.get("card_matcher").feature_version, CardGlobalDescriptor.id.is_(None)
+    ).order_by(CardDescriptor.user_id)
+    return (query.limit(limit) if limit else query).all()
+
+
+def sync_card_index(db: Session, vocabulary):
+    """
+    Süreçteki ön eleme indeksini veritabanıyla eşitler: Son eşitlemeden beri eklenen / güncellenen global
+    tanımlayıcılar indekse eklenir (ilk çağrıda hepsi). Silinen kartlar eşleştirme sırasında indeksten çıkarılır.
+    """
+    global _card_index, _card_index_synced
+    from ..ai.card_index import CardShortlistIndex
+
+    with _card_index_lock:
+        if _card_index is None:
+            _card_index = CardShortlistIndex(vocabulary.size)
+        index, since = _card_index, _card_index_synced
+
+    query = db.query(CardGlobalDescriptor.user_id, CardGlobalDescriptor.vector, CardGlobalDescriptor.updated_dt).filter(
+        CardGlobalDescriptor.vocabulary_id == vocabulary.vocabulary_id
+    )
+    if since is not None:
+        # Farklı süreçlerin commit sırası ile zaman damgası sırası aynı olmayabilir: Kısa bir pay bırakılır
+        query = query.filter(CardGlobalDescriptor.updated_dt >= since - timedelta(seconds=CARD_INDEX_SYNC_SLACK))
+    latest = since
+    for user_id, vector, updated_dt in query.yield_per(1000):
+        index.add(user_id, np.frombuffer(vector, dtype=np.uint8))
+        latest = updated_dt if latest is None or updated_dt > latest else latest
+
+    with _card_index_lock:
+        if _card_index is index:
+            _card_index_synced = latest
+    return index
+
+
+async def build_card_index():
+    """
+    Arka plan işi: Sözlük yoksa kayıtlı kartlardan eğitilir, global tanımlayıcısı eksik kartlar hesaplanır.
+    Kendi oturumunu kullanır; ağır işler inference havuzunda çalışır. Süreç başına aynı anda tek iş.
+    """
+    from ..ai.card_index import BinaryVocabulary
+
+    db = SessionLocal()
+    try:
+        vocabulary = active_card_vocabulary(db)
+        if vocabulary is None:
+            descriptor_sets = card_vocabulary_sample(db)
+            print(f"⏳ Kart sözlüğü {len(descriptor_sets)} karttan eğitiliyor (giriş bu sırada tam tarama ile)")
+            vocabulary = save_card_vocabulary(db, await run_inference(BinaryVocabulary.train, descriptor_sets),
+                                              len(descriptor_sets))
+        processed = 0
+        while True:
+            missing = missing_card_global_descriptors(db, vocabulary, limit=100)
+            if not missing:
+                break
+            for user_id, descriptor_blob in missing:
+                store_card_global_descriptor(db, user_id, vocabulary,
+                                             await run_inference(card_global_vector, vocabulary, descriptor_blob))
+            db.commit()
+            processed += len(missing)
+        if processed:
+            print(f"✅ {processed} kartın global tanımlayıcısı hesaplandı")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Kart ön eleme indeksi hazırlanamadı: {str(e)}")
+    finally:
+        db.close()
+
+
+def start_card_index_build():
+    """build_card_index zaten çalışmıyorsa başlatır."""
+    global _card_index_task
+    if _card_index_task is None or _card_index_task.done():
+        _card_index_task = asyncio.create_task(build_card_index())
+
+
+async def card_candidates(db: Session, query_descriptors, k: int = None):
+    """
+    Yüklenen kart için ön eleme adayları (user_id listesi). İndeks hazır değilse None (tam tarama).
+    Kayıtlı kart sayısı CARD_VOCABULARY_MIN_CARDS'a ulaşınca sözlük arka planda bir kez eğitilir (dakikalar sürebilir).
+    Global tanımlayıcısı eksik kartlar (sözlükten önce kaydolanlar) az ise girişte, çok ise arka planda hesaplanır;
+    eksikler bitene kadar ön eleme yapılmaz (eksik kart aday olamayacağı için yanlış ret olurdu).
+    """
+    from ..ai.card_index import CARD_SHORTLIST_K, CARD_VOCABULARY_MIN_CARDS
+
+    vocabulary = active_card_vocabulary(db)
+    if vocabulary is None:
+        card_count = db.query(CardDescriptor).filter(
+            CardDescriptor.version == registry.get("card_matcher").feature_version
+        ).count()
+        if card_count >= CARD_VOCABULARY_MIN_CARDS:
+            start_card_index_build()
+        return None
+
+    missing = missing_card_global_descriptors(db, vocabulary, limit=CARD_GLOBAL_INLINE_LIMIT + 1)
+    if len(missing) > CARD_GLOBAL_INLINE_LIMIT:
+        start_card_index_build()
+        return None
+    for user_id, descriptor_blob in missing:
+        store_card_global_descriptor(db, user_id, vocabulary,
+                                     await run_inference(card_global_vector, vocabulary, descriptor_blob))
+    if missing:
+        db.commit()
+
+    index = sync_card_index(db, vocabulary)
+    query_vector = await run_inference(vocabulary.global_descriptor, query_descriptors)
+    return [user_id for user_id, _ in index.search(query_vector, k or CARD_SHORTLIST_K)]
+
+
+async def forget_card_candidates(user_ids: list):
+    """
+    Veritabanında artık olmayan adaylar (başka süreçte silinen kullanıcılar) indekslerden ve eşleştirme havuzundan çıkarılır.
+    Havuzdan çıkarma shard süreçlerini bekler (ve dengeleme yapabilir), thread'de çalışır.
+    """
+    for index in (_card_index, _vote_index):
+        if index is not None:
+            for user_id in user_ids:
+                index.remove(user_id)
+    if _match_pool is not None:
+        await asyncio.to_thread(_match_pool.remove, list(user_ids))
+
+
+#Kart Oylama İndeksi (CARD_MATCH_MODE=vote; tüm kartların tanımlayıcıları süreç başına tek LSH indekste)
+_vote_index = None
+_vote_index_synced = None
+_vote_sync_lock = threading.Lock()
+
+
+def sync_card_vote_index(db: Session):
+    """
+    Süreçteki oylama indeksini veritabanıyla eşitler (sync_card_index ile aynı artımlı yöntem).
+    Eski sürümlü veya boş tanımlayıcılı kartlar indeksten çıkarılır.
+    İlk çağrıda bütün tanımlayıcılar okunur; event loop'u bloklamaması için thread'de çalışır (card_vote_candidates).
+    Eşzamanlı çağrılar sırayla çalışır, ikincisi sadece aradaki değişiklikleri okur.
+    """
+    with _vote_sync_lock:
+        return _sync_card_vote_index(db)
+
+
+def _sync_card_vote_index(db: Session):
+    global _vote_index, _vote_index_synced
+    from ..ai.card_vote_index import CardVoteIndex
+
+    matcher = registry.get("card_matcher")
+    with _card_index_lock:
+        if _vote_index is None:
+            _vote_index = CardVoteIndex()
+        index, since = _vote_index, _vote_index_synced
+
+    query = db.query(CardDescriptor.user_id, CardDescriptor.version, CardDescriptor.descriptors, CardDescriptor.updated_dt)
+    if since is not None:
+        query = query.filter(CardDescriptor.updated_dt >= since - timedelta(seconds=CARD_INDEX_SYNC_SLACK))
+    latest = since
+    for user_id, version, descriptor_blob, updated_dt in query.yield_per(1000):
+        if version == matcher.feature_version:
+            index.add(user_id, matcher.unpack_descriptors(descriptor_blob))
+        else:
+            index.remove(user_id)
+        latest = updated_dt if latest is None or updated_dt > latest else latest
+
+    with _card_index_lock:
+        if _vote_index is index:
+            _vote_index_synced = latest
+    return index
+
+
+def _sync_card_vote_index_in_thread():
+    """sync_card_vote_index'i kendi oturumuyla çalıştırır (istek oturumu başka thread'e geçmez)."""
+    db = SessionLocal()
+    try:
+        return sync_card_vote_index(db)
+    finally:
+        db.close()
+
+
+async def card_vote_candidates(db: Session, query_descriptors, k: int = None):
+    """
+    Yüklenen kart için en çok oy alan kullanıcılar (user_id listesi, 1:1 doğrulamaya gider). Kayıtlı kart yoksa None.
+    Veritabanı eşitlemesi thread'de (ilk çağrıda tüm tanımlayıcılar okunur, inference havuzunda slot tutmaz),
+    LSH indeks kurulumu (ilk çağrıda ve çok sayıda kart değiştiğinde) ve arama inference havuzunda çalışır.
+    """
+    from ..ai.card_vote_index import CARD_VOTE_VERIFY
+
+    index = await asyncio.to_thread(_sync_card_vote_index_in_thread)
+    if len(index) == 0:
+        return None
+    ranked = await run_inference(index.search, query_descriptors, k or CARD_VOTE_VERIFY)
+    return [user_id for user_id, _ in ranked]
+
+
+#Kart Eşleştirme Havuzu (CARD_MATCH_WORKERS>0; tam taramada kartlar süreçlere bölünür, her süreç kendi payını bellekte tutar)
+_match_pool = None
+_match_pool_synced = None
+_match_pool_generation = None
+_match_sync_lock = threading.Lock()
+
+
+def sync_card_match_pool(db: Session):
+    """
+    Eşleştirme havuzunu veritabanıyla eşitler (sync_card_index ile aynı artımlı yöntem): Değişen kartlar shard
+    süreçlerine gönderilir, eski sürümlü veya boş tanımlayıcılı kartlar çıkarılır. CARD_MATCH_WORKERS=0 ise None.
+    Bir shard yeniden başlatıldıysa (havuzun generation'ı değiştiyse) bütün kartlar tekrar okunur; yüklü olanlar
+    zaman damgasıyla atlanır, sadece ölen shard'ın kartları gönderilir.
+    Shard süreçlerini beklediği için bloklar: Event loop'tan synced_card_match_pool ile çağrılır.
+    """
+    with _match_sync_lock:
+        return _sync_card_match_pool(db)
+
+
+def _sync_card_match_pool(db: Session):
+    global _match_pool, _match_pool_synced, _match_pool_generation
+    from ..ai.card_match_pool import get_card_match_pool
+
+    pool = get_card_match_pool()
+    if pool is None:
+        return None
+    with _card_index_lock:
+        if _match_pool is not pool or _match_pool_generation != pool.generation:
+            _match_pool, _match_pool_synced, _match_pool_generation = pool, None, pool.generation
+        since, generation = _match_pool_synced, _match_pool_generation
+
+    query = db.query(CardDescriptor.user_id, CardDescriptor.version, CardDescriptor.keypoint_count,
+                     CardDescriptor.keypoints, CardDescriptor.descriptors, CardDescriptor.updated_dt)
+    if since is not None:
+        query = query.filter(CardDescriptor.updated_dt >= since - timedelta(seconds=CARD_INDEX_SYNC_SLACK))
+    version = registry.get("card_matcher").feature_version
+    latest = since
+    cards, stamps, removed = [], [], []
+    for user_id, card_version, keypoint_count, keypoints, descriptor_blob, updated_dt in query.yield_per(1000):
+        if card_version == version and descriptor_blob:
+            cards.append((user_id, keypoint_count, keypoints, descriptor_blob))
+            stamps.append(updated_dt)
+        elif user_id in pool:
+            removed.append(user_id)
+        latest = updated_dt if latest is None or updated_dt > latest else latest
+        if len(cards) >= 1000:
+            pool.add(cards, stamps)
+            cards, stamps = [], []
+    pool.add(cards, stamps)
+    if removed:
+        pool.remove(removed)
+
+    with _card_index_lock:
+        # Eşitleme sırasında shard yeniden başlatıldıysa ilerleme kaydedilmez (sonraki çağrı hepsini tekrar okur)
+        if _match_pool is pool and pool.generation == generation:
+            _match_pool_synced = latest
+    return pool
+
+
+def _sync_card_match_pool_in_thread():
+    """sync_card_match_pool'u kendi oturumuyla çalıştırır (istek oturumu başka thread'e geçmez)."""
+    db = SessionLocal()
+    try:
+        return sync_card_match_pool(db)
+    finally:
+        db.close()
+
+
+async def synced_card_match_pool():
+    """
+    Eşitlenmiş eşleştirme havuzu (CARD_MATCH_WORKERS=0 ise None). Havuz henüz başlatılmadıysa başlatma (spawn + warm-up),
+    ilk çağrıda bütün kartların yüklenmesi ve shard'ların beklenmesi event loop dışında (thread'de) yapılır.
+    """
+    return await asyncio.to_thread(_sync_card_match_pool_in_thread)
@@ -6,22 +6,159 @@ from fastapi import APIRouter, Depends, status, HTTPException, File, UploadFile,
 from fastapi.security import OAuth2PasswordRequestForm 
 from sqlalchemy.orm import Session
 from datetime import datetime, date
+import os
 import base64
 import io
-from PIL import Image
+import time
+import asyncio
 from typing import Optional
 
 from .schemas import UserCreate, UserUpdate, User as UserSchema
 from .enums import Gender
 from ..database import get_db
-from .service import existing_user, create_access_token, get_current_user, create_user as create_user_service, authenticate, update_user as update_user_service, delete_user as delete_user_service
-from ..ai.card_reader import SpatialCardReader
-from ..ai.card_matcher import CardMatcher
+from .service import existing_user, create_access_token, get_current_user, create_user as create_user_service, authenticate, update_user as update_user_service, delete_user as delete_user_service, fill_missing_card_descriptors, get_card_descriptors, card_candidates, card_vote_candidates, forget_card_candidates, synced_card_match_pool
+from ..ai.model_registry import registry, require_ai, AIUnavailable
+from ..ai.executors import run_inference, run_image, ExecutorOverloaded
+from ..ai.image_ingest import open_image
+from ..ai.moderation_batcher import get_image_batcher
+from ..ai.moderation_pipeline import image_violation
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+CARD_BATCH_MAX = int(os.getenv("CARD_BATCH_MAX", "16"))  # /read-cards ile tek istekte okunabilecek maksimum kart
+
+
+def _decode_image(contents: bytes):
+    """
+    Görseli tam çözünürlükte açar (EXIF yönü uygulanır) ve RGB'ye çevirir. image havuzunda çalışır.
+    Kart okuyucunun eşikleri (satır birleştirme, alan aralıkları) piksel cinsinden olduğu için küçültülmüş decode yapılmaz.
+    """
+    image, _ = open_image(contents, max_side=0)
+    return image
+
+
+def _decode_data_uri(data_uri: str):
+    """Signup'ta gelen base64 (data URI) görseli açar. image havuzunda çalışır."""
+    return _decode_image(base64.b64decode(data_uri.split(",", 1)[1] if data_uri.startswith("data:") else data_uri))
+
+
+def _clip_pixels(image):
+    """Görseli CLIP girişine çevirir (model havuz dışında yüklenmiş olmalı). image havuzunda çalışır."""
+    return registry.get("content_moderator").preprocess(image)
+
+
+async def _moderate_upload(image, policy: str):
+    """
+    Profil fotoğrafı / kart görselini kendi politikasıyla (moderation_policy.py: profile | card) denetler.
+    Gönderilerle aynı batcher ve forward pass kullanılır; karar sonucun 'policies' alanından okunur.
+    İhlalde gönderilerle aynı 451 hatası, batcher kuyruğu doluysa gönderilerle aynı 503 + Retry-After döner.
+    """
+    await registry.ensure_loaded("content_moderator")
+    pixels = await run_image(_clip_pixels, image)
+    batcher = get_image_batcher()
+    try:
+        result = await batcher.submit(pixels)
+    except asyncio.QueueFull:
+        raise ExecutorOverloaded(batcher.name) from None
+    verdict = result["policies"][policy]
+    if not verdict["is_shareable"]:
+        raise image_violation(verdict)
+
+
+def _jpeg_base64(image) -> str:
+    """Görseli JPEG olarak kodlayıp base64 string döner. image havuzunda çalışır."""
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG")
+    return base64.b64encode(buffered.getvalue()).decode('utf-8')
+
+
+def _analyze_card(image):
+    """Kart okuyucuyu alır (süreç başına bir kez yüklenir) ve kartı analiz eder. inference havuzunda çalışır."""
+    return registry.get("card_reader").analyze_card(image)
+
+
+def _analyze_cards(images: list):
+    """Birden fazla kartı tek batch'te analiz eder (yüz tespiti batch halinde, OCR ile paralel). inference havuzunda çalışır."""
+    return registry.get("card_reader").analyze_cards(images)
+
+
+def _extract_card_features(image):
+    """Yüklenen kartın ORB özelliklerini çıkarır. inference havuzunda çalışır. Dönüş: (keypoint dizisi (n, 6), tanımlayıcılar)"""
+    matcher = registry.get("card_matcher")
+    keypoints, descriptors = matcher.extract_features(image)
+    return matcher.keypoint_array(keypoints), descriptors
+
+
+def _find_best_card_match(uploaded_features: tuple, card_descriptors: list, min_confidence: float):
+    """
+    Yüklenen kartı kayıtlı kartlarla aşamalı doğrular (ucuz sıralama -> en iyi birkaç adayda RANSAC -> erken kabul).
+    inference havuzunda çalışır. Dönüş: CardMatcher.verify_candidates sonucu
+    """
+    # CardMatcher (ORB daha hızlı)
+    matcher = registry.get("card_matcher")
+    points, descriptors = uploaded_features
+    candidates = [
+        (user_id, stored_keypoint_count, matcher.unpack_keypoints(stored_keypoints), matcher.unpack_descriptors(stored_descriptors))
+        for user_id, stored_keypoint_count, stored_keypoints, stored_descriptors in card_descriptors
+    ]
+    return matcher.verify_candidates(points, descriptors, candidates, min_confidence)
+
+async def _card_payload(card_data: dict, image) -> dict:
+    """Kart analiz sonucunu frontend'e gönderilecek temiz veriye çevirir (görseller base64, tarih ISO 8601)."""
+    parsed = card_data.get("parsed_data", {})
+    
+    # Profil fotoğrafını base64'e çevir
+    profile_pic_base64 = None
+    if card_data.get("face_found") and card_data.get("face_image"):
+        face_base64 = await run_image(_jpeg_base64, card_data["face_image"])
+        profile_pic_base64 = f"data:image/jpeg;base64,{face_base64}"
+    
+    # Orijinal kart görselini base64'e çevir
+    card_image_base64 = None
+    card_base64 = await run_image(_jpeg_base64, image)
+    card_image_base64 = f"data:image/jpeg;base64,{card_base64}"
+    
+    # Doğum tarihini ISO 8601 formatına çevir (YYYY-MM-DD)
+    birth_date_iso = ""
+    if parsed.get("Dogum_Tarihi"):
+        try:
+            from datetime import datetime as dt
+            date_str = parsed["Dogum_Tarihi"].strip()
+            # Farklı formatları dene
+            for fmt in ["%d/%m/%Y", "%d.%m.%Y", "%d-%m-%Y", "%Y-%m-%d"]:
+                try:
+                    parsed_date = dt.strptime(date_str, fmt)
+                    birth_date_iso = parsed_date.strftime("%Y-%m-%d")
+                    break
+                except:
+                    continue
+        except:
+            pass
+    
+    # Cinsiyeti male/female/other formatına çevir
+    gender_formatted = None
+    if parsed.get("Cinsiyet"):
+        gender_map = {"E": "male", "K": "female", "ERKEK": "male", "KADIN": "female", "M": "male", "F": "female"}
+        gender_text = parsed["Cinsiyet"].upper()
+        gender_formatted = gender_map.get(gender_text, "other")
+
+    # Frontend'e gönderilecek temiz veri
+    return {
+        "name": parsed.get("Isim_Soyisim", ""),
+        "email": parsed.get("Email", ""),
+        "company": parsed.get("Sirket", ""),
+        "title": parsed.get("Unvan", ""),
+        "id_number": parsed.get("ID_Sicil", ""),
+        "location": parsed.get("Konum", ""),
+        "birthDate": birth_date_iso,  # Format: YYYY-MM-DD (ISO 8601)
+        "gender": gender_formatted,  # male veya female
+        "profile_pic": profile_pic_base64,
+        "card_image": card_image_base64,  # Orijinal kart görseli
+        "face_found": card_data.get("face_found", False)
+    }
+
 #CARD READER ENDPOINT (Kart okuma - sadece veri çıkarma)
-@router.post("/read-card", status_code=status.HTTP_200_OK)
+@router.post("/read-card", status_code=status.HTTP_200_OK, dependencies=[Depends(require_ai)])
 async def read_card(card_image: UploadFile = File(...)):
     """
     Kart görselini okur ve çıkarılan verileri döner.
@@ -30,15 +167,11 @@ async def read_card(card_image: UploadFile = File(...)):
     try:
         # Dosyayı oku
         contents = await card_image.read()
-        image = Image.open(io.BytesIO(contents))
-        
-        # Görseli RGB'ye çevir
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+        image = await run_image(_decode_image, contents)
         
-        # Kart okuyucu başlat ve analiz et
-        reader = SpatialCardReader()
-        card_data = reader.analyze_card(image)
+        # Kart analizi (OCR + yüz tespiti) inference havuzunda çalışır
+        await registry.ensure_loaded("card_reader")
+        card_data = await run_inference(_analyze_card, image)
         
         if card_data.get("error"):
             raise HTTPException(
@@ -46,66 +179,68 @@ async def read_card(card_image: UploadFile = File(...)):
                 detail=f"Kart okuma hatası: {card_data['error']}"
             )
         
-        parsed = card_data.get("parsed_data", {})
-        
-        # Profil fotoğrafını base64'e çevir
-        profile_pic_base64 = None
-        if card_data.get("face_found") and card_data.get("face_image"):
-            buffered = io.BytesIO()
-            card_data["face_image"].save(buffered, format="JPEG")
-            face_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
-            profile_pic_base64 = f"data:image/jpeg;base64,{face_base64}"
-        
-        # Orijinal kart görselini base64'e çevir
-        card_image_base64 = None
-        buffered_card = io.BytesIO()
-        image.save(buffered_card, format="JPEG")
-        card_base64 = base64.b64encode(buffered_card.getvalue()).decode('utf-8')
-        card_image_base64 = f"data:image/jpeg;base64,{card_base64}"
-        
-        # Doğum tarihini ISO 8601 formatına çevir (YYYY-MM-DD)
-        birth_date_iso = ""
-        if parsed.get("Dogum_Tarihi"):
-            try:
-                from datetime import datetime as dt
-                date_str = parsed["Dogum_Tarihi"].strip()
-                # Farklı formatları dene
-                for fmt in ["%d/%m/%Y", "%d.%m.%Y", "%d-%m-%Y", "%Y-%m-%d"]:
-                    try:
-                        parsed_date = dt.strptime(date_str, fmt)
-                        birth_date_iso = parsed_date.strftime("%Y-%m-%d")
-                        break
-                    except:
-                        continue
-            except:
-                pass
-        
-        # Cinsiyeti male/female/other formatına çevir
-        gender_formatted = None
-        if parsed.get("Cinsiyet"):
-            gender_map = {"E": "male", "K": "female", "ERKEK": "male", "KADIN": "female", "M": "male", "F": "female"}
-            gender_text = parsed["Cinsiyet"].upper()
-            gender_formatted = gender_map.get(gender_text, "other")
-        
         # Frontend'e gönderilecek temiz veri
         return {
             "success": True,
-            "card_data": {
-                "name": parsed.get("Isim_Soyisim", ""),
-                "email": parsed.get("Email", ""),
-                "company": parsed.get("Sirket", ""),
-                "title": parsed.get("Unvan", ""),
-                "id_number": parsed.get("ID_Sicil", ""),
-                "location": parsed.get("Konum", ""),
-                "birthDate": birth_date_iso,  # Format: YYYY-MM-DD (ISO 8601)
-                "gender": gender_formatted,  # male veya female
-                "profile_pic": profile_pic_base64,
-                "card_image": card_image_base64,  # Orijinal kart görseli
-                "face_found": card_data.get("face_found", False)
-            },
+            "card_data": await _card_payload(card_data, image),
             "message": "Kart başarıyla okundu. Lütfen bilgileri kontrol edip düzenleyin."
         }
     
+    except ExecutorOverloaded:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Kart işleme hatası: {str(e)}"
+        )
+
+#BATCH CARD READER (Toplu kayıt için birden fazla kartı tek istekte okuma)
+@router.post("/read-cards", status_code=status.HTTP_200_OK, dependencies=[Depends(require_ai)])
+async def read_cards(card_images: list[UploadFile] = File(...)):
+    """
+    Birden fazla kart görselini tek istekte okur. Sonuçlar yükleme sırasıyla döner;
+    okunamayan kart tüm isteği bozmaz, kendi sonucunda hata mesajı ile döner.
+    """
+    if len(card_images) > CARD_BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tek istekte en fazla {CARD_BATCH_MAX} kart okunabilir."
+        )
+
+    try:
+        images, errors = [], []
+        for card_image in card_images:
+            contents = await card_image.read()
+            try:
+                images.append(await run_image(_decode_image, contents))
+                errors.append(None)
+            except ExecutorOverloaded:
+                raise
+            except Exception as e:
+                images.append(None)
+                errors.append(f"Görsel açılamadı: {str(e)}")
+
+        valid = [image for image in images if image is not None]
+        await registry.ensure_loaded("card_reader")
+        analyzed = iter(await run_inference(_analyze_cards, valid) if valid else [])
+
+        results = []
+        for image, error in zip(images, errors):
+            card_data = next(analyzed) if image is not None else None
+            if card_data is not None and card_data.get("error"):
+                error = f"Kart okuma hatası: {card_data['error']}"
+            if error:
+                results.append({"success": False, "detail": error})
+            else:
+                results.append({"success": True, "card_data": await _card_payload(card_data, image)})
+
+        return {
+            "results": results,
+            "message": f"{sum(r['success'] for r in results)}/{len(results)} kart başarıyla okundu."
+        }
+
+    except ExecutorOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -123,6 +258,20 @@ async def create_user(user: UserCreate, db: Session = Depends(get_db)):
             detail="Kullanıcı adı veya e-mail zaten kullanımda."
         )
     
+    # Kart ve profil fotoğrafı kayıttan önce kendi politikalarıyla denetlenir
+    for data_uri, policy in ((user.card_image, "card"), (user.profile_pic, "profile")):
+        if data_uri:
+            try:
+                image = await run_image(_decode_data_uri, data_uri)
+            except ExecutorOverloaded:
+                raise
+            except Exception as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Görsel açılamadı: {str(e)}"
+                )
+            await _moderate_upload(image, policy)
+
     # Kullanıcı oluştur
     db_user = await create_user_service(db, user)
     access_token = await create_access_token(user.username, db_user.id)
@@ -149,56 +298,78 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     }
 
 #LOGIN WITH CARD (Kart eşleştirme ile giriş)
-@router.post("/login-with-card", status_code=status.HTTP_200_OK)
+@router.post("/login-with-card", status_code=status.HTTP_200_OK, dependencies=[Depends(require_ai)])
 async def login_with_card(card_image: UploadFile = File(...), db: Session = Depends(get_db)):
     """
     Kart görseli yükleyerek giriş yapma.
-    Yüklenen kart, veritabanındaki tüm kullanıcıların kartlarıyla eşleştirilir.
-    Eşleşme bulunursa token döner.
+    Yüklenen kart önce adaylara indirgenir, adaylar aşamalı doğrulanır (CardMatcher.verify_candidates):
+    - CARD_MATCH_MODE=shortlist: Global tanımlayıcı ile ön eleme (kart sayısı CARD_VOCABULARY_MIN_CARDS altındaysa yapılmaz)
+    - CARD_MATCH_MODE=vote: Tüm kartların tanımlayıcıları tek LSH indekste, en çok oy alan kullanıcılar
+    Ön eleme yapılamıyorsa (tam tarama) ve CARD_MATCH_WORKERS>0 ise kartlar süreç havuzunda paralel eşleştirilir.
+    Eşleşme bulunursa token döner; "match" alanında inlier oranı ve aşama süreleri raporlanır.
     """
     try:
         # Dosyayı oku
         contents = await card_image.read()
-        uploaded_image = Image.open(io.BytesIO(contents))
+        uploaded_image = await run_image(_decode_image, contents)
         
-        # Görseli RGB'ye çevir
-        if uploaded_image.mode != 'RGB':
-            uploaded_image = uploaded_image.convert('RGB')
+        # Model havuz dışında yüklenir (aşağıdaki servis fonksiyonları da card_matcher kullanır)
+        await registry.ensure_loaded("card_matcher")
         
-        # Yüklenen kartı base64'e çevir
-        buffered = io.BytesIO()
-        uploaded_image.save(buffered, format="JPEG")
-        uploaded_card_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
+        # Kayıtlı kartların önceden hesaplanmış tanımlayıcıları (kart görselleri tekrar decode edilmez)
+        await fill_missing_card_descriptors(db)
         
-        # CardMatcher başlat
-        matcher = CardMatcher(algorithm="orb")  # ORB daha hızlı
+        # Yüklenen kartın özellikleri bir kez çıkarılır
+        points, descriptors = await run_inference(_extract_card_features, uploaded_image)
         
-        # Veritabanındaki tüm kullanıcıları al (card_image olan)
-        from .models import User
-        users_with_cards = db.query(User).filter(User.card_image.isnot(None)).all()
+        # 1. aşama: Top-k aday (None = tüm kartlar)
+        from ..ai.card_vote_index import CARD_MATCH_MODE
+        candidates = None
+        start = time.perf_counter()
+        if descriptors is not None:
+            find_candidates = card_vote_candidates if CARD_MATCH_MODE == "vote" else card_candidates
+            candidates = await find_candidates(db, descriptors)
+        candidate_ms = round((time.perf_counter() - start) * 1000, 2)
         
-        if not users_with_cards:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Sistemde kayıtlı kartlı kullanıcı bulunamadı."
-            )
-        
-        # Her kullanıcının kartıyla eşleştir
-        best_match = None
-        best_confidence = 0
-        best_match_details = None
+        MINIMUM_CONFIDENCE = 60  # %60 minimum güven skoru
         
-        for user in users_with_cards:
-            result = matcher.match_cards(uploaded_card_base64, user.card_image)
+        # Tam taramada kartlar shard süreçlerinde sıcak tutulur (CARD_MATCH_WORKERS=0 ise None)
+        pool = await synced_card_match_pool() if candidates is None and descriptors is not None else None
+        if pool:
+            # 2. aşama: Sorgu tüm shard'lara yayınlanır, her shard aşamalı doğrulama yapar, en iyi sonuç seçilir
+            outcome = await pool.search(points, descriptors, MINIMUM_CONFIDENCE)
+            card_count = len(pool)
+        else:
+            card_descriptors = get_card_descriptors(db, candidates)
+            if candidates:
+                await forget_card_candidates(set(candidates) - {row.user_id for row in card_descriptors})
             
-            if result.get("is_match") and result.get("confidence", 0) > best_confidence:
-                best_match = user
-                best_confidence = result.get("confidence", 0)
-                best_match_details = result
+            # Aday listesi boşsa (hiç oy yok) eşleşme yoktur; kartlı kullanıcı yoksa 404
+            if not card_descriptors and candidates is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Sistemde kayıtlı kartlı kullanıcı bulunamadı."
+                )
+            
+            # 2. aşama: Aşamalı doğrulama - ucuz sıralama, en iyi adaylarda RANSAC, erken kabul (inference havuzunda)
+            outcome = await run_inference(_find_best_card_match, (points, descriptors), card_descriptors, MINIMUM_CONFIDENCE)
+            card_count = len(card_descriptors)
+        best_user_id, best_confidence, details = outcome["user_id"], outcome["confidence"], outcome["details"] or {}
+        match_info = {
+            "inliers": details.get("inliers", 0),
+            "inlier_ratio": details.get("inlier_ratio", 0.0),
+            "early_accept": outcome["early_accept"],
+            "candidates": card_count,
+            "verified": outcome["verified"],
+            "timings": {"candidate_ms": candidate_ms, **outcome["timings"]}
+        }
         
-        # Eşleşme bulunamadıysa veya güven skoru düşükse
-        MINIMUM_CONFIDENCE = 60  # %60 minimum güven skoru
+        from .models import User
+        best_match = db.query(User).filter(User.id == best_user_id).first() if best_user_id else None
+        if pool and best_user_id and not best_match:
+            await forget_card_candidates([best_user_id])  # Başka süreçte silinen kullanıcı havuzdan çıkarılır
         
+        # Eşleşme bulunamadıysa veya güven skoru düşükse
         if not best_match or best_confidence < MINIMUM_CONFIDENCE:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -206,6 +377,7 @@ async def login_with_card(card_image: UploadFile = File(...), db: Session = Depe
                     "message": "Kart eşleşmesi bulunamadı veya güven skoru yetersiz.",
                     "best_confidence": best_confidence if best_match else 0,
                     "minimum_required": MINIMUM_CONFIDENCE,
+                    "match": match_info,
                     "suggestion": "Lütfen kartı daha net çekin veya kullanıcı adı ve şifre ile giriş yapın."
                 }
             )
@@ -218,10 +390,11 @@ async def login_with_card(card_image: UploadFile = File(...), db: Session = Depe
             "token_type": "bearer",
             "username": best_match.username,
             "match_confidence": best_confidence,
+            "match": match_info,
             "message": "Kart eşleşmesi başarılı! Hoşgeldiniz."
         }
     
-    except HTTPException:
+    except (HTTPException, ExecutorOverloaded):
         raise
     except Exception as e:
         raise HTTPException(
@@ -300,15 +473,12 @@ async def update_user(
     if profile_pic_file:
         try:
             contents = await profile_pic_file.read()
-            image = Image.open(io.BytesIO(contents))
-            
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            buffered = io.BytesIO()
-            image.save(buffered, format="JPEG")
-            profile_pic_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
+            image = await run_image(_decode_image, contents)
+            await _moderate_upload(image, "profile")
+            profile_pic_base64 = await run_image(_jpeg_base64, image)
             user_update_data.profile_pic = f"data:image/jpeg;base64,{profile_pic_base64}"
+        except (ExecutorOverloaded, AIUnavailable, HTTPException):
+            raise
         except Exception as e:
             print(f"Profil fotoğrafı yükleme hatası: {str(e)}")
     
@@ -316,15 +486,12 @@ async def update_user(
     if card_image_file:
         try:
             contents = await card_image_file.read()
-            image = Image.open(io.BytesIO(contents))
-            
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            buffered = io.BytesIO()
-            image.save(buffered, format="JPEG")
-            card_image_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
+            image = await run_image(_decode_image, contents)
+            await _moderate_upload(image, "card")
+            card_image_base64 = await run_image(_jpeg_base64, image)
             user_update_data.card_image = f"data:image/jpeg;base64,{card_image_base64}"
+        except (ExecutorOverloaded, AIUnavailable, HTTPException):
+            raise
         except Exception as e:
             print(f"Kart görseli yükleme hatası: {str(e)}")
     
@@ -1,18 +1,56 @@
 #Main APP
 
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from .database import Base, engine #Kendi yazdığımız database dosyasından Base ve engine değişkenlerini aldık.
 from .api import router
+from .ai.model_registry import registry, MODEL_PRELOAD, AI_MODE, AIUnavailable
+from .ai.moderation_batcher import active_batchers
+from .ai.executors import ExecutorOverloaded, shutdown_executors
+from .ai.card_match_pool import get_card_match_pool, shutdown_card_match_pool, CARD_MATCH_WORKERS
+from .moderation.worker import moderation_workers, MODERATION_MODE
 
 Base.metadata.create_all(bind = engine)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    preload_task = None
+    card_pool_task = None
+    if AI_MODE == "lite":
+        print("ℹ️ AI_MODE=lite: Modeller yüklenmeyecek, AI endpoint'leri 503 dönecek")
+    elif MODEL_PRELOAD == "eager":
+        # Modeller arka planda yüklenir, /v1/moderation/ready yükleme bitince 200 döner.
+        # Yükleme event loop'u bloklamasın diye ayrı thread'de yapılır, sunucu bu sırada istek kabul eder
+        preload_task = asyncio.create_task(asyncio.to_thread(registry.load_all))
+    if MODERATION_MODE == "deferred" and AI_MODE != "lite":
+        # Bekleyen (önceki çalışmadan kalanlar dahil) moderasyon işleri arka planda işlenir
+        # (lite modda işler AI'lı bir sunucunun worker'larını bekler)
+        moderation_workers.start()
+    if CARD_MATCH_WORKERS > 0 and AI_MODE != "lite":
+        # Kart eşleştirme shard süreçleri açılışta başlatılır (spawn + warm-up ilk kartla girişte beklenmesin)
+        card_pool_task = asyncio.create_task(asyncio.to_thread(get_card_match_pool))
+    yield
+    await moderation_workers.stop()
+    if preload_task and not preload_task.done():
+        preload_task.cancel()
+    if card_pool_task and not card_pool_task.done():
+        card_pool_task.cancel()
+    for batcher in active_batchers():
+        await batcher.close()
+    shutdown_executors()
+    shutdown_card_match_pool()
+
 
 app = FastAPI(
     title="Social Media APP",
     description="Protect Social Media APP",
-    version="0.1"
+    version="0.1",
+    lifespan=lifespan
 )
 
 # CORS Middleware - Frontend ile backend arasındaki iletişim için
@@ -24,4 +62,24 @@ app.add_middleware(
     allow_headers=["*"],  # Tüm headerlar
 )
 
+
+# CPU havuzları doluysa istek beklemeye alınmaz, istemci tekrar denemeye yönlendirilir (back-pressure)
+@app.exception_handler(ExecutorOverloaded)
+async def executor_overloaded_handler(request: Request, exc: ExecutorOverloaded):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Sunucu şu anda çok yoğun. Lütfen birkaç saniye sonra tekrar deneyin."},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+# Lite modda (AI_MODE=lite) AI gerektiren istekler
+@app.exception_handler(AIUnavailable)
+async def ai_unavailable_handler(request: Request, exc: AIUnavailable):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Bu özellik (yapay zeka) bu sunucuda kullanılamıyor. Lütfen daha sonra tekrar deneyin.", "ai_mode": AI_MODE}
+    )
+
+
 app.include_router(router)
\ No newline at end of file
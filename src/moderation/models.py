@@ -0,0 +1,60 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, ForeignKey
+from datetime import datetime
+
+from ..database import Base
+
+
+class ImageAnalysisRecord(Base):
+    """Görsel analiz önbelleğinin kalıcı kopyası (SHA-256 + dHash ile adreslenir)."""
+    __tablename__ = "image_analysis_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), nullable=False, index=True)
+    version = Column(String(32), nullable=False, index=True) #Model + etiket seti özeti
+    dhash = Column(BigInteger, nullable=False) #64 bit (işaretli olarak saklanır)
+
+    #Benzer görsel araması için dHash bantları
+    band0 = Column(Integer, index=True)
+    band1 = Column(Integer, index=True)
+    band2 = Column(Integer, index=True)
+    band3 = Column(Integer, index=True)
+
+    analysis = Column(Text, nullable=False) #analyze_image sonucu (JSON)
+    ocr_text = Column(Text) #None = OCR çalıştırılmadı
+    ocr_moderation = Column(Text) #OCR metninin moderasyon sonucu (JSON)
+
+    created_dt = Column(DateTime, default=datetime.utcnow)
+
+
+class TextModerationRecord(Base):
+    """Metin moderasyon önbelleğinin kalıcı kopyası (model kimliği + normalize edilmiş metin özeti)."""
+    __tablename__ = "text_moderation_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(64), nullable=False, unique=True, index=True) #text_key() sonucu
+    model_id = Column(String(128), nullable=False, index=True)
+    result = Column(Text, nullable=False) #analyze_text sonucu (JSON)
+
+    created_dt = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class ModerationJob(Base):
+    """
+    Ertelenmiş (deferred) moderasyon işi. Gönderi başına bir kayıt; kalıcı iş kuyruğu olarak da kullanılır.
+    status: queued -> running -> approved | rejected | failed
+    queued/running durumundaki gönderiler sadece yazarına görünür.
+    """
+    __tablename__ = "moderation_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), unique=True, index=True)
+    status = Column(String(16), nullable=False, default="queued", index=True)
+    attempts = Column(Integer, default=0)
+
+    stage = Column(String(16)) #Reddeden aşama (image | ocr | caption)
+    result = Column(Text) #Reddeden aşamanın sonucu (JSON)
+    error = Column(Text) #Son hata mesajı
+
+    created_dt = Column(DateTime, default=datetime.utcnow)
+    locked_dt = Column(DateTime) #Worker'ın işi aldığı zaman (süresi aşılırsa iş tekrar kuyruğa döner)
+    finished_dt = Column(DateTime)
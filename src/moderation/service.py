@@ -0,0 +1,292 @@
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_, func
+from sqlalchemy.orm import Session
+
+from .models import ImageAnalysisRecord, TextModerationRecord, ModerationJob
+from ..ai.image_cache import image_cache, dhash_bands, hamming_distance, near_duplicate_entry, IMAGE_CACHE_PERSIST
+from ..ai.text_cache import text_cache, text_key, TEXT_CACHE_PERSIST, TEXT_CACHE_TTL
+from ..ai.model_registry import registry
+from ..ai.moderation_pipeline import moderation_pipeline
+
+# İş durumları: queued/running = gönderi beklemede (pending)
+PENDING_JOB_STATUSES = ("queued", "running")
+
+
+def public_moderation_status(job_status: str = None) -> str:
+    """İş durumunu istemciye gösterilen duruma çevirir: pending | approved | rejected | failed"""
+    if job_status is None:
+        return "approved" # İş kaydı yok: Senkron moderasyondan geçmiş gönderi
+    return "pending" if job_status in PENDING_JOB_STATUSES else job_status
+
+
+def _to_signed64(value: int) -> int:
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def _to_unsigned64(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+def _json_default(value):
+    """numpy skalerleri (örn. float32 skor) JSON'a yazılabilir Python tiplerine çevrilir."""
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"JSON'a çevrilemeyen tip: {type(value).__name__}")
+
+def _record_to_entry(record: ImageAnalysisRecord) -> dict:
+    return {
+        "analysis": json.loads(record.analysis),
+        "ocr_text": record.ocr_text,
+        "ocr_moderation": json.loads(record.ocr_moderation) if record.ocr_moderation else None
+    }
+
+
+#Get Cached Image Analysis
+async def get_cached_image_analysis(db: Session, sha256: str, image_dhash: int, version: str, max_distance: int):
+    """
+    Önce birebir aynı görseli (SHA-256), bulunamazsa dHash bantlarından biri aynı olan
+    adaylar arasında max_distance içindeki en yakın görseli arar (benzer isabette sadece görsel analizi döner).
+    """
+    record = db.query(ImageAnalysisRecord).filter(
+        ImageAnalysisRecord.sha256 == sha256,
+        ImageAnalysisRecord.version == version
+    ).first()
+    if record:
+        return _record_to_entry(record)
+
+    if max_distance <= 0:
+        return None
+
+    bands = dhash_bands(image_dhash)
+    candidates = db.query(ImageAnalysisRecord).filter(
+        ImageAnalysisRecord.version == version,
+        or_(
+            ImageAnalysisRecord.band0 == bands[0],
+            ImageAnalysisRecord.band1 == bands[1],
+            ImageAnalysisRecord.band2 == bands[2],
+            ImageAnalysisRecord.band3 == bands[3]
+        )
+    ).all()
+
+    best, best_distance = None, max_distance + 1
+    for candidate in candidates:
+        distance = hamming_distance(_to_unsigned64(candidate.dhash), image_dhash)
+        if distance < best_distance:
+            best, best_distance = candidate, distance
+    return near_duplicate_entry(_record_to_entry(best)) if best else None
+
+#Save Image Analysis
+async def save_image_analysis(db: Session, sha256: str, image_dhash: int, version: str, entry: dict):
+    record = db.query(ImageAnalysisRecord).filter(
+        ImageAnalysisRecord.sha256 == sha256,
+        ImageAnalysisRecord.version == version
+    ).first()
+    if not record:
+        bands = dhash_bands(image_dhash)
+        record = ImageAnalysisRecord(
+            sha256=sha256,
+            version=version,
+            dhash=_to_signed64(image_dhash),
+            band0=bands[0], band1=bands[1], band2=bands[2], band3=bands[3]
+        )
+        db.add(record)
+
+    record.analysis = json.dumps(entry["analysis"], default=_json_default)
+    record.ocr_text = entry.get("ocr_text")
+    record.ocr_moderation = json.dumps(entry["ocr_moderation"], default=_json_default) if entry.get("ocr_moderation") else None
+    db.commit()
+
+
+#Lookup Image Analysis (bellek -> veritabanı)
+async def lookup_image_analysis(db: Session, image_keys: tuple):
+    """Aynı veya çok benzer görsel daha önce analiz edildiyse kaydını döner."""
+    version, image_hash, image_dhash = image_keys
+    cached = image_cache.get(image_hash, image_dhash, version)
+    if cached is None and IMAGE_CACHE_PERSIST:
+        cached = await get_cached_image_analysis(db, image_hash, image_dhash, version, image_cache.max_distance)
+        if cached is not None:
+            image_cache.put(image_hash, image_dhash, version, cached)
+    return cached
+
+#Store Image Analysis (bellek + veritabanı)
+async def store_image_analysis(db: Session, image_keys: tuple, entry: dict):
+    """Görsel analiz sonucunu bellek önbelleğine ve (açıksa) veritabanına yazar."""
+    version, image_hash, image_dhash = image_keys
+    image_cache.put(image_hash, image_dhash, version, entry)
+    if IMAGE_CACHE_PERSIST:
+        try:
+            await save_image_analysis(db, image_hash, image_dhash, version, entry)
+        except Exception as e:
+            db.rollback()
+            print(f"Görsel önbellek kayıt uyarısı: {str(e)}")
+
+# ---------------------------------------------------------
+# METİN MODERASYON ÖNBELLEĞİ (kalıcı kopya)
+# ---------------------------------------------------------
+
+# Bu süreçte veritabanına yazılan model kimliği (değişirse eski modelin kayıtları silinir)
+_persisted_text_model = None
+
+def _text_model_id():
+    """Metin modeli yüklüyse kimliği (yükleme tetiklenmez)."""
+    model = registry.peek("text_moderator")
+    return model.model_name if model is not None else None
+
+#Lookup Text Moderation (veritabanı -> bellek)
+async def lookup_text_moderation(db: Session, text: str):
+    """Metin bellekte yoksa veritabanından yükler (belleğe de koyar). Pipeline caption ve OCR metni için modelden önce çağırır."""
+    model_id = _text_model_id()
+    if not text or model_id is None:
+        return None
+    key = text_key(model_id, text)
+    if key in text_cache:
+        return None
+
+    query = db.query(TextModerationRecord).filter(TextModerationRecord.key == key)
+    if TEXT_CACHE_TTL > 0:
+        query = query.filter(TextModerationRecord.created_dt >= datetime.utcnow() - timedelta(seconds=TEXT_CACHE_TTL))
+    record = query.first()
+    if record is None:
+        return None
+    result = json.loads(record.result)
+    text_cache.put(key, model_id, result)
+    return result
+
+#Store Text Moderations
+async def store_text_moderations(db: Session, items: list):
+    """Pipeline'da modelden geçen (metin, sonuç) çiftlerini veritabanına yazar."""
+    global _persisted_text_model
+    model_id = _text_model_id()
+    if not items or model_id is None:
+        return
+    try:
+        if _persisted_text_model != model_id:
+            # Model değişmiş olabilir: Eski modelin kayıtları artık isabet etmez, silinir
+            db.query(TextModerationRecord).filter(TextModerationRecord.model_id != model_id).delete(synchronize_session=False)
+            _persisted_text_model = model_id
+
+        for text, result in items:
+            key = text_key(model_id, text)
+            record = db.query(TextModerationRecord).filter(TextModerationRecord.key == key).first()
+            if record is None:
+                record = TextModerationRecord(key=key, model_id=model_id)
+                db.add(record)
+            record.result = json.dumps(result)
+            record.created_dt = datetime.utcnow()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Metin önbellek kayıt uyarısı: {str(e)}")
+
+#Invalidate Text Moderation Cache
+async def invalidate_text_moderation_cache(db: Session, model_id: str = None) -> int:
+    """
+    Önbelleği elle geçersiz kılar (örn. model aynı isimle güncellendiğinde).
+    model_id verilirse sadece o modelin, verilmezse tüm kayıtlar bellekten ve veritabanından silinir.
+    """
+    removed = text_cache.invalidate(model_id)
+    query = db.query(TextModerationRecord)
+    if model_id is not None:
+        query = query.filter(TextModerationRecord.model_id == model_id)
+    removed += query.delete(synchronize_session=False)
+    db.commit()
+    return removed
+
+#Moderate Post Content
+async def moderate_post_content(db: Session, content: str, image=None) -> dict:
+    """
+    Gönderi moderasyonu: Önbellek kontrolü + moderasyon pipeline'ı + yeni analizlerin önbelleğe yazılması.
+    Hem senkron create_post hem de ertelenmiş moderasyon worker'ı kullanır. Pipeline sonucunu (outcome) döner.
+    image: ingest_image() sonucu (IngestedImage) veya None
+    """
+    cached = await lookup_image_analysis(db, image.keys) if image is not None else None
+    text_lookup = (lambda text: lookup_text_moderation(db, text)) if TEXT_CACHE_PERSIST else None
+
+    # Metin, görsel (CLIP) ve OCR aşamaları paralel çalışır (caption ve OCR metni kalıcı önbellekte de aranır)
+    outcome = await moderation_pipeline.run(image=image, caption=content, cached=cached, text_lookup=text_lookup)
+    results = outcome["results"]
+
+    # Modelden geçen metinler kalıcı önbelleğe yazılır
+    if TEXT_CACHE_PERSIST:
+        await store_text_moderations(db, outcome["new_texts"])
+
+    # Yeni hesaplanan görsel analizlerini önbelleğe yaz
+    if image is not None and "image" in results and not results["image"].get("error"):
+        entry = cached or {"analysis": dict(results["image"]), "ocr_text": None, "ocr_moderation": None}
+        if entry.get("ocr_text") is None and "ocr" in results:
+            entry = {**entry, "ocr_text": results["ocr"]["text"], "ocr_moderation": results["ocr"]["moderation"]}
+        if entry is not cached:
+            await store_image_analysis(db, image.keys, entry)
+
+    return outcome
+
+
+# ---------------------------------------------------------
+# ERTELENMİŞ MODERASYON İŞLERİ
+# ---------------------------------------------------------
+
+#Get Moderation Job
+async def get_moderation_job(db: Session, post_id: int):
+    return db.query(ModerationJob).filter(ModerationJob.post_id == post_id).first()
+
+#Claim Moderation Job
+async def claim_moderation_job(db: Session, job_timeout: int):
+    """
+    Sıradaki işi alır (queued veya süresi aşılmış running).
+    Koşullu UPDATE ile alınır; aynı işi birden fazla worker/süreç alamaz.
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=job_timeout)
+    claimable = or_(
+        ModerationJob.status == "queued",
+        and_(ModerationJob.status == "running", ModerationJob.locked_dt < stale_before)
+    )
+
+    candidate = db.query(ModerationJob.id).filter(claimable).order_by(ModerationJob.id).first()
+    if not candidate:
+        return None
+
+    claimed = db.query(ModerationJob).filter(ModerationJob.id == candidate.id, claimable).update({
+        ModerationJob.status: "running",
+        ModerationJob.locked_dt: datetime.utcnow(),
+        ModerationJob.attempts: ModerationJob.attempts + 1
+    }, synchronize_session=False)
+    db.commit()
+
+    if claimed != 1:
+        return None # Başka bir worker aldı
+    return db.query(ModerationJob).filter(ModerationJob.id == candidate.id).first()
+
+#Finish Moderation Job
+async def finish_moderation_job(db: Session, job: ModerationJob, outcome: dict):
+    """Pipeline sonucuna göre gönderiyi yayınlar (approved) veya reddeder (rejected)."""
+    if outcome["rejected"]:
+        job.status = "rejected"
+        job.stage = outcome["stage"]
+        job.result = json.dumps(outcome["results"][outcome["stage"]])
+    else:
+        job.status = "approved"
+    job.error = None
+    job.finished_dt = datetime.utcnow()
+    db.commit()
+
+#Fail Moderation Job
+async def fail_moderation_job(db: Session, job: ModerationJob, error: str, max_attempts: int):
+    """Hata sonrası iş tekrar kuyruğa alınır; deneme hakkı bittiyse failed olur (gönderi gizli kalır)."""
+    job.error = error[:500]
+    if job.attempts >= max_attempts:
+        job.status = "failed"
+        job.finished_dt = datetime.utcnow()
+    else:
+        job.status = "queued"
+    db.commit()
+
+#Requeue Moderation Job
+async def requeue_moderation_job(db: Session, job: ModerationJob):
+    """Havuz dolu gibi geçici durumlarda işi deneme hakkı harcatmadan kuyruğa geri koyar."""
+    job.status = "queued"
+    job.attempts = max((job.attempts or 1) - 1, 0)
+    db.commit()
+
+#Moderation Job Counts
+async def moderation_job_counts(db: Session) -> dict:
+    rows = db.query(ModerationJob.status, func.count(ModerationJob.id)).group_by(ModerationJob.status).all()
+    return {status: count for status, count in rows}
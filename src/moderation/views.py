@@ -0,0 +1,89 @@
+from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from typing import Optional
+import os
+
+from ..ai.model_registry import registry
+from ..ai.moderation_batcher import active_batchers
+from ..ai.image_cache import image_cache
+from ..ai.text_cache import text_cache
+from ..ai.profanity_filter import get_profanity_filter, reload_profanity_filter
+from ..ai.moderation_pipeline import moderation_pipeline
+from ..ai.executors import executor_stats
+from ..database import get_db
+from ..auth.service import get_current_user
+from .service import moderation_job_counts, invalidate_text_moderation_cache
+from .worker import moderation_workers
+
+router = APIRouter(prefix="/moderation", tags=["moderation"])
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+MODERATION_ADMINS = {name.strip().lower() for name in os.getenv("MODERATION_ADMINS", "").split(",") if name.strip()}  # Yönetim uçlarını çağırabilecek kullanıcı adları (virgülle ayrılmış, boşsa kimse)
+
+
+async def require_moderation_admin(token: str, db: Session = Depends(get_db)):
+    """Yönetim uçları için dependency: Geçerli token ve MODERATION_ADMINS listesinde kullanıcı adı gerekir."""
+    user = await get_current_user(db, token)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Geçersiz token."
+        )
+    if user.username.lower() not in MODERATION_ADMINS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Bu işlem için moderasyon yöneticisi olmalısınız."
+        )
+    return user
+
+#Readiness (Modeller yüklendi mi?)
+@router.get("/ready")
+async def ready():
+    """
+    Yük dengeleyici / orkestratör için hazır olma kontrolü.
+    Bütün modeller yüklenene kadar 503 döner.
+    """
+    if not registry.is_ready():
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"ready": False, "pending": registry.pending()}
+        )
+    return {"ready": True}
+
+#Model Raporu (yükleme süresi ve bellek kullanımı)
+@router.get("/models")
+async def models_report():
+    return registry.report()
+
+#Moderasyon Metrikleri (aşama süreleri, batch boyutu dağılımı, kuyrukta bekleme süresi, önbellek isabetleri, OCR tespit/tanıma süreleri, CPU havuzları, ertelenmiş işler)
+@router.get("/metrics")
+async def moderation_metrics(db: Session = Depends(get_db)):
+    return {
+        "pipeline": moderation_pipeline.stats(),
+        "batchers": [batcher.stats() for batcher in active_batchers()],
+        "image_cache": image_cache.stats(),
+        "text_cache": text_cache.stats(),
+        "lexicon": get_profanity_filter().stats(),
+        "ocr": registry.peek("ocr_service").stats() if registry.peek("ocr_service") is not None else None,
+        "executors": executor_stats(),
+        "deferred": {**moderation_workers.stats(), "jobs": await moderation_job_counts(db)}
+    }
+
+#Küfür Sözlüğünü Yeniden Yükle (PROFANITY_WORDLIST dosyası, sunucuyu yeniden başlatmadan)
+@router.post("/lexicon/reload", dependencies=[Depends(require_moderation_admin)])
+async def reload_lexicon():
+    try:
+        lexicon = reload_profanity_filter()
+    except OSError as e:
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"detail": f"Sözlük okunamadı: {str(e)}"}
+        )
+    return {"patterns": len(lexicon.patterns), "build_ms": round(lexicon.build_ms, 2)}
+
+#Metin Moderasyon Önbelleğini Temizle (model aynı isimle güncellendiğinde; bellek + veritabanı)
+@router.post("/text-cache/invalidate", dependencies=[Depends(require_moderation_admin)])
+async def invalidate_text_cache(model_id: Optional[str] = None, db: Session = Depends(get_db)):
+    removed = await invalidate_text_moderation_cache(db, model_id)
+    return {"removed": removed, "model_id": model_id}
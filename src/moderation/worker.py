@@ -0,0 +1,134 @@
+#Moderasyon Worker Havuzu - Ertelenmiş (deferred) moderasyon işlerini arka planda çalıştırır
+
+import os
+import time
+import base64
+import asyncio
+from collections import deque
+
+import numpy as np
+
+from ..database import SessionLocal
+from ..post.models import Post
+from ..ai.executors import run_image, ExecutorOverloaded
+from ..ai.model_registry import registry
+from ..ai.image_ingest import ingest_image
+from .service import moderate_post_content, claim_moderation_job, finish_moderation_job, fail_moderation_job, requeue_moderation_job
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+MODERATION_MODE = os.getenv("MODERATION_MODE", "sync").lower()                   # sync | deferred
+MODERATION_WORKERS = int(os.getenv("MODERATION_WORKERS", "2"))                    # Eşzamanlı çalışan iş sayısı
+MODERATION_POLL_INTERVAL = float(os.getenv("MODERATION_POLL_INTERVAL", "1.0"))    # Kuyruk boşken kontrol aralığı (sn)
+MODERATION_JOB_TIMEOUT = int(os.getenv("MODERATION_JOB_TIMEOUT", "300"))          # running işin tekrar kuyruğa döneceği süre (sn)
+MODERATION_MAX_ATTEMPTS = int(os.getenv("MODERATION_MAX_ATTEMPTS", "3"))
+
+
+def _data_uri_to_bytes(data_uri: str) -> bytes:
+    return base64.b64decode(data_uri.split(",", 1)[1] if data_uri.startswith("data:") else data_uri)
+
+
+class ModerationWorkerPool:
+    """
+    Kalıcı iş tablosundan (moderation_jobs) iş alıp moderasyonu çalıştıran asyncio worker'ları.
+    - İşler veritabanında durduğu için süreç yeniden başlasa da kaybolmaz; yarım kalan işler
+      MODERATION_JOB_TIMEOUT sonunda tekrar alınır.
+    - notify() yeni iş eklendiğini bildirir, worker'lar poll aralığını beklemeden uyanır.
+    - Model çıkarımı yine inference havuzunda çalışır; havuz doluysa iş deneme hakkı harcamadan kuyruğa döner.
+    """
+
+    def __init__(self, workers: int = MODERATION_WORKERS, poll_interval: float = MODERATION_POLL_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._tasks = []
+        self._wakeup = None
+
+        # Metrikler
+        self._processed = 0
+        self._failed = 0
+        self._durations_ms = deque(maxlen=1024)
+
+    def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run(i)) for i in range(self.workers)]
+        print(f"✅ Moderasyon worker'ları başlatıldı ({self.workers} adet)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _wait_for_work(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _run(self, worker_id: int):
+        while True:
+            db = SessionLocal()
+            try:
+                job = await claim_moderation_job(db, MODERATION_JOB_TIMEOUT)
+                if job is None:
+                    await self._wait_for_work()
+                    continue
+                await self._process(db, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                db.rollback()
+                print(f"❌ Moderasyon worker-{worker_id} hatası: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+            finally:
+                db.close()
+
+    async def _process(self, db, job):
+        start = time.perf_counter()
+        post = db.query(Post).filter(Post.id == job.post_id).first()
+        if post is None:
+            await fail_moderation_job(db, job, "Gönderi silinmiş.", max_attempts=0)
+            return
+
+        try:
+            image = None
+            if post.image:
+                await registry.ensure_loaded("content_moderator", "text_moderator")
+                image = await run_image(ingest_image, _data_uri_to_bytes(post.image))
+            outcome = await moderate_post_content(db, post.content, image)
+        except (ExecutorOverloaded, asyncio.QueueFull):
+            # Sunucu yoğun: Biraz bekleyip tekrar dene
+            await requeue_moderation_job(db, job)
+            await asyncio.sleep(self.poll_interval)
+            return
+        except Exception as e:
+            self._failed += 1
+            print(f"❌ Moderasyon işi #{job.id} hatası: {str(e)}")
+            await fail_moderation_job(db, job, str(e), MODERATION_MAX_ATTEMPTS)
+            return
+
+        await finish_moderation_job(db, job, outcome)
+        self._processed += 1
+        self._durations_ms.append((time.perf_counter() - start) * 1000)
+
+    def stats(self) -> dict:
+        durations = np.fromiter(self._durations_ms, dtype=float)
+        return {
+            "mode": MODERATION_MODE,
+            "workers": len(self._tasks),
+            "processed": self._processed,
+            "failed": self._failed,
+            "job_ms": {
+                "p50": round(float(np.percentile(durations, 50)), 2),
+                "p95": round(float(np.percentile(durations, 95)), 2)
+            } if len(durations) else None
+        }
+
+
+moderation_workers = ModerationWorkerPool()
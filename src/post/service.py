@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, or_, and_
 import re
 
 from .schemas import PostCreate, Post as PostSchema, Hashtag as HashtagService
@@ -7,6 +7,8 @@ from .models import Post, Hashtag, post_hashtags
 from ..auth.models import User
 from ..auth.schemas import User as UserSchema
 from ..activity.models import Activity
+from ..moderation.models import ModerationJob
+from ..moderation.service import PENDING_JOB_STATUSES, public_moderation_status
 
 
 #Create Hashtag from Posts Content
@@ -26,7 +28,8 @@ async def create_hashtag_service(db: Session, post: Post):
 
 
 #Create Post
-async def create_post_service(db: Session, post: PostCreate, user_id: int):
+async def create_post_service(db: Session, post: PostCreate, user_id: int, pending_moderation: bool = False):
+    """pending_moderation: Gönderi ertelenmiş moderasyon işiyle birlikte (aynı transaction'da) kaydedilir."""
     db_post = Post(
         content = post.content,
         image = post.image,
@@ -36,16 +39,34 @@ async def create_post_service(db: Session, post: PostCreate, user_id: int):
     await create_hashtag_service(db, db_post)
 
     db.add(db_post)
+    if pending_moderation:
+        # İş kaydı olmadan gönderi bir an bile görünür olmasın
+        db.flush()
+        db.add(ModerationJob(post_id=db_post.id, status="queued"))
     db.commit()
     return db_post
 
+#Visible Posts (moderasyon durumuna göre)
+def _visible_posts(query, current_username: str = None):
+    """
+    Moderasyonu bekleyen (queued/running) gönderiler sadece yazarına, reddedilen/başarısız olanlar kimseye gösterilmez.
+    İş kaydı olmayan gönderiler (senkron moderasyondan geçmiş) herkese görünür.
+    Sorguda User join edilmiş olmalı. (Post, User, moderasyon durumu) döner.
+    """
+    query = query.add_columns(ModerationJob.status).outerjoin(ModerationJob, ModerationJob.post_id == Post.id)
+    visible = or_(ModerationJob.id.is_(None), ModerationJob.status == "approved")
+    if current_username:
+        visible = or_(visible, and_(User.username == current_username, ModerationJob.status.in_(PENDING_JOB_STATUSES)))
+    return query.filter(visible)
+
 #Get User Posts
 async def get_user_posts_service(db: Session, user_id: int, current_username: str = None) -> list[PostSchema]:
-    posts = db.query(Post, User).join(User).filter(Post.author_id == user_id).order_by(desc(Post.created_dt)).all()
+    posts = db.query(Post, User).join(User).filter(Post.author_id == user_id)
+    posts = _visible_posts(posts, current_username).order_by(desc(Post.created_dt)).all()
     
     result = []
     
-    for post, user in posts:
+    for post, user, job_status in posts:
         # Likes ve comments count hesapla
         from ..activity.models import Activity
         likes_count = db.query(Activity).filter(
@@ -73,6 +94,7 @@ async def get_user_posts_service(db: Session, user_id: int, current_username: st
             "likes_count": likes_count,
             "comments_count": comments_count,
             "is_liked": is_liked,
+            "moderation_status": public_moderation_status(job_status),
             "user": {
                 "id": user.id,
                 "username": user.username,
@@ -83,12 +105,21 @@ async def get_user_posts_service(db: Session, user_id: int, current_username: st
     
     return result
 
+#Count User Posts
+async def count_user_posts_service(db: Session, user_id: int, current_username: str = None) -> int:
+    """Profildeki gönderi sayısı: get_user_posts_service ile aynı görünürlük (reddedilenler sayılmaz)."""
+    posts = db.query(Post, User).join(User).filter(Post.author_id == user_id)
+    return _visible_posts(posts, current_username).count()
+
 #Get Posts from Hashtag
 async def get_posts_from_hashtag_service(db: Session, hashtag_name: str):
     hashtag = db.query(Hashtag).filter_by(name= hashtag_name).first()
     if not hashtag:
         return None
-    return hashtag.posts
+    # Moderasyonu bitmemiş veya reddedilmiş gönderiler listelenmez
+    return db.query(Post).join(post_hashtags).filter(post_hashtags.c.hashtag_id == hashtag.id) \
+        .outerjoin(ModerationJob, ModerationJob.post_id == Post.id) \
+        .filter(or_(ModerationJob.id.is_(None), ModerationJob.status == "approved")).all()
 
 #Get Random Posts (return latest posts of all users)
 async def get_random_posts_service(db: Session, page: int=1, limit: int=10, hashtag: str = None, current_username: str = None):
@@ -105,11 +136,11 @@ async def get_random_posts_service(db: Session, page: int=1, limit: int=10, hash
         hashtag_name = hashtag.lstrip('#')
         posts = posts.join(post_hashtags).join(Hashtag).filter(Hashtag.name == hashtag_name)
 
-    posts = posts.offset(offset).limit(limit).all()
+    posts = _visible_posts(posts, current_username).offset(offset).limit(limit).all()
 
     result = []
     
-    for post, user in posts:
+    for post, user, job_status in posts:
         # Likes ve comments count hesapla
         from ..activity.models import Activity
         likes_count = db.query(Activity).filter(
@@ -137,6 +168,7 @@ async def get_random_posts_service(db: Session, page: int=1, limit: int=10, hash
             "likes_count": likes_count,
             "comments_count": comments_count,
             "is_liked": is_liked,
+            "moderation_status": public_moderation_status(job_status),
             "user": {
                 "id": user.id,
                 "username": user.username,
@@ -150,8 +182,15 @@ async def get_random_posts_service(db: Session, page: int=1, limit: int=10, hash
 
 #Get Post by Post ID
 async def get_post_from_post_id_service(db: Session, post_id: int) -> PostSchema:
+    """Moderasyon durumuna bakmaz: Sadece yazarın kendi işlemleri (silme, moderasyon durumu) için."""
     return db.query(Post).filter(Post.id == post_id).first()
 
+#Get Visible Post by Post ID
+async def get_visible_post_service(db: Session, post_id: int, current_username: str = None):
+    """Feed ile aynı görünürlük: Bekleyen gönderi sadece yazarına, reddedilen/başarısız gönderi kimseye dönmez."""
+    row = _visible_posts(db.query(Post, User).join(User).filter(Post.id == post_id), current_username).first()
+    return row[0] if row else None
+
 #Delete Post
 async def delete_post_service(db: Session, post_id: int):
     """
@@ -176,8 +215,8 @@ async def delete_post_service(db: Session, post_id: int):
 
 #Like Post
 async def like_post_service(db: Session, post_id: int, username: str):
-    #Post varmı yokmu kontrol et
-    post = await get_post_from_post_id_service(db, post_id)
+    #Post varmı yokmu kontrol et (moderasyonu bitmemiş / reddedilmiş gönderi beğenilemez)
+    post = await get_visible_post_service(db, post_id, username)
     if not post:
         return False, "Geçersiz Post ID."
     #Kullanıcı varmı yokmu kontrol et
@@ -227,7 +266,7 @@ async def unlike_post_service(db: Session, post_id: int, username: str):
 
 #Users Who Liked Post
 async def liked_users_post_service(db: Session, post_id: int) -> list[UserSchema]:
-    post = await get_post_from_post_id_service(db, post_id)
+    post = await get_visible_post_service(db, post_id)
     if not post:
         return []
     
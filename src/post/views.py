@@ -1,24 +1,110 @@
 from fastapi import APIRouter, Depends, status, HTTPException, File, UploadFile, Form
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import Optional
-import base64
-import io
-from PIL import Image
+import json
+import asyncio
 
 from ..database import get_db
 from .schemas import PostCreate, Post
-from .service import create_post_service, delete_post_service, create_hashtag_service, get_post_from_post_id_service, get_posts_from_hashtag_service, get_random_posts_service, get_user_posts_service, like_post_service, unlike_post_service,liked_users_post_service
+from .service import create_post_service, delete_post_service, create_hashtag_service, get_post_from_post_id_service, get_posts_from_hashtag_service, get_random_posts_service, get_visible_post_service, get_user_posts_service, like_post_service, unlike_post_service,liked_users_post_service
 from ..auth.service import get_current_user, existing_user
 from ..auth.schemas import User
-from ..ai.content_moderator import ContentModerator
-from ..ai.text_moderator import TextModerator
-import easyocr
+from ..ai.executors import run_image, ExecutorOverloaded
+from ..ai.model_registry import require_ai, registry
+from ..ai.image_ingest import ingest_image
+from ..ai.moderation_pipeline import image_violation
+from ..moderation.service import moderate_post_content, get_moderation_job, public_moderation_status
+from ..moderation.worker import moderation_workers, MODERATION_MODE
 
 
 router = APIRouter(prefix="/posts", tags=["posts"])
 
+
+def _ocr_violation(extracted_text: str, text_result: dict) -> HTTPException:
+    """Görseldeki metin moderasyon ihlali (451) hatasını oluşturur."""
+    confidence = text_result.get("score", 0) * 100
+    
+    # Metni kısalt (max 150 karakter)
+    display_text = extracted_text[:150] + "..." if len(extracted_text) > 150 else extracted_text
+    
+    error_message = f"🚫 Görseldeki Metin Moderasyon İhlali\n\n"
+    error_message += f"Tespit Edilen Metin:\n\"{display_text}\"\n\n"
+    error_message += f"Güven Oranı: %{confidence:.1f}\n\n"
+    error_message += "⚠️ Bu görseldeki yazı içerir:\n"
+    error_message += "• Küfür veya hakaret\n"
+    error_message += "• Saldırgan dil\n"
+    error_message += "• Uygunsuz ifadeler\n\n"
+    error_message += "Lütfen görselde uygunsuz metin bulundurmayın."
+    
+    return HTTPException(
+        status_code=status.HTTP_451_UNAVAILABLE_FOR_LEGAL_REASONS,
+        detail={
+            "message": error_message,
+            "extracted_text": extracted_text,
+            "confidence": confidence,
+            "moderation_details": text_result
+        }
+    )
+
+
+def _caption_violation(content: str, text_result: dict) -> HTTPException:
+    """Gönderi metni politika ihlali (451) hatasını oluşturur."""
+    confidence = text_result.get("score", 0) * 100
+    
+    # Metni kısalt preview için (max 100 karakter)
+    display_content = content[:100] + "..." if len(content) > 100 else content
+    
+    error_message = f"🚫 Metin İçerik Politikası İhlali\n\n"
+    error_message += f"Tespit Edilen Metin:\n\"{display_content}\"\n\n"
+    error_message += f"Güven Oranı: %{confidence:.1f}\n\n"
+    error_message += "⚠️ Bu metin içerir:\n"
+    error_message += "• Küfür veya hakaret\n"
+    error_message += "• Saldırgan dil\n"
+    error_message += "• Uygunsuz ifadeler\n"
+    error_message += "• Nefret söylemi\n\n"
+    error_message += "Lütfen paylaşımınızda saygılı bir dil kullanın."
+    
+    return HTTPException(
+        status_code=status.HTTP_451_UNAVAILABLE_FOR_LEGAL_REASONS,
+        detail={
+            "message": error_message,
+            "confidence": confidence,
+            "moderation_details": text_result
+        }
+    )
+
+
+def _violation(stage: str, result: dict, content: str) -> HTTPException:
+    """Reddeden aşamanın (image | ocr | caption) 451 hatası."""
+    if stage == "image":
+        return image_violation(result)
+    if stage == "ocr":
+        return _ocr_violation(result["text"], result["moderation"])
+    return _caption_violation(content, result)
+
+
+def _image_processing_error(e: Exception) -> HTTPException:
+    """Görsel işleme hatasını kullanıcı dostu 500 hatasına çevirir."""
+    error_msg = str(e)
+    
+    # Hata tipine göre kullanıcı dostu mesaj
+    if "cannot identify image file" in error_msg.lower():
+        user_message = "❌ Görsel Format Hatası\n\nYüklediğiniz dosya geçerli bir görsel değil.\n\nDesteklenen formatlar: JPG, PNG, GIF, WebP"
+    elif "image file is truncated" in error_msg.lower():
+        user_message = "❌ Bozuk Görsel Dosyası\n\nGörsel dosyası hasarlı veya eksik.\n\nLütfen başka bir görsel deneyin."
+    elif "out of memory" in error_msg.lower() or "cuda" in error_msg.lower():
+        user_message = "❌ Görsel Çok Büyük\n\nGörsel boyutu çok büyük.\n\nLütfen daha küçük bir görsel yükleyin (Max: 10MB)"
+    else:
+        user_message = f"❌ Görsel İşleme Hatası\n\nGörsel işlenirken bir sorun oluştu.\n\nHata detayı: {error_msg[:100]}"
+    
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail=user_message
+    )
+
 #Create Post (Dosya yükleme veya sadece metin)
-@router.post("/", response_model=Post, status_code=status.HTTP_201_CREATED)
+@router.post("/", response_model=Post, status_code=status.HTTP_201_CREATED, dependencies=[Depends(require_ai)])
 async def create_post(
     content: str = Form(...),
     image_file: Optional[UploadFile] = File(None),
@@ -32,6 +118,9 @@ async def create_post(
     - Sadece metin paylaşımı yapılabilir
     - Görsel varsa: NSFW, kan, şiddet + OCR küfür kontrolü
     - Metin her zaman küfür kontrolünden geçer
+    - Aşamalar moderasyon pipeline'ında paralel çalışır, ilk ret kalanları iptal eder
+    - MODERATION_MODE=deferred ise görselli gönderi 'pending' kaydedilir ve 202 döner;
+      durum /posts/{post_id}/moderation ile takip edilir
     """
     # Token kontrol
     user = await get_current_user(db, token)
@@ -41,6 +130,7 @@ async def create_post(
             detail="Giriş yapmadan bu işlemi gerçekleştiremezsiniz."
         )
     
+    image = None
     image_data_uri = None
     
     # Görsel yüklendiyse işle
@@ -48,179 +138,64 @@ async def create_post(
         try:
             # Dosyayı oku
             contents = await image_file.read()
-            image = Image.open(io.BytesIO(contents))
-            
-            # RGB'ye çevir
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # 1. Görsel İçerik Moderasyonu (NSFW, Kan, Şiddet)
-            content_mod = ContentModerator()
-            content_result = content_mod.analyze_image(image)
-            
-            # Numpy array'i listeye çevir
-            if 'all_scores' in content_result:
-                content_result['all_scores'] = content_result['all_scores'].tolist()
-            
-            # Eğer görsel paylaşılabilir değilse reddet
-            if not content_result.get("is_shareable", True):
-                # Detaylı ve Türkçe hata mesajı oluştur
-                category_tr = content_result.get("category_tr", "Uygunsuz İçerik")
-                confidence = content_result.get("score", 0)
-                detected_label = content_result.get("label", "")
-                
-                error_message = f"🚫 Görsel İçerik Politikası İhlali\n\n"
-                error_message += f"Tespit Edilen Kategori: {category_tr}\n"
-                error_message += f"Güven Oranı: %{confidence:.1f}\n\n"
-                
-                # Kategoriye özel detaylı açıklama
-                category = content_result.get("category", "")
-                if category == "violence":
-                    error_message += "⚠️ Bu görsel içerir:\n"
-                    error_message += "• Fiziksel şiddet veya kavga sahnesi\n"
-                    error_message += "• Kan, yara veya vahşet\n"
-                    error_message += "• Ceset veya ağır kaza görüntüsü\n"
-                    error_message += "• İşkence veya acı çektiren içerik\n\n"
-                    error_message += "Lütfen şiddet içermeyen bir görsel yükleyin."
-                    
-                elif category == "nsfw":
-                    error_message += "⚠️ Bu görsel içerir:\n"
-                    error_message += "• Açık saçık cinsel içerik\n"
-                    error_message += "• Çıplaklık veya cinsel organlar\n"
-                    error_message += "• Erotik veya müstehcen pozlar\n"
-                    error_message += "• Pornografik materyal\n\n"
-                    error_message += "Lütfen uygun bir görsel yükleyin."
-                    
-                elif category == "weapon":
-                    error_message += "⚠️ Bu görsel içerir:\n"
-                    error_message += "• Ateşli silah (tabanca, tüfek vb.)\n"
-                    error_message += "• Tehditkar şekilde tutulan kesici aletler\n"
-                    error_message += "• Yasadışı uyuşturucu madde\n"
-                    error_message += "• Terör veya savaş görüntüsü\n\n"
-                    error_message += "Lütfen silah veya tehdit içermeyen bir görsel yükleyin."
-                    
-                elif category == "hate":
-                    error_message += "⚠️ Bu görsel içerir:\n"
-                    error_message += "• Hakaret edici el işaretleri\n"
-                    error_message += "• Nefret söylemi sembolleri\n"
-                    error_message += "• Irkçı veya ayrımcı içerik\n\n"
-                    error_message += "Lütfen saygılı bir görsel yükleyin."
-                else:
-                    error_message += "Lütfen topluluk kurallarına uygun bir görsel yükleyin."
-                
-                clean_result = {k: v for k, v in content_result.items() if k != 'all_scores'}
-                raise HTTPException(
-                    status_code=status.HTTP_451_UNAVAILABLE_FOR_LEGAL_REASONS,
-                    detail={
-                        "message": error_message,
-                        "category": category_tr,
-                        "confidence": confidence,
-                        "detected_label": detected_label,
-                        "moderation_details": clean_result
-                    }
-                )
-            
-            # 2. Görseldeki Metin Moderasyonu (OCR + Küfür Kontrolü)
-            try:
-                import torch
-                reader = easyocr.Reader(['tr', 'en'], gpu=torch.cuda.is_available())
-                ocr_results = reader.readtext(image, detail=0)
-                
-                if ocr_results:
-                    extracted_text = " ".join(ocr_results)
-                    
-                    text_mod = TextModerator()
-                    text_result = text_mod.analyze_text(extracted_text)
-                    
-                    if text_result.get("is_toxic", False):
-                        confidence = text_result.get("score", 0) * 100
-                        
-                        # Metni kısalt (max 150 karakter)
-                        display_text = extracted_text[:150] + "..." if len(extracted_text) > 150 else extracted_text
-                        
-                        error_message = f"🚫 Görseldeki Metin Moderasyon İhlali\n\n"
-                        error_message += f"Tespit Edilen Metin:\n\"{display_text}\"\n\n"
-                        error_message += f"Güven Oranı: %{confidence:.1f}\n\n"
-                        error_message += "⚠️ Bu görseldeki yazı içerir:\n"
-                        error_message += "• Küfür veya hakaret\n"
-                        error_message += "• Saldırgan dil\n"
-                        error_message += "• Uygunsuz ifadeler\n\n"
-                        error_message += "Lütfen görselde uygunsuz metin bulundurmayın."
-                        
-                        raise HTTPException(
-                            status_code=status.HTTP_451_UNAVAILABLE_FOR_LEGAL_REASONS,
-                            detail={
-                                "message": error_message,
-                                "extracted_text": extracted_text,
-                                "confidence": confidence,
-                                "moderation_details": text_result
-                            }
-                        )
-            except HTTPException:
-                raise
-            except Exception as e:
-                print(f"OCR moderasyon uyarısı: {str(e)}")
-            
-            # Base64'e çevir
-            buffered = io.BytesIO()
-            image.save(buffered, format="JPEG")
-            image_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
-            image_data_uri = f"data:image/jpeg;base64,{image_base64}"
-        
-        except HTTPException:
+            # Tek decode: CLIP, OCR ve saklama için gereken tamponlar bir kez üretilir
+            # (CLIP ön işleme ve önbellek sürümü için modeller havuz dışında yüklenir)
+            await registry.ensure_loaded("content_moderator", "text_moderator")
+            image = await run_image(ingest_image, contents)
+        except ExecutorOverloaded:
+            raise
+        except Exception as e:
+            raise _image_processing_error(e)
+    
+    # Ertelenmiş mod: Görselli gönderi hemen 'pending' olarak kaydedilir, moderasyonu worker yapar
+    if MODERATION_MODE == "deferred" and image is not None:
+        try:
+            image_data_uri = await run_image(image.storage_data_uri)
+        except ExecutorOverloaded:
             raise
         except Exception as e:
-            error_msg = str(e)
-            
-            # Hata tipine göre kullanıcı dostu mesaj
-            if "cannot identify image file" in error_msg.lower():
-                user_message = "❌ Görsel Format Hatası\n\nYüklediğiniz dosya geçerli bir görsel değil.\n\nDesteklenen formatlar: JPG, PNG, GIF, WebP"
-            elif "image file is truncated" in error_msg.lower():
-                user_message = "❌ Bozuk Görsel Dosyası\n\nGörsel dosyası hasarlı veya eksik.\n\nLütfen başka bir görsel deneyin."
-            elif "out of memory" in error_msg.lower() or "cuda" in error_msg.lower():
-                user_message = "❌ Görsel Çok Büyük\n\nGörsel boyutu çok büyük.\n\nLütfen daha küçük bir görsel yükleyin (Max: 10MB)"
-            else:
-                user_message = f"❌ Görsel İşleme Hatası\n\nGörsel işlenirken bir sorun oluştu.\n\nHata detayı: {error_msg[:100]}"
-            
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=user_message
-            )
+            raise _image_processing_error(e)
+        
+        post_data = PostCreate(content=content, image=image_data_uri, location=location)
+        db_post = await create_post_service(db, post_data, user.id, pending_moderation=True)
+        moderation_workers.notify()
+        
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={
+                "id": db_post.id,
+                "moderation_status": "pending",
+                "status_url": f"/v1/posts/{db_post.id}/moderation",
+                "message": "Gönderiniz alındı, moderasyon tamamlanınca yayınlanacak."
+            }
+        )
     
-    # 3. Post Metni Moderasyonu (Her zaman yapılır)
-    if content:
+    # Moderasyon: Metin, görsel (CLIP) ve OCR aşamaları paralel çalışır
+    try:
+        outcome = await moderate_post_content(db, content, image)
+    except asyncio.QueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Sunucu şu anda çok yoğun. Lütfen birkaç saniye sonra tekrar deneyin.",
+            headers={"Retry-After": "2"}
+        )
+    except ExecutorOverloaded:
+        raise
+    except Exception as e:
+        raise _image_processing_error(e)
+    
+    # İlk reddeden aşamanın hata mesajı döner
+    if outcome["rejected"]:
+        raise _violation(outcome["stage"], outcome["results"][outcome["stage"]], content)
+    
+    # Base64'e çevir
+    if image is not None:
         try:
-            text_mod = TextModerator()
-            text_result = text_mod.analyze_text(content)
-            
-            if text_result.get("is_toxic", False):
-                confidence = text_result.get("score", 0) * 100
-                
-                # Metni kısalt preview için (max 100 karakter)
-                display_content = content[:100] + "..." if len(content) > 100 else content
-                
-                error_message = f"🚫 Metin İçerik Politikası İhlali\n\n"
-                error_message += f"Tespit Edilen Metin:\n\"{display_content}\"\n\n"
-                error_message += f"Güven Oranı: %{confidence:.1f}\n\n"
-                error_message += "⚠️ Bu metin içerir:\n"
-                error_message += "• Küfür veya hakaret\n"
-                error_message += "• Saldırgan dil\n"
-                error_message += "• Uygunsuz ifadeler\n"
-                error_message += "• Nefret söylemi\n\n"
-                error_message += "Lütfen paylaşımınızda saygılı bir dil kullanın."
-                
-                raise HTTPException(
-                    status_code=status.HTTP_451_UNAVAILABLE_FOR_LEGAL_REASONS,
-                    detail={
-                        "message": error_message,
-                        "confidence": confidence,
-                        "moderation_details": text_result
-                    }
-                )
-        except HTTPException:
+            image_data_uri = await run_image(image.storage_data_uri)
+        except ExecutorOverloaded:
             raise
         except Exception as e:
-            print(f"Metin moderasyon uyarısı: {str(e)}")
+            raise _image_processing_error(e)
     
     # PostCreate objesi oluştur
     post_data = PostCreate(
@@ -234,6 +209,49 @@ async def create_post(
     
     return db_post
 
+#Get Post Moderation Status (ertelenmiş moderasyon takibi)
+@router.get("/{post_id}/moderation")
+async def get_post_moderation(post_id: int, token: str, db: Session = Depends(get_db)):
+    """
+    Gönderinin moderasyon durumu: pending | approved | rejected | failed
+    Reddedildiyse senkron moddaki 451 hatasıyla aynı detay döner. Sadece gönderinin yazarı görebilir.
+    """
+    user = await get_current_user(db, token)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Giriş yapmadan bu işlemi gerçekleştiremezsiniz."
+        )
+    post = await get_post_from_post_id_service(db, post_id)
+    if not post:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Geçersiz Post ID."
+        )
+    if post.author_id != user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Bu gönderinin moderasyon durumunu görme yetkiniz yok."
+        )
+    
+    job = await get_moderation_job(db, post_id)
+    if job is None:
+        return {"post_id": post_id, "moderation_status": public_moderation_status(None)}
+    
+    response = {
+        "post_id": post_id,
+        "moderation_status": public_moderation_status(job.status),
+        "attempts": job.attempts,
+        "created_at": job.created_dt.isoformat() if job.created_dt else None,
+        "finished_at": job.finished_dt.isoformat() if job.finished_dt else None
+    }
+    if job.status == "rejected":
+        response["stage"] = job.stage
+        response["detail"] = _violation(job.stage, json.loads(job.result), post.content).detail
+    elif job.status == "failed":
+        response["detail"] = "Gönderi moderasyonu tamamlanamadı. Lütfen tekrar paylaşmayı deneyin."
+    return response
+
 #Get Current User Posts
 @router.get("/user")
 async def get_current_user_posts(token: str, db: Session = Depends(get_db)):
@@ -340,8 +358,10 @@ async def users_like_post(post_id: int, db: Session = Depends(get_db)):
 
 #Get Post
 @router.get("{post_id}", response_model=Post)
-async def get_post(post_id: int, db: Session = Depends(get_db)):
-    db_post = await get_post_from_post_id_service(db, post_id)
+async def get_post(post_id: int, token: str = None, db: Session = Depends(get_db)):
+    # Moderasyonu bekleyen gönderiyi sadece yazarı (token ile) görebilir, reddedilen gönderi bulunamadı döner
+    current_user = await get_current_user(db, token) if token else None
+    db_post = await get_visible_post_service(db, post_id, current_user.username if current_user else None)
     if not db_post:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -19,14 +19,15 @@ async def profile(username: str, token: str = None, db: Session = Depends(get_db
             detail="Geçersiz Kullanıcı Adı."
         )
     
-    # Post sayısını hesapla
-    from ..post.models import Post
-    posts_count = db.query(Post).filter(Post.author_id == db_user.id).count()
+    current_user = await get_current_user(db, token) if token else None
+    
+    # Post sayısını hesapla (profildeki liste ile aynı görünürlük: reddedilenler sayılmaz)
+    from ..post.service import count_user_posts_service
+    posts_count = await count_user_posts_service(db, db_user.id, current_user.username if current_user else None)
     
     # is_following hesapla
     is_following = False
     if token:
-        current_user = await get_current_user(db, token)
         if current_user and current_user.username != username:
             is_following = await check_follow_service(db, current_user.username, username)
     
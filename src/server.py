@@ -0,0 +1,169 @@
+#Pre-fork Sunucu - Modeller master süreçte bir kez yüklenir, worker'lar fork ile ağırlıkları paylaşır
+#Kullanım: python -m src.server --workers 4 --port 8000
+
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+PREFORK_WORKERS = int(os.getenv("PREFORK_WORKERS", "2"))
+PREFORK_TORCH_THREADS = int(os.getenv("PREFORK_TORCH_THREADS", "0"))        # Worker başına torch thread, 0 = CPU / worker
+PREFORK_READY_TIMEOUT = float(os.getenv("PREFORK_READY_TIMEOUT", "300"))    # Worker warm-up bekleme süresi (sn)
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    """Dinleme soketi master'da açılır, bütün worker'lar aynı soketten bağlantı kabul eder."""
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, ready_fd: int, args):
+    """Fork edilmiş worker: Kendi torch thread'leri ve DB bağlantıları ile uvicorn çalıştırır."""
+    import uvicorn
+    from .database import engine
+    from .ai.model_registry import registry
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    # Master'ın bağlantı havuzu worker'lar arasında paylaşılmasın (her worker kendi bağlantısını açar)
+    engine.dispose(close=False)
+
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(args.torch_threads)
+
+    # Warm-up worker'da yapılır: Aktivasyon tamponları worker'a özel, ağırlıklar paylaşılan sayfalarda kalır
+    registry.load_all()
+    os.write(ready_fd, b"1")
+    os.close(ready_fd)
+
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_keep_alive=5)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(app, sock, args):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        code = 0
+        try:
+            _run_worker(app, sock, write_fd, args)
+        except BaseException as e:
+            print(f"❌ Worker {os.getpid()} hata ile kapandı: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    os.close(write_fd)
+    return pid, read_fd
+
+
+def _wait_ready(workers: dict, timeout: float):
+    """Worker'lar warm-up'ı bitirene kadar bekler (bellek raporu warm-up sonrası anlamlı)."""
+    deadline = time.monotonic() + timeout
+    for pid, read_fd in list(workers.items()):
+        os.set_blocking(read_fd, False)
+        while time.monotonic() < deadline:
+            try:
+                os.read(read_fd, 1)  # b"1" = hazır, b"" = worker warm-up'tan önce kapandı
+                break
+            except BlockingIOError:
+                pass
+            time.sleep(0.05)
+        os.close(read_fd)
+        workers[pid] = None
+
+
+def memory_report(master_pid: int, worker_pids: list, model_footprint_mb: float):
+    """Master ve worker'ların paylaşılan / özel bellek raporu."""
+    from .ai.model_registry import memory_breakdown
+
+    print("\n" + "=" * 78)
+    print("PRE-FORK BELLEK RAPORU (MB)")
+    print("=" * 78)
+    print(f"{'süreç':<16} {'rss':>9} {'pss':>9} {'paylaşılan':>11} {'özel':>9} {'mmap ağırlık':>13}")
+    total_pss = 0.0
+    for label, pid in [("master", master_pid)] + [(f"worker {pid}", pid) for pid in worker_pids]:
+        memory = memory_breakdown(pid)
+        if memory is None:
+            print(f"{label:<16} (ölçülemedi)")
+            continue
+        total_pss += memory["pss_mb"]
+        print(f"{label:<16} {memory['rss_mb']:9.1f} {memory['pss_mb']:9.1f} {memory['shared_mb']:11.1f} "
+              f"{memory['private_mb']:9.1f} {memory['mapped_weights_mb']:13.1f}")
+    print("-" * 78)
+    print(f"Toplam PSS (gerçek kullanım): {total_pss:.1f} MB | model ağırlıkları: {model_footprint_mb:.1f} MB "
+          f"| {len(worker_pids)} ayrı süreç olsaydı ≈ {model_footprint_mb * len(worker_pids):.1f} MB ağırlık")
+    print("=" * 78 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork API sunucusu: Modeller bir kez yüklenir, worker'lar copy-on-write ile paylaşır")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=PREFORK_WORKERS)
+    parser.add_argument("--torch-threads", type=int, default=PREFORK_TORCH_THREADS, help="Worker başına torch thread (0 = CPU / worker)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    args.torch_threads = args.torch_threads or max(1, (os.cpu_count() or 1) // args.workers)
+
+    from .main import app
+    from .ai.model_registry import registry
+
+    # Master'da çıkarım yapılmaz (warm-up dahil): Fork öncesi OpenMP thread havuzu oluşursa worker'larda kilitlenebilir.
+    # Yükleme de çıkarım yapmaz: CLIP etiket embedding'leri ve ONNX Runtime oturumu worker'da ilk çıkarımda (warm-up) kurulur.
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(1)
+    registry.load_all(warmup=False)
+    shared = registry.prepare_for_fork()
+    print(f"✅ Modeller master'da yüklendi ({shared['modules']} torch modülü, {shared['parameters_mb']} MB ağırlık)")
+
+    sock = _bind(args.host, args.port)
+    workers = dict(_spawn(app, sock, args) for _ in range(args.workers))
+    _wait_ready(workers, PREFORK_READY_TIMEOUT)
+    memory_report(os.getpid(), list(workers), shared["parameters_mb"])
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    # Ölen worker yeniden fork edilir (modeller master'da hazır, tekrar yüklenmez)
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        read_fd = workers.pop(pid, None)
+        if read_fd is not None:
+            os.close(read_fd)
+        if not stopping:
+            print(f"⚠️ Worker {pid} kapandı (durum {status}), yeniden başlatılıyor")
+            time.sleep(1)  # Açılışta sürekli çöken worker'da fork döngüsüne girmemek için
+            new_pid, read_fd = _spawn(app, sock, args)
+            workers[new_pid] = read_fd  # Hazır sinyali okunmaz, worker kapanınca kapatılır
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()